@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark : coût d'un tick du scheduler
+---------------------------------------
+Compare, sur des flottes synthétiques de 10 / 100 / 1000 profils :
+
+  - "ancien tick"   : load_configs() + parcours complet de iter_jobs()
+                      + hhmm_add_offset pour chaque job (ce que faisait
+                      scheduler_loop chaque seconde)
+  - "tick compilé"  : TimetableCache.get() (4 os.stat) + jobs_at(minute)
+
+Usage :
+    python benchmarks/bench_scheduler_tick.py
+    python benchmarks/bench_scheduler_tick.py --sizes 10 100 1000 5000 --ticks 200
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import scheduler  # noqa: E402
+
+
+PLATFORMS = ["WhatsApp", "Facebook", "Instagram", "TikTok"]
+ROWS_PER_PROFILE = 6
+
+
+def write_fleet(folder: Path, n_profiles: int, seed: int = 42) -> None:
+    """Écrit profiles / systems / matrix / albums synthétiques dans folder."""
+    rnd = random.Random(seed)
+
+    systems = {}
+    for i in range(24):
+        times = sorted({f"{rnd.randint(0, 23):02d}:00" for _ in range(3)})
+        systems[f"Sys_{i}"] = times
+
+    albums = [
+        {"name": f"Album_{i}", "kind": "multi", "album_size": 50 + i, "count_per_post": 9}
+        for i in range(40)
+    ]
+
+    profiles = {}
+    rows = []
+    for p in range(n_profiles):
+        name = f"P{p:04d}"
+        profiles[name] = {
+            "device_id": f"192.168.{p // 250}.{p % 250}:5555",
+            "offset_minutes": rnd.randint(0, 59),
+            "enabled": True,
+        }
+        for sys_key in rnd.sample(sorted(systems), ROWS_PER_PROFILE):
+            rows.append({
+                "device": name,
+                "platform": rnd.choice(PLATFORMS),
+                "system": sys_key,
+                "engine": "multi",
+                "album": "",
+                "album2": rnd.choice(albums)["name"],
+                "count": 9,
+            })
+
+    (folder / "profiles.json").write_text(json.dumps({"profiles": profiles}), encoding="utf-8")
+    (folder / "systems.json").write_text(json.dumps({"systems": systems}), encoding="utf-8")
+    (folder / "matrix.json").write_text(json.dumps({"rows": rows}), encoding="utf-8")
+    (folder / "albums.json").write_text(json.dumps({"albums": albums}), encoding="utf-8")
+
+
+def point_scheduler_to(folder: Path) -> None:
+    scheduler.PROFILES_PATH = folder / "profiles.json"
+    scheduler.SYSTEMS_PATH = folder / "systems.json"
+    scheduler.MATRIX_PATH = folder / "matrix.json"
+    scheduler.ALBUMS_PATH = folder / "albums.json"
+
+
+def legacy_tick(logical_hm: str) -> int:
+    """Réplique de l'ancien tick : relit tout et filtre tous les jobs."""
+    profiles, systems, matrix, albums = scheduler.load_configs()
+    due = 0
+    for job in scheduler.iter_jobs(profiles, systems, matrix, albums):
+        if job["time_effective"] == logical_hm:
+            due += 1
+    return due
+
+
+def compiled_tick(cache, minute: int) -> int:
+    return len(cache.get().jobs_at(minute))
+
+
+def bench(fn, ticks: int) -> float:
+    """Temps moyen par appel, en millisecondes."""
+    t0 = time.perf_counter()
+    for i in range(ticks):
+        fn(i)
+    return (time.perf_counter() - t0) * 1000 / ticks
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--ticks", type=int, default=50)
+    args = ap.parse_args()
+
+    print(f"{'profils':>8} {'jobs':>8} {'ancien tick (ms)':>18} {'tick compilé (ms)':>18} {'gain':>8}")
+
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = Path(tmp)
+            write_fleet(folder, n)
+            point_scheduler_to(folder)
+
+            cache = scheduler.build_timetable_cache()
+            table = cache.get()  # compilation initiale (hors mesure)
+
+            minutes = [m for m in range(1440)]
+            old_ms = bench(lambda i: legacy_tick(f"{minutes[i % 1440] // 60:02d}:{minutes[i % 1440] % 60:02d}"),
+                           max(1, args.ticks // (1 + n // 100)))
+            new_ms = bench(lambda i: compiled_tick(cache, minutes[i % 1440]), args.ticks * 20)
+
+            gain = old_ms / new_ms if new_ms else float("inf")
+            print(f"{n:>8} {table.jobs_count:>8} {old_ms:>18.3f} {new_ms:>18.4f} {gain:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
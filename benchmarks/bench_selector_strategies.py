@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark : XPath vs stratégies natives (ID / ACCESSIBILITY_ID / UiSelector)
+---------------------------------------------------------------------------
+Pour chaque locator de nos flows, compare sur une hiérarchie enregistrée :
+
+  - "xpath"    : ce que fait UiAutomator2 pour un XPath → sérialise TOUTE
+                 la hiérarchie en XML, la re-parse, évalue l'XPath
+  - "compilé"  : la stratégie rendue par engine.selector_compiler
+                 (ID / ACCESSIBILITY_ID / UiSelector) → parcours de l'arbre
+                 natif, arrêt au premier nœud trouvé
+
+Hiérarchie : --xml <fichier> (un driver.page_source enregistré), sinon une
+feuille de partage synthétique (~--nodes nœuds).
+
+Mode --live : mesure réelle find_elements sur un téléphone via Appium
+(--device ip:port), stratégie XPath vs stratégie compilée.
+
+Usage :
+    python benchmarks/bench_selector_strategies.py
+    python benchmarks/bench_selector_strategies.py --xml dump_share_sheet.xml --repeat 200
+    python benchmarks/bench_selector_strategies.py --live --device 192.168.10.56:5555
+"""
+import argparse
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from lxml import etree  # noqa: E402
+
+from appium.webdriver.common.appiumby import AppiumBy  # noqa: E402
+from engine.selector_compiler import compile_xpath  # noqa: E402
+
+# Locators réels (core.py / platforms.py) : feuille de partage + Galerie
+SELECTORS = [
+    "//*[@resource-id='com.sec.android.gallery3d:id/share']",
+    "//*[@content-desc='Share']",
+    "//*[@text='Share']",
+    "//*[contains(@content-desc,'Instagram')]",
+    "//android.widget.TextView[@resource-id='android:id/text1' and @text='Facebook']",
+    "(//android.widget.FrameLayout[@resource-id='com.sec.android.gallery3d:id/thumbnail_preview_layout'])[1]",
+    "//*[@text='Instagram' or contains(@content-desc,'Instagram')]",
+]
+
+APPS = ["WhatsApp Business", "Facebook", "Instagram", "TikTok", "Messages", "Gmail",
+        "Drive", "Bluetooth", "Quick Share", "Telegram", "Messenger", "Outlook"]
+
+
+# ==========================================================================
+# Hiérarchie
+# ==========================================================================
+def synthetic_share_sheet(n_nodes: int, seed: int = 7) -> etree._Element:
+    """Grille de vignettes Galerie + feuille de partage (cibles en fin d'arbre)."""
+    rnd = random.Random(seed)
+    root = etree.Element("hierarchy", rotation="0")
+    frame = etree.SubElement(root, "android.widget.FrameLayout", bounds="[0,0][1080,2400]")
+
+    grid = etree.SubElement(frame, "androidx.recyclerview.widget.RecyclerView",
+                            **{"resource-id": "com.sec.android.gallery3d:id/recycler_view"})
+    count = 3
+    while count < n_nodes * 0.7:
+        cell = etree.SubElement(grid, "android.widget.FrameLayout",
+                                **{"resource-id": "com.sec.android.gallery3d:id/thumbnail_preview_layout",
+                                   "bounds": f"[0,{count}][270,{count + 270}]"})
+        for _ in range(rnd.randint(2, 4)):
+            etree.SubElement(cell, "android.widget.ImageView",
+                             **{"resource-id": "com.sec.android.gallery3d:id/thumbnail", "content-desc": ""})
+            count += 1
+        count += 1
+
+    sheet = etree.SubElement(frame, "android.widget.LinearLayout",
+                             **{"resource-id": "android:id/contentPanel"})
+    while count < n_nodes:
+        for app in APPS:
+            item = etree.SubElement(sheet, "android.widget.LinearLayout", **{"content-desc": app})
+            etree.SubElement(item, "android.widget.ImageView", **{"resource-id": "android:id/icon"})
+            etree.SubElement(item, "android.widget.TextView",
+                             **{"resource-id": "android:id/text1", "text": app})
+            count += 3
+    bar = etree.SubElement(frame, "android.widget.LinearLayout")
+    etree.SubElement(bar, "android.widget.ImageButton",
+                     **{"resource-id": "com.sec.android.gallery3d:id/share", "content-desc": "Share"})
+    etree.SubElement(bar, "android.widget.TextView", text="Share")
+    return root
+
+
+def load_hierarchy(args) -> etree._Element:
+    if args.xml:
+        return etree.fromstring(Path(args.xml).read_bytes(),
+                                parser=etree.XMLParser(recover=True, huge_tree=True))
+    return synthetic_share_sheet(args.nodes)
+
+
+# ==========================================================================
+# Modèle du coût côté serveur UiAutomator2
+# ==========================================================================
+def run_xpath(root, xpath: str) -> bool:
+    """Sérialisation complète + parse + évaluation (chemin XPath d'UiAutomator2)."""
+    xml = etree.tostring(root)
+    doc = etree.fromstring(xml)
+    return bool(doc.xpath(xpath))
+
+
+_CALL_RE = re.compile(r'(\w+)\((?:"((?:[^"\\]|\\.)*)"|(\d+))\)')
+
+
+def uiselector_predicate(expr: str):
+    """new UiSelector().a("x").b("y") → (test(nœud), instance)."""
+    tests, instance = [], 0
+    for name, sval, ival in _CALL_RE.findall(expr.replace("new UiSelector()", "")):
+        val = sval.encode().decode("unicode_escape") if sval else sval
+        if name == "instance":
+            instance = int(ival)
+        elif name == "className":
+            tests.append(lambda n, v=val: n.tag == v)
+        elif name == "resourceId":
+            tests.append(lambda n, v=val: n.get("resource-id") == v)
+        elif name == "resourceIdMatches":
+            tests.append(lambda n, r=re.compile(val): bool(r.match(n.get("resource-id") or "")))
+        elif name == "text":
+            tests.append(lambda n, v=val: n.get("text") == v)
+        elif name == "textContains":
+            tests.append(lambda n, v=val: v in (n.get("text") or ""))
+        elif name == "textStartsWith":
+            tests.append(lambda n, v=val: (n.get("text") or "").startswith(v))
+        elif name == "description":
+            tests.append(lambda n, v=val: n.get("content-desc") == v)
+        elif name == "descriptionContains":
+            tests.append(lambda n, v=val: v in (n.get("content-desc") or ""))
+        elif name == "descriptionStartsWith":
+            tests.append(lambda n, v=val: (n.get("content-desc") or "").startswith(v))
+    return (lambda n: all(t(n) for t in tests)), instance
+
+
+def run_native(root, by: str, value: str) -> bool:
+    """Parcours de l'arbre natif, arrêt au premier nœud (ID / a11y / UiSelector)."""
+    if by == AppiumBy.ID:
+        test, instance = (lambda n: n.get("resource-id") == value), 0
+    elif by == AppiumBy.ACCESSIBILITY_ID:
+        test, instance = (lambda n: n.get("content-desc") == value), 0
+    else:
+        test, instance = uiselector_predicate(value)
+    seen = 0
+    for node in root.iter():
+        if test(node):
+            if seen == instance:
+                return True
+            seen += 1
+    return False
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def bench_offline(args) -> None:
+    root = load_hierarchy(args)
+    n = sum(1 for _ in root.iter())
+    print(f"Hiérarchie : {n} nœuds ({'enregistrée' if args.xml else 'synthétique'}), "
+          f"médiane sur {args.repeat} essais\n")
+    print(f"{'stratégie':<22}{'xpath ms':>10}{'natif ms':>10}{'gain':>8}  sélecteur")
+    for xp in SELECTORS:
+        by, value = compile_xpath(xp)
+        t_x = timed(lambda: run_xpath(root, xp), args.repeat)
+        if by == AppiumBy.XPATH:
+            print(f"{'xpath (non traduit)':<22}{t_x:>10.3f}{'-':>10}{'-':>8}  {xp}")
+            continue
+        found_x, found_n = run_xpath(root, xp), run_native(root, by, value)
+        t_n = timed(lambda: run_native(root, by, value), args.repeat)
+        flag = "" if found_x == found_n else "  ⚠ résultat différent"
+        print(f"{by:<22}{t_x:>10.3f}{t_n:>10.3f}{t_x / max(t_n, 1e-9):>7.1f}x  {xp}{flag}")
+
+
+# ==========================================================================
+# Mesure réelle (Appium)
+# ==========================================================================
+def bench_live(args) -> None:
+    from engine.core import make_driver
+
+    driver = make_driver(args.device)
+    try:
+        print(f"Téléphone {args.device}, médiane sur {args.repeat} essais (écran courant)\n")
+        for xp in SELECTORS:
+            by, value = compile_xpath(xp)
+            t_x = timed(lambda: driver.find_elements(AppiumBy.XPATH, xp), args.repeat)
+            t_n = timed(lambda: driver.find_elements(by, value), args.repeat) if by != AppiumBy.XPATH else None
+            native = f"{t_n:>10.1f}" if t_n is not None else f"{'-':>10}"
+            print(f"{by:<22}{t_x:>10.1f}{native}  {xp}")
+    finally:
+        driver.quit()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--xml", help="Fichier page_source enregistré")
+    ap.add_argument("--nodes", type=int, default=800, help="Taille de la hiérarchie synthétique")
+    ap.add_argument("--repeat", type=int, default=100)
+    ap.add_argument("--live", action="store_true", help="Mesure réelle sur téléphone (Appium)")
+    ap.add_argument("--device", help="device_id pour --live")
+    args = ap.parse_args()
+
+    if args.live:
+        if not args.device:
+            ap.error("--live exige --device")
+        bench_live(args)
+    else:
+        bench_offline(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,8 +13,20 @@ from .core import (
     start_gallery,
 )
 
+from .waits import (
+    wait_until,
+    wait_for_element,
+    log_wait_summary,
+)
+
+from .session_pool import (
+    acquire_driver,
+    release_driver,
+)
+
 from .engine_intro import run as run_intro
 from .engine_multi import run as run_multi
+from .engine_intro_multi import run as run_intro_multi
 
 from .platforms import (
     pre_platform_setup,
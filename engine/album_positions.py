@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de position des albums dans la grille "Albums" (par téléphone)
+--------------------------------------------------------------------
+config/album_positions.json :
+
+    {"192.168.10.56:5555": {"albums": {"Intro CM": 0, "Multi 12": 3}, "misses": 0}}
+
+La valeur est le nombre de "pages" (glissés contrôlés d'un écran) depuis
+le haut de la grille. open_album() va directement à la bonne page ;
+chaque échec compte un miss, et au-delà de MISS_LIMIT le cache du
+téléphone est vidé (albums réordonnés / renommés) puis reconstruit au fil
+des ouvertures suivantes.
+"""
+import threading
+from typing import Dict, Optional
+
+from ui.ui_paths_helpers import ALBUM_POSITIONS, load_json, save_json_atomic
+
+MISS_LIMIT = 3
+
+_LOCK = threading.Lock()
+
+
+def _load() -> Dict[str, dict]:
+    return load_json(ALBUM_POSITIONS, {})
+
+
+def _save(data: Dict[str, dict]) -> None:
+    try:
+        save_json_atomic(ALBUM_POSITIONS, data)
+    except Exception:
+        pass
+
+
+def get_page(device_id: str, album: str) -> Optional[int]:
+    """Page connue de l'album sur ce téléphone, sinon None."""
+    if not device_id:
+        return None
+    with _LOCK:
+        entry = _load().get(device_id) or {}
+    page = (entry.get("albums") or {}).get(album)
+    return page if isinstance(page, int) else None
+
+
+def record_pages(device_id: str, pages: Dict[str, int]) -> None:
+    """Mémorise la page de chaque album vu (garde la plus petite page)."""
+    if not device_id or not pages:
+        return
+    with _LOCK:
+        data = _load()
+        entry = data.setdefault(device_id, {"albums": {}, "misses": 0})
+        albums = entry.setdefault("albums", {})
+        changed = False
+        for name, page in pages.items():
+            if name and albums.get(name) != page and (name not in albums or page < albums[name]):
+                albums[name] = page
+                changed = True
+        if changed:
+            _save(data)
+
+
+def record_hit(device_id: str, album: str, page: int) -> None:
+    """Album trouvé à cette page → position confirmée, misses remis à zéro."""
+    if not device_id:
+        return
+    with _LOCK:
+        data = _load()
+        entry = data.setdefault(device_id, {"albums": {}, "misses": 0})
+        if entry.get("albums", {}).get(album) == page and not entry.get("misses"):
+            return
+        entry.setdefault("albums", {})[album] = page
+        entry["misses"] = 0
+        _save(data)
+
+
+def record_miss(device_id: str, album: str) -> bool:
+    """
+    Album absent de sa page en cache. Retourne True si le cache du
+    téléphone vient d'être vidé (trop de misses → grille réordonnée).
+    """
+    if not device_id:
+        return False
+    with _LOCK:
+        data = _load()
+        entry = data.setdefault(device_id, {"albums": {}, "misses": 0})
+        entry.get("albums", {}).pop(album, None)
+        entry["misses"] = int(entry.get("misses", 0)) + 1
+        reset = entry["misses"] >= MISS_LIMIT
+        if reset:
+            data[device_id] = {"albums": {}, "misses": 0}
+        _save(data)
+    return reset
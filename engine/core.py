@@ -4,6 +4,24 @@ Core helpers partagés par les engines StoryFX.
 Centralise ADB / Appium + actions réutilisables dans la Galerie.
 """
 from ui.ui_devices import ensure_appium_running
+from ui.ui_adb_connections import ensure_device_connected
+from ui.ui_paths_helpers import adb_run, adb_shell
+from .waits import (
+    wait_for_element,
+    wait_for_match,
+    wait_for_package,
+    wait_for_change,
+    wait_gone,
+    click_first,
+    current_activity,
+)
+from .snapshot import get_snapshot, parse_bounds, snapshot_enabled, invalidate as invalidate_snapshot
+from .screens import foreground_package, wait_for_screen
+from .selector_cache import driver_context, set_driver_context
+from .selector_compiler import find_elements, java_string
+from . import album_positions
+from .upload_watch import guard_uploads
+from .tracing import instrument_driver, trace_module
 import time
 import subprocess
 import traceback
@@ -20,6 +38,9 @@ import winsound
 from appium import webdriver
 from appium.webdriver.common.appiumby import AppiumBy
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.actions import interaction
+from selenium.webdriver.common.actions.action_builder import ActionBuilder
+from selenium.webdriver.common.actions.pointer_input import PointerInput
 
 from appium.webdriver.common.appiumby import AppiumBy
 from appium.webdriver.extensions.android.nativekey import AndroidKey
@@ -93,11 +114,7 @@ def adb_swipe_unlock(device_id: str):
 
         # 1) Réveiller l'écran (KEYCODE_WAKEUP = 224)
         try:
-            subprocess.run(
-                [ADB_PATH, "-s", device_id, "shell", "input", "keyevent", "224"],
-                check=False,
-                env=ADB_ENV,
-            )
+            adb_shell(device_id, "input keyevent 224")
         except Exception as exc:
             log(f"[Screen][ADB][WARN] keyevent 224 a échoué : {exc!r}")
 
@@ -105,15 +122,8 @@ def adb_swipe_unlock(device_id: str):
 
         # 2) Récupérer la taille de l'écran
         try:
-            proc = subprocess.run(
-                [ADB_PATH, "-s", device_id, "shell", "wm", "size"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                env=ADB_ENV,
-            )
-            out = proc.stdout or ""
-            m = re.search(r"Physical size:\s*(\d+)x(\d+)", out)
+            _, out = adb_shell(device_id, "wm size")
+            m = re.search(r"Physical size:\s*(\d+)x(\d+)", out or "")
             if m:
                 w = int(m.group(1))
                 h = int(m.group(2))
@@ -130,15 +140,7 @@ def adb_swipe_unlock(device_id: str):
 
         # 3) Swipe bas → haut
         try:
-            subprocess.run(
-                [
-                    ADB_PATH, "-s", device_id,
-                    "shell", "input", "swipe",
-                    str(x), str(start_y), str(x), str(end_y), "800"
-                ],
-                check=False,
-                env=ADB_ENV,
-            )
+            adb_shell(device_id, f"input swipe {x} {start_y} {x} {end_y} 800")
             time.sleep(0.8)
             log("[Screen][ADB] Swipe unlock envoyé.")
         except Exception as exc:
@@ -189,15 +191,10 @@ def adb_devices_text():
     """
     Exécute adb devices et filtre l'émulateur.
     """
-    try:
-        out = subprocess.check_output(
-            [ADB_PATH, "devices"],
-            env=ADB_ENV,
-            stderr=subprocess.STDOUT,
-            text=True
-        )
-    except Exception as exc:
-        return f"[ADB ERROR] {exc}"
+    # Protocole natif (liste tenue à jour par host:track-devices), sinon adb.exe
+    code, out = adb_run("adb devices")
+    if code != 0 and not out.startswith("List of devices"):
+        return f"[ADB ERROR] {out.strip()}"
 
     # On supprime toutes les lignes emulator-5554
     filtered = []
@@ -241,12 +238,12 @@ def adb_devices_filtered_text() -> str:
 
 def ensure_adb_connected(device_id: str) -> bool:
     """
-    Force ADB à n'avoir qu'UN SEUL device réseau actif :
-      - adb disconnect  (tous les devices ip:port)
-      - adb connect <device_id>  (ex: 192.168.1.123:5555)
+    Vérifie / rétablit la connexion ADB du SEUL device cible :
+      - adb -s <device_id> get-state  → rien à faire si "device"
+      - sinon adb connect <device_id> (disconnect ciblé si offline)
 
-    Si device_id ne contient pas ":", on reste sur l'ancien comportement
-    (cas d'un serial USB brut).
+    Les autres téléphones de la flotte ne sont plus déconnectés
+    (verrou par téléphone, voir ui/ui_adb_connections.py).
     """
     device_id = (device_id or "").strip()
 
@@ -256,49 +253,12 @@ def ensure_adb_connected(device_id: str) -> bool:
         log(f"[WARN] Device id '{device_id}' rejeté (non ip:port ou emulator/5554).")
         return False
 
-    # Cas classique StoryFX : device_id = "ip:port"
-    if ":" in device_id:
-        log(f"ADB reset : déconnexion de tous les devices puis connexion sur {device_id} ...")
-
-        # 1) on vide toutes les connexions réseau
-        try:
-            subprocess.run([ADB_PATH, "disconnect"], check=False, env=ADB_ENV)
-        except Exception as exc:
-            log(f"[WARN] adb disconnect a échoué : {exc!r}")
-
-        time.sleep(0.5)
-
-        # 2) on connecte UNIQUEMENT le device cible
-        try:
-            subprocess.run([ADB_PATH, "connect", device_id], check=False, env=ADB_ENV)
-        except Exception as exc:
-            log(f"[WARN] adb connect {device_id} a échoué : {exc!r}")
-
-        time.sleep(1.0)
-
-        # 🔥 on log maintenant la version filtrée
-        filtered = adb_devices_filtered_text()
-        log(filtered.strip())
-
-        # et on vérifie uniquement dans la liste filtrée
-        if device_id in filtered:
-            log(f"ADB connection OK sur {device_id}")
-
-            # 🔥 Déverrouillage ADB pour les lockscreens type "Swipe to open"
-            adb_swipe_unlock(device_id)
-
-            return True
-
-        log(f"[WARN] ADB device {device_id} non connecté après reset.")
-        return False
-
-    # Cas plus rare : device_id est un serial USB (sans ip:port)
-    out = adb_devices_text()
-    if device_id and device_id in out:
-        log(f"ADB already connected (USB) : {device_id}")
+    if ensure_device_connected(device_id, log=log):
+        # 🔥 Déverrouillage ADB pour les lockscreens type "Swipe to open"
+        adb_swipe_unlock(device_id)
         return True
 
-    log(f"Device id '{device_id}' is not of form ip:port, cannot auto-connect.")
+    log(f"[WARN] ADB device {device_id} non connecté.")
     return False
 
 # ------------------------------------------------------------------ #
@@ -362,14 +322,41 @@ def play_critical_sound():
 
 
 
-def make_driver(device_id: str, platform_version: Optional[str] = None, profile: dict | None = None):
+def system_port_for_device(device_id: str) -> int:
+    """
+    Port systemPort UiAutomator2 dédié à un téléphone (8200, 8201, ...).
+
+    Indispensable pour faire tourner plusieurs sessions Appium en parallèle :
+    deux téléphones sur le même systemPort se volent la session.
+    L'index est stable : ordre trié des device_id uniques de profiles.json.
+    """
+    try:
+        from ui.ui_paths_helpers import load_profiles_dict
+        ids = sorted({
+            (cfg.get("device_id") or "").strip()
+            for cfg in load_profiles_dict().values()
+            if (cfg.get("device_id") or "").strip()
+        })
+        if device_id in ids:
+            return 8200 + ids.index(device_id)
+    except Exception:
+        pass
+    return 8200 + (sum(device_id.encode("utf-8")) % 100)
+
+
+def make_driver(device_id: str, platform_version: Optional[str] = None, profile: dict | None = None,
+                new_command_timeout: int = 180, resume: bool = False):
+    """
+    Nouvelle session UiAutomator2 sur la Galerie.
+    resume=True : écran laissé tel quel (flow interrompu à reprendre, cf. engine.steps).
+    """
     caps = {
         "platformName": "Android",
         "deviceName": device_id,
         "automationName": "UiAutomator2",
         "noReset": True,
         "autoGrantPermissions": True,
-        "newCommandTimeout": 180,
+        "newCommandTimeout": new_command_timeout,  # > TTL du pool de sessions
         "appPackage": "com.sec.android.gallery3d",
         "appActivity": "com.sec.android.gallery3d.app.GalleryActivity",
     }
@@ -387,6 +374,10 @@ def make_driver(device_id: str, platform_version: Optional[str] = None, profile:
     if platform_version:
         caps["platformVersion"] = str(platform_version)
 
+    # Reprise : ne pas relancer la Galerie par-dessus la sélection / feuille de partage
+    if resume:
+        caps["autoLaunch"] = False
+
     # ✅ Overides par profil (venant du FRONT via profiles.json)
     overrides = (profile or {}).get("appium_overrides") or {}
     if not isinstance(overrides, dict):
@@ -406,6 +397,8 @@ def make_driver(device_id: str, platform_version: Optional[str] = None, profile:
             options.set_capability("appium:adbExec", r"C:\Tools\ADB_StoryFX\adb.exe")
             options.set_capability("appium:ignoreHiddenApiPolicyError", True)
             options.set_capability("appium:disableWindowAnimation", True)
+            # Un systemPort par téléphone → sessions parallèles possibles
+            options.set_capability("appium:systemPort", system_port_for_device(device_id))
 
             # ✅ appliquer les overrides (S20/S23/etc.)
             for k, v in overrides.items():
@@ -414,8 +407,8 @@ def make_driver(device_id: str, platform_version: Optional[str] = None, profile:
             ensure_appium_running()
             # ✅ Reset UiAutomator2 côté device avant nouvelle session (évite zombie)
             try:
-                subprocess.run([ADB_PATH, "-s", device_id, "shell", "am", "force-stop", "io.appium.uiautomator2.server"], env=ADB_ENV, check=False)
-                subprocess.run([ADB_PATH, "-s", device_id, "shell", "am", "force-stop", "io.appium.uiautomator2.server.test"], env=ADB_ENV, check=False)
+                adb_shell(device_id, "am force-stop io.appium.uiautomator2.server")
+                adb_shell(device_id, "am force-stop io.appium.uiautomator2.server.test")
                 time.sleep(0.3)
             except Exception:
                 pass
@@ -425,13 +418,16 @@ def make_driver(device_id: str, platform_version: Optional[str] = None, profile:
             driver = webdriver.Remote(server_url, desired_capabilities=caps)
 
         log("Driver created OK.")
+        instrument_driver(driver)   # STORYFX_TRACE : span par commande WebDriver
+        set_driver_context(driver, device_id, (profile or {}).get("profile_name"))
 
         # 🔥 Nettoyage visuel + retour Galerie AVANT de continuer StoryFX
-        try:
-            clear_popups_and_go_home(driver)
-            open_gallery(driver)
-        except Exception as e:
-            log(f"[WARN] Impossible de nettoyer l'écran / ouvrir la Galerie : {e!r}")
+        if not resume:
+            try:
+                clear_popups_and_go_home(driver)
+                open_gallery(driver)
+            except Exception as e:
+                log(f"[WARN] Impossible de nettoyer l'écran / ouvrir la Galerie : {e!r}")
 
         return driver
 
@@ -612,6 +608,9 @@ def reset_gallery_home(driver) -> bool:
     - kill TikTok
     - relance Galerie
     - tente d'aller sur l'onglet Albums
+
+    Une app dont l'upload tourne encore (notification de progression) n'est
+    pas tuée avant la fin de l'upload (engine.upload_watch).
     """
     log("Reset Gallery : kill apps + relance Galerie + onglet Albums...")
 
@@ -627,7 +626,11 @@ def reset_gallery_home(driver) -> bool:
         # "com.ss.android.ugc.trill",   # (optionnel) autre package TikTok selon régions
     ]
 
+    uploading = guard_uploads(driver_context(driver).get("device_id"), PACKAGE_IDS[1:])
     for pkg in PACKAGE_IDS:
+        if pkg in uploading:
+            log(f"[upload] {pkg} toujours en upload : app laissée ouverte.")
+            continue
         try:
             driver.terminate_app(pkg)
             log(f"App terminée : {pkg}")
@@ -635,16 +638,29 @@ def reset_gallery_home(driver) -> bool:
             pass
 
     # 2) Relancer proprement la Galerie puis aller sur l’onglet Albums
+    return gallery_albums_home(driver)
+
+
+def gallery_albums_home(driver) -> bool:
+    """
+    Galerie au premier plan sur l'onglet Albums, SANS tuer d'app
+    (re-navigation entre deux phases d'un même job, cf. engine_intro_multi).
+    """
     if not start_gallery(driver):
         return False
     for _ in range(3):
-        if tap_albums_tab(driver):
+        # 1 snapshot : barre d'onglets visible ? album / visionneuse ouverts ?
+        screen = wait_for_screen(driver, ("gallery.tabs", "gallery.album_content"),
+                                 timeout=3.0, label="gallery.screen")
+        unknown = screen is None and snapshot_enabled()
+        if screen != "gallery.album_content" and tap_albums_tab(driver, timeout=1.0 if unknown else 5.0):
             return True
+        # Autre écran → retour direct (au lieu d'épuiser les sélecteurs Albums)
         try:
             driver.back()
         except Exception:
             pass
-        time.sleep(0.5)
+        invalidate_snapshot(driver)
 
     log("[ERROR] Impossible de revenir sur la vue Albums après reset.")
     return False
@@ -654,8 +670,10 @@ def start_gallery(driver) -> bool:
     log("Trying activate_app('com.sec.android.gallery3d') ...")
     try:
         driver.activate_app("com.sec.android.gallery3d")
-        time.sleep(1.5)
-        log(f"Current package after activate_app: {driver.current_package}")
+        # Rend la main dès que la Galerie est au premier plan (au lieu de 1.5 s fixes)
+        pkg = wait_for_package(driver, "com.sec.android.gallery3d", timeout=5.0,
+                               label="gallery.start")
+        log(f"Current package after activate_app: {pkg or driver.current_package}")
         return True
     except Exception:
         log("[WARN] activate_app failed, trying start_activity fallbacks ...")
@@ -670,7 +688,7 @@ def start_gallery(driver) -> bool:
         try:
             log(f"Trying start_activity({pkg}, {act}) ...")
             driver.start_activity(pkg, act)
-            time.sleep(1.5)
+            wait_for_package(driver, pkg, timeout=5.0, label="gallery.start")
             log(f"Current package: {driver.current_package}")
             return True
         except Exception:
@@ -725,17 +743,10 @@ def tap_albums_tab(driver, timeout: float = 5.0) -> bool:
         "//*[@text='Albums' or @text='Album' or contains(@text,'Albums') or contains(@text,'Album')]",
     ]
 
-    # --- Essais XPATH robustes ---
-    for xp in xpaths:
-        try:
-            el = WebDriverWait(driver, timeout).until(
-                EC.element_to_be_clickable((AppiumBy.XPATH, xp))
-            )
-            el.click()
-            time.sleep(0.6)
-            return True
-        except Exception:
-            pass
+    # --- Essais XPATH robustes : TOUS les sélecteurs à chaque tour de polling ---
+    # (avant : WebDriverWait de `timeout` s PAR xpath → jusqu'à 35 s au pire)
+    if click_first(driver, xpaths, timeout=timeout, label="gallery.albums_tab", remember=True):
+        return True
 
     # 2) Fallback UiSelector (texte / description, avec ou sans "s")
     ui_selectors = [
@@ -747,52 +758,179 @@ def tap_albums_tab(driver, timeout: float = 5.0) -> bool:
         'new UiSelector().descriptionContains("Album")',
     ]
 
-    for ui in ui_selectors:
+    if click_first(driver, ui_selectors, timeout=0.0, label="gallery.albums_tab",
+                   strategy="uiautomator"):
+        return True
+
+    # 3) Dernière chance : icône 2e position dans la barre (fragile mais utile en secours)
+    if click_first(
+        driver,
+        '(//android.widget.ImageView[@resource-id="com.sec.android.gallery3d:id/icon"])[2]',
+        timeout=0.0,
+        label="gallery.albums_tab",
+    ):
+        return True
+
+    log("Could not tap Albums tab (all strategies failed).")
+    return False
+
+
+
+def _window_size(driver) -> dict:
+    """get_window_size() une seule fois par session (ne change pas en portrait)."""
+    size = getattr(driver, "_storyfx_window", None)
+    if size is None:
+        size = driver.get_window_size()
         try:
-            driver.find_element(AppiumBy.ANDROID_UIAUTOMATOR, ui).click()
-            time.sleep(0.6)
-            return True
+            driver._storyfx_window = size
         except Exception:
             pass
+    return size
 
-    # 3) Dernière chance : icône 2e position dans la barre (fragile mais utile en secours)
+
+def touch_gesture(driver):
+    """(ActionBuilder, doigt) : tous les gestes ajoutés partent en UNE requête perform()."""
+    finger = PointerInput(interaction.POINTER_TOUCH, "finger")
+    return ActionBuilder(driver, mouse=finger), finger
+
+
+def add_tap(finger, x: int, y: int, gap: float = 0.15) -> None:
+    finger.create_pointer_move(duration=0, x=x, y=y)
+    finger.create_pointer_down(button=0)
+    finger.create_pause(0.05)
+    finger.create_pointer_up(button=0)
+    finger.create_pause(gap)   # laisse la Galerie enregistrer le tap
+
+
+def add_drag(finger, x: int, start_y: int, end_y: int, duration_ms: int = 300) -> None:
+    """Glissé contrôlé : pause avant de relâcher = pas d'inertie."""
+    finger.create_pointer_move(duration=0, x=x, y=start_y)
+    finger.create_pointer_down(button=0)
+    finger.create_pointer_move(duration=duration_ms, x=x, y=end_y)
+    finger.create_pause(0.15)
+    finger.create_pointer_up(button=0)
+
+
+def page_drag(driver, pages: int = 1) -> None:
+    """
+    Descend la grille de `pages` écrans en UNE requête W3C.
+    Distance reproductible (glissés sans inertie) → une position en cache
+    reste valable.
+    """
+    if pages <= 0:
+        return
+    size = _window_size(driver)
+    x = size["width"] // 2
+    builder, finger = touch_gesture(driver)
+    for _ in range(pages):
+        add_drag(finger, x, int(size["height"] * 0.80), int(size["height"] * 0.20))
     try:
-        el = WebDriverWait(driver, timeout).until(
-            EC.element_to_be_clickable((
-                AppiumBy.XPATH,
-                '(//android.widget.ImageView[@resource-id="com.sec.android.gallery3d:id/icon"])[2]'
-            ))
-        )
-        el.click()
-        time.sleep(0.6)
-        return True
-    except Exception:
-        log("Could not tap Albums tab (all strategies failed).")
+        builder.perform()
+    finally:
+        invalidate_snapshot(driver)
+
+
+def _visible_texts(driver) -> set:
+    """Textes des TextView à l'écran (1 page_source si lxml, sinon find_elements)."""
+    snap = get_snapshot(driver, fresh=True)
+    if snap is not None:
+        return {t for t in snap.root.xpath("//android.widget.TextView/@text") if t}
+    texts = set()
+    for el in find_elements(driver, "//android.widget.TextView"):
+        try:
+            if el.text:
+                texts.add(el.text)
+        except Exception:
+            pass
+    return texts
+
+
+def _click_album(driver, name: str, timeout: float) -> bool:
+    """Clique l'album s'il est visible puis attend ses vignettes."""
+    if not click_first(driver, f"//android.widget.TextView[@text='{name}']",
+                       timeout=timeout, label="gallery.album_name"):
         return False
+    # Album ouvert dès que les vignettes sont là (au lieu de 0.8 s fixes)
+    wait_for_element(
+        driver,
+        "//android.widget.FrameLayout[@resource-id="
+        "'com.sec.android.gallery3d:id/thumbnail_preview_layout']",
+        timeout=5.0,
+        label="gallery.album_thumbs",
+    )
+    return True
 
 
+def _scroll_album_into_view(driver, name: str, max_swipes: int) -> bool:
+    """UiScrollable.scrollIntoView côté serveur : 1 seul appel (repart du début)."""
+    expr = (
+        "new UiScrollable(new UiSelector().scrollable(true).instance(0))"
+        f".setMaxSearchSwipes({max_swipes})"
+        f".scrollIntoView(new UiSelector().text({java_string(name)}))"
+    )
+    try:
+        driver.find_element(AppiumBy.ANDROID_UIAUTOMATOR, expr)
+    except Exception as e:
+        log(f"[WARN] scrollIntoView('{name}') KO : {e!r}")
+        return False
+    finally:
+        invalidate_snapshot(driver)
+    return _click_album(driver, name, timeout=1.0)
+
 
 def open_album(driver, name: str, max_scrolls: int = 8) -> bool:
-    """Ouvre un album par son nom, en scrollant si besoin."""
-    for _ in range(max_scrolls):
-        try:
-            driver.find_element(
-                AppiumBy.XPATH,
-                f"//android.widget.TextView[@text='{name}']"
-            ).click()
-            time.sleep(0.8)
-            log(f"Album '{name}' ouvert.")
+    """
+    Ouvre un album par son nom :
+      0) déjà visible → clic
+      1) page connue (config/album_positions.json) → 1 geste multi-pages + clic
+      2) sinon parcours page par page (apprend la page de chaque album vu)
+      3) dernier recours : UiScrollable.scrollIntoView (1 appel serveur)
+    """
+    device_id = driver_context(driver).get("device_id", "")
+
+    # 0) La liste des albums peut encore se charger après l'onglet Albums
+    if _click_album(driver, name, timeout=1.5):
+        album_positions.record_hit(device_id, name, 0)
+        log(f"Album '{name}' ouvert.")
+        return True
+
+    page = album_positions.get_page(device_id, name)
+    if page:
+        # 1) Position en cache : on y va directement
+        page_drag(driver, page)
+        if _click_album(driver, name, timeout=1.0):
+            album_positions.record_hit(device_id, name, page)
+            log(f"Album '{name}' ouvert (page {page} en cache).")
             return True
-        except Exception:
-            # scroll down
-            size = driver.get_window_size()
-            start_y = int(size["height"] * 0.75)
-            end_y = int(size["height"] * 0.25)
-            x = int(size["width"] * 0.5)
-            driver.swipe(x, start_y, x, end_y, 900)
-            time.sleep(0.3)
+        if album_positions.record_miss(device_id, name):
+            log("[album] Trop d'albums déplacés : cache de positions vidé pour ce téléphone.")
+        else:
+            log(f"[album] '{name}' absent de la page {page} en cache (miss).")
+    else:
+        # 2) Parcours : ouvre l'album ET mémorise la page de tous les albums vus
+        texts = _visible_texts(driver)
+        seen = {t: 0 for t in texts}
+        for p in range(1, max_scrolls + 1):
+            before = texts
+            page_drag(driver, 1)
+            texts = _visible_texts(driver)
+            for t in texts:
+                seen.setdefault(t, p)
+            if name in texts and _click_album(driver, name, timeout=1.0):
+                album_positions.record_pages(device_id, seen)
+                album_positions.record_hit(device_id, name, p)
+                log(f"Album '{name}' ouvert (page {p}).")
+                return True
+            if texts == before:
+                break   # bas de la grille
+        album_positions.record_pages(device_id, seen)
+
+    # 3) Dernier recours côté serveur
+    if _scroll_album_into_view(driver, name, max_swipes=max(max_scrolls, 20)):
+        log(f"Album '{name}' ouvert (scrollIntoView).")
+        return True
+
     log(f"[ERROR] Album '{name}' not found after {max_scrolls} scrolls.")
-    traceback.print_exc()
     return False
 
 def long_press_first_thumb(driver, retries: int = 1) -> bool:
@@ -815,8 +953,14 @@ def long_press_first_thumb(driver, retries: int = 1) -> bool:
         try:
             log(f"[multi] Tentative long-press {attempt}/{retries}...")
 
-            # 1) trouver la première vignette
-            thumb = driver.find_element(AppiumBy.XPATH, xpath_first_thumb)
+            # 1) trouver la première vignette (polling court si la grille charge encore)
+            thumb = wait_for_element(driver, xpath_first_thumb, timeout=5.0,
+                                     label="gallery.first_thumb")
+            if thumb is None:
+                raise RuntimeError("première vignette introuvable")
+            if hasattr(thumb, "resolve"):
+                # ActionChains exige un vrai WebElement (pas un nœud du snapshot)
+                thumb = thumb.resolve()
             log("[multi] Première vignette trouvée via XPATH historique.")
 
             # 2) long press pour activer la multi-sélection
@@ -856,13 +1000,17 @@ def select_first_video_then_share(driver) -> bool:
     """
     try:
         # 👉 même XPath que dans tes scripts "Never_Give_Up" / "Hurry"
-        first = driver.find_element(
-            AppiumBy.XPATH,
+        first = wait_for_element(
+            driver,
             "(//android.widget.FrameLayout[@resource-id="
-            "'com.sec.android.gallery3d:id/thumbnail_preview_layout'])[1]"
+            "'com.sec.android.gallery3d:id/thumbnail_preview_layout'])[1]",
+            timeout=5.0,
+            label="gallery.first_thumb",
         )
+        if first is None:
+            raise RuntimeError("thumbnail_preview_layout introuvable")
         first.click()
-        time.sleep(0.5)
+        # Pas de pause : tap_share_button() attend lui-même le bouton Share
         log("Première vignette ouverte avec succès.")
     except Exception:
         log("[ERROR] Could not open first thumbnail (thumbnail_preview_layout).")
@@ -884,22 +1032,8 @@ def tap_share_button(driver) -> bool:
       0) XPath personnalisé depuis locators.json (platform='Gallery', key='share')
       1) Liste de XPaths "classiques" (fallback)
     """
-    import traceback
-
-    tried_xpaths = []
-
     # 0) XPath personnalisé depuis locators.json
     custom_xp = get_locator("Gallery", "share")
-    if custom_xp:
-        tried_xpaths.append(custom_xp)
-        try:
-            el = driver.find_element(AppiumBy.XPATH, custom_xp)
-            el.click()
-            time.sleep(0.8)
-            log(f"Share button clicked with CUSTOM XPath: {custom_xp}")
-            return True
-        except Exception as e:
-            log(f"[WARN] Custom Share XPath KO: {custom_xp!r} ({e!r})")
 
     # 1) Fallbacks classiques
     xpaths_to_try = [
@@ -913,25 +1047,29 @@ def tap_share_button(driver) -> bool:
         "//*[@text='Partager']",
         "//*[@resource-id='com.sec.android.gallery3d:id/share']",
     ]
-
-    last_error = None
-
-    for xp in xpaths_to_try:
-        tried_xpaths.append(xp)
+    tried_xpaths = ([custom_xp] if custom_xp else []) + xpaths_to_try
+
+    # Tous les XPaths à chaque tour : on rend la main dès que Share est affiché
+    # Le dernier XPath gagnant sur ce profil / cette version de Galerie passe en tête
+    match = wait_for_match(driver, tried_xpaths, timeout=5.0, label="gallery.share_button",
+                           remember=True)
+    if match is not None:
+        xp, el = match
+        before = current_activity(driver)
         try:
-            el = driver.find_element(AppiumBy.XPATH, xp)
             el.click()
-            time.sleep(0.8)
-            log(f"Share button clicked with XPath: {xp}")
+            # Feuille de partage ouverte = changement d'activité (au lieu de 0.8 s fixes)
+            wait_for_change(driver, before_activity=before, timeout=3.0,
+                            label="gallery.share_sheet")
+            prefix = "CUSTOM XPath" if xp == custom_xp else "XPath"
+            log(f"Share button clicked with {prefix}: {xp}")
             return True
         except Exception as e:
-            last_error = e
-            log(f"[WARN] Share introuvable avec XPath: {xp!r}")
+            log(f"[WARN] Clic Share KO avec XPath: {xp!r} ({e!r})")
+            traceback.print_exc()
 
     log("[ERROR] Share button not found in Gallery with any known XPath.")
     log(f"[DEBUG] XPaths testés pour Share: {tried_xpaths}")
-    if last_error is not None:
-        traceback.print_exc()
     return False
 
 
@@ -952,16 +1090,13 @@ def choose_whatsapp_business_if_needed(driver, profile_name: str | None = None)
 
     xpath = "//*[contains(@text,'WhatsApp')]"
 
-    for attempt in range(1, 4):  # 3 petites tentatives max
-        try:
-            el = driver.find_element(AppiumBy.XPATH, xpath)
-            el.click()
-            time.sleep(0.8)
-            log(f"WhatsApp Business sélectionné (generic:text_contains(WhatsApp), attempt={attempt}).")
-            return
-        except Exception:
-            log(f"[WARN] Impossible de trouver WhatsApp Business (generic, attempt={attempt}).")
-            time.sleep(0.6)
+    # Polling jusqu'à ~4 s (≈ les 3 anciennes tentatives espacées)
+    if click_first(driver, xpath, timeout=4.0, label="wab.share_target"):
+        # Rend la main dès que WhatsApp Business est au premier plan
+        wait_for_package(driver, ("com.whatsapp.w4b", "com.whatsapp"), timeout=5.0,
+                         label="wab.open")
+        log("WhatsApp Business sélectionné (generic:text_contains(WhatsApp)).")
+        return
 
     log("❌ Impossible de sélectionner WhatsApp Business avec le XPath générique.")
 
@@ -973,33 +1108,20 @@ def share_to_my_status(driver) -> None:
                  "(contains(@text,'My status') or contains(@text,'Mon statut'))]")
 
     # Choix du statut
-    for _ in range(5):
-        try:
-            driver.find_element(AppiumBy.XPATH, my_status).click()
-            time.sleep(0.6)
-            break
-        except Exception:
-            time.sleep(0.4)
+    click_first(driver, my_status, timeout=5.0, label="wab.my_status")
 
     # Bouton envoyer
     send_xpath = ("//*[@content-desc='Send' or @resource-id='com.whatsapp.w4b:id/send' "
                   "or @text='Send' or contains(@content-desc,'Envoyer') or @text='Envoyer']")
 
-    for _ in range(5):
-        try:
-            driver.find_element(AppiumBy.XPATH, send_xpath).click()
-            time.sleep(1.0)
-            break
-        except Exception:
-            time.sleep(0.4)
+    if not click_first(driver, send_xpath, timeout=5.0, label="wab.send"):
+        return
 
-    # Sécurité : reclique au cas où
+    # Sécurité : reclique tant que le bouton Envoyer reste affiché
     for _ in range(3):
-        try:
-            driver.find_element(AppiumBy.XPATH, send_xpath).click()
-            time.sleep(0.8)
-        except Exception:
+        if wait_gone(driver, send_xpath, timeout=1.0, label="wab.send_gone"):
             break
+        click_first(driver, send_xpath, timeout=0.0, label="wab.send")
 
 
 def beep_error():
@@ -1010,6 +1132,68 @@ def beep_error():
         pass
 
 
+THUMB_XPATH = (
+    "//android.widget.FrameLayout[@resource-id="
+    "'com.sec.android.gallery3d:id/thumbnail_preview_layout']"
+)
+
+
+def visible_thumb_centers(driver) -> list:
+    """
+    Centres (x, y) des vignettes entièrement visibles, lus sur UN snapshot
+    (sinon find_elements + rect). Les vignettes coupées en haut / bas de la
+    grille ont des bounds rognés → écartées (un tap dessus peut rater).
+    """
+    rects = []
+    snap = get_snapshot(driver, fresh=True)
+    if snap is not None:
+        for node in snap.root.xpath(THUMB_XPATH):
+            b = parse_bounds(node.get("bounds"))
+            if b is not None:
+                rects.append(b)
+    else:
+        for el in find_elements(driver, THUMB_XPATH):
+            try:
+                r = el.rect
+                rects.append((r["x"], r["y"], r["x"] + r["width"], r["y"] + r["height"]))
+            except Exception:
+                continue
+
+    rects = [r for r in rects if r[2] > r[0] and r[3] > r[1]]
+    if not rects:
+        return []
+    full_w = max(r[2] - r[0] for r in rects)
+    full_h = max(r[3] - r[1] for r in rects)
+    return [
+        ((x1 + x2) // 2, (y1 + y2) // 2)
+        for x1, y1, x2, y2 in rects
+        if (x2 - x1) >= 0.9 * full_w and (y2 - y1) >= 0.9 * full_h
+    ]
+
+
+# En-tête du mode multi-sélection de la Galerie ("3 selected", "Select items")
+SELECTED_COUNT_RE = re.compile(r"^\s*(\d+)\s+(?:selected|sélectionné)", re.IGNORECASE)
+SELECT_NONE_TEXTS = ("Select items", "Sélectionner des éléments")
+
+
+def gallery_selected_count(driver) -> Optional[int]:
+    """
+    Nombre de médias sélectionnés, lu sur UN snapshot de la Galerie en mode
+    multi-sélection. None hors sélection, Galerie pas devant ou sans snapshot.
+    """
+    snap = get_snapshot(driver, fresh=True)
+    if snap is None or foreground_package(snap.root) != "com.sec.android.gallery3d":
+        return None
+    for node in snap.root.iter():
+        text = node.get("text") or ""
+        m = SELECTED_COUNT_RE.match(text)
+        if m:
+            return int(m.group(1))
+        if text in SELECT_NONE_TEXTS:
+            return 0
+    return None
+
+
 def debug_dump_thumbnails(driver):
     log("=== 🔍 DEBUG THUMBNAILS DUMP ===")
 
@@ -1043,4 +1227,10 @@ def debug_dump_thumbnails(driver):
         log("❌ Aucune vignette trouvée automatiquement !")
         beep_error()
     else:
-        log("✔ Vignettes détectées automatiquement.")
\ No newline at end of file
+        log("✔ Vignettes détectées automatiquement.")
+
+
+# ==========================================================================
+# 🔬 Tracing (STORYFX_TRACE=1) : span autour de chaque helper du module
+# ==========================================================================
+trace_module(sys.modules[__name__])
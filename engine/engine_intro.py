@@ -8,12 +8,10 @@ Engine INTRO
 - Sélectionne la première vidéo
 - Partage selon la plateforme (WhatsApp géré pour l’instant)
 """
-import time   # 👈 AJOUTER ÇA
 from .platforms import pre_platform_setup, share_to_platform
 from .core import (
     log,
     ensure_adb_connected,
-    make_driver,
     open_album,
     select_first_video_then_share,
     choose_whatsapp_business_if_needed,
@@ -23,6 +21,138 @@ from .core import (
     start_gallery,  # ⬅️ ajouter ceci
 
 )
+from .results import RunResult, begin, fail, timed
+from .screens import classify
+from .session_pool import acquire_driver, release_driver
+from .share_intents import send_media
+from .snapshot import invalidate as invalidate_snapshot
+from .steps import clear as clear_checkpoint, resumable, run_steps
+from ui.ui_mediastore import MEDIA_TYPE_VIDEO, query_album_media
+from .upload_watch import wait_platform_upload
+from .waits import SelectorMiss, wait_for_change, wait_for_package, log_wait_summary
+
+
+def _share_first_video_direct(driver, device_id: str, album: str, platform: str) -> bool:
+    """
+    Sans Galerie : 1ʳᵉ vidéo de l'album (ordre de la grille : la plus
+    récente) lue dans MediaStore, envoyée par intent SEND à l'activité de
+    partage de la plateforme. True seulement si l'activité de partage
+    explicite (-n) a pris la main : les flows in_app savent sur quel écran
+    ils arrivent. False → flow Galerie habituel.
+    """
+    videos = query_album_media(device_id, album, media_types=(MEDIA_TYPE_VIDEO,), newest_first=True)
+    if not videos:
+        log(f"[intro] MediaStore : aucune vidéo dans '{album}' → flow Galerie.")
+        return False
+
+    first = videos[0]
+    sent = send_media(device_id, platform, [first["uri"]], first.get("mime_type") or "video/*")
+    if not sent:
+        return False
+    package, mode = sent
+    if mode != "component":
+        return False
+
+    if not wait_for_package(driver, package, timeout=6.0, label="intro.intent_handoff"):
+        log(f"[intro] {platform} n'a pas pris la main après l'intent → flow Galerie.")
+        return False
+    invalidate_snapshot(driver)
+    log(f"[intro] Vidéo envoyée directement à {platform} (sans Galerie ni feuille de partage).")
+    return True
+
+
+def flow_key(profile: dict, platform: str, album: str) -> str:
+    """
+    Clé du checkpoint (engine.steps) du flow Galerie intro. Profil et
+    plateforme inclus : un job d'un autre profil sur le même téléphone
+    (S23_IG → S23_FB_CM) ne reprend pas ce flow sans son pre_platform_setup.
+    """
+    return f"intro|{profile.get('profile_name') or ''}|{platform}|{album}"
+
+
+def _open_share_in_gallery(driver, device_id: str, album: str, key: str) -> int:
+    """
+    Flow Galerie en étapes (engine.steps) : Galerie propre → album →
+    1ʳᵉ vidéo + Share. Une relance reprend après la dernière étape dont le
+    résultat est encore à l'écran (feuille de partage ouverte, album ouvert).
+    """
+    def gallery_home(ctx):
+        # Toujours repartir d'une Galerie propre sur l'onglet Albums
+        if reset_gallery_home(driver):
+            return 0
+        log("Impossible de revenir sur la vue Albums.")
+        return 2
+
+    def open_album_step(ctx):
+        if open_album(driver, album):
+            return 0
+        log(f"Album '{album}' introuvable.")
+        return 4
+
+    def share(ctx):
+        if select_first_video_then_share(driver):
+            return 0
+        log("Impossible de sélectionner la première vidéo.")
+        # On lève une exception pour que run_with_retries puisse relancer
+        raise SelectorMiss("select_first_video_then_share() returned False")
+
+    flow = [
+        {"name": "gallery", "run": gallery_home,
+         "check": lambda ctx: classify(driver, ("gallery.tabs",)) == "gallery.tabs"},
+        {"name": "album", "run": open_album_step,
+         "check": lambda ctx: classify(driver, ("gallery.album_content",)) == "gallery.album_content"},
+        {"name": "share", "run": share,
+         "check": lambda ctx: classify(driver, ("share_sheet",)) == "share_sheet"},
+    ]
+    return run_steps(device_id, key, flow, resume=lambda: start_gallery(driver))
+
+
+def post_intro(driver, profile: dict, album: str, platform: str = "WhatsApp",
+               platform_opts: dict | None = None) -> int:
+    """
+    Phase INTRO sur une session déjà prête (ADB, driver, déverrouillage,
+    pre_platform_setup faits par l'appelant) : 1ʳᵉ vidéo de l'album → plateforme.
+    """
+    platform_opts = platform_opts or {}
+    device_id = profile.get("device_id")
+    profile_name = profile.get("profile_name")
+
+    # 🚀 Profil "media_source": "mediastore" → vidéo envoyée directement à l'app
+    in_app = False
+    if profile.get("media_source") == "mediastore":
+        with timed("mediastore_share"):
+            in_app = _share_first_video_direct(driver, device_id, album, platform)
+
+    if not in_app:
+        rc = _open_share_in_gallery(driver, device_id, album, flow_key(profile, platform, album))
+        if rc:
+            return rc
+
+    # 🚀 ICI : feuille de partage Android (Share sheet), ou app cible si in_app
+
+    with timed("platform_flow"):
+        if platform == "WhatsApp":
+            if not in_app:
+                choose_whatsapp_business_if_needed(driver, profile_name)
+            share_to_my_status(driver)
+            log("Partage WhatsApp terminé.")
+        else:
+            share_to_platform(driver, platform, platform_opts, in_app=in_app)
+            log(f"Partage {platform} terminé.")
+
+    # 🕒 Rendre la main dès que l'upload est terminé (jamais avant),
+    #    puis revenir sur la Galerie
+    try:
+        log("Attente de la fin de l'upload, puis retour sur la Galerie...")
+        with timed("upload_wait"):
+            wait_platform_upload(driver, device_id, platform)
+        start_gallery(driver)    # ⬅️ ouvre juste l'appli Galerie au premier plan
+    except Exception:
+        log("[WARN] Impossible de ramener la Galerie au premier plan (INTRO).")
+
+    # Intro publiée : plus rien à reprendre
+    clear_checkpoint(device_id)
+    return 0
 
 
 def run(
@@ -30,114 +160,84 @@ def run(
     album: str,
     platform: str = "WhatsApp",
     platform_opts: dict | None = None,
-) -> int:
+) -> RunResult:
     """
     profile : dict provenant de profiles.json, avec une clé supplémentaire
               'profile_name' ajoutée par runner.py
     album   : nom exact de l’album dans la Galerie
+
+    Codes retour (cf. retry_policy) :
+      1 : ADB non connecté
+      2 : impossible de revenir sur la vue Albums
+      3 : profil sans device_id
+      4 : album introuvable
+      0 : succès
+    (dans un RunResult : rc + durées par étape, cf. engine.results)
+    SelectorMiss si la première vidéo / le bouton Share est introuvable.
     """
     platform_opts = platform_opts or {}
 
-    # Ajouté par runner.py : profile["profile_name"] = args.profile
-    profile_name = profile.get("profile_name")
-
     device_id = profile.get("device_id")
     profile_label = profile.get("profile_name", "?")
     log(f"[intro] Profil : {profile_label} | device_id={device_id}")
+    result = begin("intro", profile_label, platform)
 
     plat_ver = profile.get("platform_version")
 
     if not device_id:
         log("Profil sans device_id, abort.")
-        return 1
+        return result.finish(3)
 
-    if not ensure_adb_connected(device_id):
-        return 1
+    with timed("adb_connect"):
+        connected = ensure_adb_connected(device_id)
+    if not connected:
+        fail("adb_connect")
+        return result.finish(1)
+
+    # Flow interrompu (relance / remise en file) : écran laissé tel quel
+    key = flow_key(profile, platform, album)
+    resuming = resumable(device_id, key)
+    if resuming:
+        log("[intro] Reprise du flow interrompu : ni nettoyage de l'écran ni pre_platform_setup.")
 
     driver = None
     try:
-        # driver = make_driver(device_id, plat_ver)
-        driver = make_driver(device_id, plat_ver, profile=profile)
+        # Session Appium empruntée au pool (réutilisée si encore vivante)
+        with timed("session"):
+            driver = acquire_driver(device_id, plat_ver, profile=profile, resume=resuming)
 
-        unlock_screen_if_needed(driver)
+        with timed("unlock"):
+            unlock_screen_if_needed(driver)
 
         # Préparation spécifique à la plateforme (ex : sélectionner la page Facebook)
-        pre_platform_setup(driver, platform, platform_opts)
-
-        # Toujours repartir d'une Galerie propre sur l'onglet Albums
-        if not reset_gallery_home(driver):
-            log("Impossible de revenir sur la vue Albums.")
-            return 1
-
-        if not open_album(driver, album):
-            log(f"Album '{album}' introuvable.")
-            return 1
-
-        if not select_first_video_then_share(driver):
-            log("Impossible de sélectionner la première vidéo.")
-            # On lève une exception pour que run_with_retries puisse relancer
-            raise RuntimeError("select_first_video_then_share() returned False")
-
-        # 🚀 ICI : on est sur la feuille de partage Android (Share sheet)
-
-        if platform == "WhatsApp":
-            choose_whatsapp_business_if_needed(driver, profile_name)
-            share_to_my_status(driver)
-            log("Partage WhatsApp terminé.")
-        else:
-            share_to_platform(driver, platform, platform_opts)
-            log(f"Partage {platform} terminé.")
+        if not resuming:
+            with timed("platform_setup"):
+                pre_platform_setup(driver, platform, platform_opts)
 
-        # 🕒 Laisser 2–3 s pour que l'upload démarre
-        try:
-            log("Attente 2 s, puis retour sur la Galerie...")
-            time.sleep(2.0)          # tu peux mettre 3.0 si tu veux plus
-            start_gallery(driver)    # ⬅️ ouvre juste l'appli Galerie au premier plan
-        except Exception:
-            log("[WARN] Impossible de ramener la Galerie au premier plan (INTRO).")
-
-        return 0
-
-        # if platform == "WhatsApp":
-        #     # Icône WhatsApp Business dans la feuille de partage
-        #     choose_whatsapp_business_if_needed(driver, profile_name)
-        #     # Puis "My status" / "Mon statut" + bouton Envoyer
-        #     share_to_my_status(driver)
-        #     log("Partage WhatsApp terminé.")
-        # else:
-        #     # Facebook / Instagram / TikTok
-        #     share_to_platform(driver, platform, platform_opts)
-        #     log(f"Partage {platform} terminé.")
-        #
-        # # ✅ Très important : code de succès
-        # return 0
-        #
+        return result.finish(post_intro(driver, profile, album, platform, platform_opts))
 
     finally:
         if driver is not None:
-            try:
-                # 🔥 Forcer Android à rester sur Galerie
-                driver.activate_app("com.sec.android.gallery3d")
-                time.sleep(1.0)
-            except Exception:
-                pass
-
-            try:
-                # ⚠️ Petit hack : envoyer HOME mais en laissant Galerie ouverte
-                driver.press_keycode(3)  # HOME
-                time.sleep(0.8)
-            except Exception:
-                pass
-
-            try:
-                driver.quit()
-            except Exception:
-                pass
-
-    #
-    # finally:
-    #     if driver is not None:
-    #         try:
-    #             driver.quit()
-    #         except Exception:
-    #             pass
+            # Échec en cours de flow (checkpoint gardé) : pas de HOME, la relance reprend l'écran
+            if not resumable(device_id, key):
+                try:
+                    # 🔥 Forcer Android à rester sur Galerie
+                    driver.activate_app("com.sec.android.gallery3d")
+                    wait_for_package(driver, "com.sec.android.gallery3d", timeout=2.0,
+                                     label="gallery.front")
+                except Exception:
+                    pass
+
+                try:
+                    # ⚠️ Petit hack : envoyer HOME mais en laissant Galerie ouverte
+                    driver.press_keycode(3)  # HOME
+                    wait_for_change(driver, before_package="com.sec.android.gallery3d",
+                                    timeout=1.5, label="home")
+                except Exception:
+                    pass
+
+            # Rendre la session au pool (plus de driver.quit() à chaque run)
+            release_driver(driver)
+
+        # Durées réelles des attentes de ce run (remplacent les sleeps fixes)
+        log_wait_summary()
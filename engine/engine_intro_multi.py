@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Engine INTRO + MULTI (une seule session)
+----------------------------------------
+Avant : runner.py enchaînait engine_intro.run puis engine_multi.run, chacun
+refaisant ADB, session Appium, déverrouillage, pre_platform_setup (switch
+de page Facebook...) et reset_gallery_home.
+
+Ici, pour tout le job :
+    ✔ 1 connexion ADB, 1 session Appium, 1 déverrouillage
+    ✔ pre_platform_setup une seule fois
+    ✔ phase INTRO (reset_gallery_home) puis phase MULTI, entre les deux la
+      Galerie est seulement ramenée sur l'onglet Albums
+
+`progress` (dict de l'appelant) : progress["intro"] = 0 dès que l'intro
+est publiée → run_with_retries relance la seule phase MULTI (skip_intro).
+Avec `job_key`, la progression est aussi écrite sur disque
+(steps.save_progress) : un job remis en file (--requeue, nouveau
+processus) ne reposte pas l'intro.
+"""
+from .core import ensure_adb_connected, log, unlock_screen_if_needed
+from .engine_intro import flow_key as intro_flow_key, post_intro
+from .engine_multi import flow_key as multi_flow_key, post_multi
+from .platforms import pre_platform_setup
+from .results import RunResult, begin, fail, phase, timed
+from .session_pool import acquire_driver, release_driver
+from .steps import resumable, save_progress
+from .waits import log_wait_summary
+
+
+def run(
+    profile: dict,
+    album_intro: str,
+    album_multi: str,
+    count: int,
+    platform: str = "WhatsApp",
+    platform_opts: dict | None = None,
+    skip_intro: bool = False,
+    progress: dict | None = None,
+    job_key: str | None = None,
+) -> RunResult:
+    """
+    Codes retour : ceux de l'engine INTRO (phase 1) puis de l'engine MULTI
+    (phase 2) ; 0 si les deux phases sont publiées. Les étapes des deux
+    phases sont mesurées dans le même RunResult (préfixes intro. / multi.).
+    """
+    platform_opts = platform_opts or {}
+    progress = progress if progress is not None else {}
+
+    device_id = profile.get("device_id")
+    plat_ver = profile.get("platform_version")
+    log(f"[intro_multi] Profil : {profile.get('profile_name', '?')} | device_id={device_id}")
+    result = begin("intro_multi", profile.get("profile_name"), platform)
+
+    if not device_id:
+        log("[intro_multi] Profil sans device_id, abort.")
+        return result.finish(3)
+
+    with timed("adb_connect"):
+        connected = ensure_adb_connected(device_id)
+    if not connected:
+        fail("adb_connect")
+        return result.finish(1)
+
+    try:
+        count = int(count)
+    except Exception:
+        count = 11
+
+    # Flow interrompu de la phase à rejouer : écran laissé tel quel
+    key = (multi_flow_key(profile, platform, album_multi, count) if skip_intro
+           else intro_flow_key(profile, platform, album_intro))
+    resuming = resumable(device_id, key)
+    if resuming:
+        log("[intro_multi] Reprise du flow interrompu : ni nettoyage de l'écran ni pre_platform_setup.")
+
+    # Session Appium empruntée au pool (réutilisée si encore vivante)
+    with timed("session"):
+        driver = acquire_driver(device_id, plat_ver, profile=profile, resume=resuming)
+    try:
+        with timed("unlock"):
+            unlock_screen_if_needed(driver)
+
+        # Préparation éventuelle (switch de page Facebook) : une fois pour les 2 phases
+        if not resuming:
+            with timed("platform_setup"):
+                pre_platform_setup(driver, platform, platform_opts)
+
+        # ---------- Phase 1 : INTRO ----------
+        if skip_intro:
+            log("[intro_multi] Intro déjà publiée : phase MULTI seulement.")
+        else:
+            with phase("intro"):
+                rc = post_intro(driver, profile, album_intro, platform, platform_opts)
+            if rc:
+                return result.finish(rc)
+            progress["intro"] = 0
+            if job_key:
+                save_progress(device_id, job_key, progress)
+
+        # ---------- Phase 2 : MULTI ----------
+        #   1ʳᵉ phase du run → Galerie remise à zéro ; sinon re-navigation seule
+        with phase("multi"):
+            rc = post_multi(driver, profile, album_multi, count, platform, platform_opts,
+                            reset=skip_intro)
+        if rc == 0:
+            progress["multi"] = 0
+        return result.finish(rc)
+
+    finally:
+        # Rendre la session au pool (plus de driver.quit() à chaque run)
+        release_driver(driver)
+        # Durées réelles des attentes de ce run (remplacent les sleeps fixes)
+        log_wait_summary()
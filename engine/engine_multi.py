@@ -11,24 +11,37 @@ import math
 from pathlib import Path
 
 from ui.ui_paths_helpers import load_albums_dict
-from appium.webdriver.common.appiumby import AppiumBy
+from ui.ui_mediastore import query_album_media
 
 from .platforms import pre_platform_setup, share_to_platform
 
 from .core import (
     log,
     ensure_adb_connected,
-    make_driver,
     open_album,
     long_press_first_thumb,
     tap_share_button,
     choose_whatsapp_business_if_needed,
     share_to_my_status,
     reset_gallery_home,
+    gallery_albums_home,
     unlock_screen_if_needed,
     start_gallery,  # ⬅️ ajouter ceci
     debug_dump_thumbnails,  # ✅ AJOUTER CETTE LIGNE
+    visible_thumb_centers,
+    touch_gesture,
+    add_tap,
+    add_drag,
+    gallery_selected_count,
 )
+from .results import RunResult, begin, fail, timed
+from .screens import classify
+from .session_pool import acquire_driver, release_driver
+from .snapshot import invalidate as invalidate_snapshot
+from .share_intents import mime_for, send_media
+from .steps import clear as clear_checkpoint, resumable, run_steps
+from .upload_watch import wait_platform_upload
+from .waits import wait_for_package, log_wait_summary
 
 ALBUMS_CACHE = None
 
@@ -58,13 +71,263 @@ def compute_scroll_max_for_album(album_name: str) -> int:
     return scroll_max
 
 
+def _share_via_mediastore(driver, device_id: str, album_name: str, count: int, platform: str) -> bool:
+    """
+    Sélection sans Galerie : médias de l'album lus dans MediaStore, tirage
+    local, puis intent direct vers l'activité de partage de la plateforme.
+    Un seul média : `am` ne sait pas envoyer l'ArrayList<Uri> de
+    SEND_MULTIPLE, une multi-sélection passe donc toujours par la Galerie.
+    False → l'appelant repasse par le flow Galerie.
+    """
+    if count > 1:
+        log(f"[multi] {count} médias : pas d'intent SEND_MULTIPLE via am → flow Galerie.")
+        return False
+
+    items = query_album_media(device_id, album_name)
+    if not items:
+        log(f"[multi] MediaStore : aucun média pour l'album '{album_name}' → flow Galerie.")
+        return False
+
+    picks = random.sample(items, min(count, len(items)))
+    sent = send_media(device_id, platform, [it["uri"] for it in picks], mime_for(picks))
+    if not sent:
+        return False
+    package, mode = sent
+    if mode != "component":
+        return False   # écran inconnu des flows in_app
+
+    # L'activité de partage explicite de l'app cible prend la main
+    if not wait_for_package(driver, package, timeout=6.0, label="multi.intent_handoff"):
+        log(f"[multi] {platform} n'a pas pris la main après l'intent → flow Galerie.")
+        return False
+    invalidate_snapshot(driver)
+    log(f"[multi] {len(picks)}/{count} média(s) envoyés à {platform} sans la Galerie.")
+    return True
+
+
+def _capped_count(album_name: str, count: int) -> int:
+    """Jamais plus d'images que l'album n'en contient."""
+    album_total = get_album_size(album_name)
+    return album_total if album_total and count > album_total else count
+
+
+def flow_key(profile: dict, platform: str, album_name: str, count: int) -> str:
+    """Clé du checkpoint (engine.steps) du flow Galerie multi (profil + plateforme inclus)."""
+    return (f"multi|{profile.get('profile_name') or ''}|{platform}|{album_name}|"
+            f"{_capped_count(album_name, count)}")
+
+
+def _select_in_gallery(driver, device_id: str, album_name: str, count: int, key: str,
+                       reset: bool = True) -> int:
+    """
+    Flow Galerie : album → multi-sélection → bouton Share, en étapes avec
+    postconditions (engine.steps) : une relance reprend à la première étape
+    dont le résultat n'est plus visible à l'écran.
+    0 si OK, sinon le code retour de l'engine (2, 4, 5, 6, 7).
+    """
+    # Par sécurité : ne jamais demander plus d'images que l'album n'en contient
+    capped = _capped_count(album_name, count)
+    if capped != count:
+        count = capped
+        log(f"[multi] count ajusté à {count} (taille réelle de l'album).")
+
+    def gallery_home(ctx):
+        # 🔥 Toujours repartir d'une Galerie propre sur l'onglet Albums
+        #    (reset=False : simple re-navigation, sans tuer les apps)
+        if reset_gallery_home(driver) if reset else gallery_albums_home(driver):
+            return 0
+        log("[multi] Impossible de remettre la Galerie dans un état propre.")
+        return 2
+
+    def album(ctx):
+        if open_album(driver, album_name):
+            return 0
+        log(f"[multi] Album '{album_name}' introuvable.")
+        return 4
+
+    def selection_mode(ctx):
+        # Activer la multi-sélection (long press sur la première vignette)
+        if long_press_first_thumb(driver):
+            return 0
+        log("[multi] Impossible de faire le long press sur la première vignette.")
+        return 5
+
+    def share(ctx):
+        return 0 if tap_share_button(driver) else 7
+
+    flow = [
+        {"name": "gallery", "run": gallery_home,
+         "check": lambda ctx: classify(driver, ("gallery.tabs",)) == "gallery.tabs"},
+        {"name": "album", "run": album,
+         "check": lambda ctx: (classify(driver, ("gallery.album_content",)) == "gallery.album_content"
+                               and gallery_selected_count(driver) is None)},
+        {"name": "selection_mode", "run": selection_mode,
+         "check": lambda ctx: gallery_selected_count(driver) == 0},
+        {"name": "select", "run": lambda ctx: _select_thumbs(driver, album_name, ctx["count"]),
+         "check": lambda ctx: (gallery_selected_count(driver) or 0) >= ctx["count"]},
+        {"name": "share", "run": share,
+         "check": lambda ctx: classify(driver, ("share_sheet",)) == "share_sheet"},
+    ]
+    return run_steps(device_id, key, flow, {"count": count},
+                     resume=lambda: start_gallery(driver))
+
+
+def _select_thumbs(driver, album_name: str, count: int) -> int:
+    """Sélection de `count` vignettes (mode multi-sélection déjà actif). 0 ou 6."""
+    # Scroll max dynamique en fonction de l'album (basé sur albums.json)
+    scroll_max   = compute_scroll_max_for_album(album_name)
+    album_total  = get_album_size(album_name)
+    log(f"[multi] scroll_max={scroll_max} pour l'album '{album_name}' (album_size={album_total}).")
+
+    # ------------------------------------------------------------------
+    # MODE 1 : petits albums (≤ 32 photos) → une seule page, aucun scroll
+    # ------------------------------------------------------------------
+    if album_total and album_total <= 32:
+        log("[multi] Mode 'small album' activé (≤ 32 photos) : aucune analyse de scroll.")
+
+        # 1 snapshot → tirage local → tous les taps en UNE requête W3C
+        centers = visible_thumb_centers(driver)
+
+        if not centers:
+            log("[multi] ❌ Aucune vignette trouvée sur la page unique.")
+            # Debug spécial S23 pour voir ce que Samsung renvoie
+            debug_dump_thumbnails(driver)
+            return 6
+
+        picks = random.sample(centers, min(count, len(centers)))
+        selected = 0
+        try:
+            builder, finger = touch_gesture(driver)
+            for x, y in picks:
+                add_tap(finger, x, y)
+            builder.perform()
+            selected = len(picks)
+            log(f"[multi] {selected} image(s) sélectionnée(s) en un seul geste (total={selected}/{count}).")
+        except Exception as e:
+            log(f"[multi] ❌ Sélection groupée KO : {e!r}")
+        finally:
+            invalidate_snapshot(driver)
+
+        if selected < count:
+            log(f"[multi] Seulement {selected}/{count} images sélectionnées → code 6 (small album).")
+            return 6
+
+    # ------------------------------------------------------------------
+    # MODE 2 : grands albums (> 32 photos) → algo classique avec scroll
+    # ------------------------------------------------------------------
+    else:
+        # --- Sélection multi : 1 image puis scroll, comme ton ancien script ---
+        selected = 0
+        empty_loops = 0
+        max_empty_loops = 10
+
+        size = driver.get_window_size()
+        start_x = size["width"] // 2
+        start_y = int(size["height"] * 0.75)
+        end_y   = int(size["height"] * 0.25)
+
+        while selected < count and empty_loops < max_empty_loops:
+            # 1 snapshot par page, puis tap + scrolls dans la MÊME requête W3C
+            centers = visible_thumb_centers(driver)
+            builder, finger = touch_gesture(driver)
+
+            if not centers:
+                empty_loops += 1
+                log(f"[multi] Aucune vignette trouvée (loop={empty_loops}), on scroll.")
+
+                # 🔍 DEBUG SPÉCIAL S23 : voir ce que Samsung affiche réellement
+                if empty_loops == 1:
+                    debug_dump_thumbnails(driver)
+            else:
+                x, y = random.choice(centers)
+                add_tap(finger, x, y)
+
+            # Scroll 1 → scroll_max fois selon la taille de l'album
+            # (inutile après la dernière image)
+            if not (centers and selected + 1 >= count):
+                scroll_times = random.randint(1, scroll_max)
+                for _ in range(scroll_times):
+                    add_drag(finger, start_x, start_y, end_y, duration_ms=900)
+
+            try:
+                builder.perform()
+                if centers:
+                    selected += 1
+                    log(f"[multi] Image sélectionnée (total={selected}/{count}).")
+            except Exception as e:
+                empty_loops += 1
+                log(
+                    f"[multi] Impossible de sélectionner une image sur cette page "
+                    f"(loop={empty_loops}) : {e!r}"
+                )
+            finally:
+                invalidate_snapshot(driver)
+
+        if selected < count:
+            log(f"[multi] Seulement {selected}/{count} images sélectionnées → code 6.")
+            return 6
+
+    return 0
+
+
+def post_multi(driver, profile: dict, album_name: str, count: int, platform: str = "WhatsApp",
+               platform_opts: dict | None = None, reset: bool = True) -> int:
+    """
+    Phase MULTI sur une session déjà prête (ADB, driver, déverrouillage,
+    pre_platform_setup faits par l'appelant).
+    reset=False : la Galerie est seulement ramenée sur l'onglet Albums,
+    sans tuer les apps (2ᵉ phase d'engine_intro_multi).
+    """
+    platform_opts = platform_opts or {}
+    device_id = profile.get("device_id")
+    profile_name = profile.get("profile_name")
+
+    # 🚀 Mode sans Galerie (profil "media_source": "mediastore")
+    in_app = False
+    if profile.get("media_source") == "mediastore":
+        with timed("mediastore_share"):
+            in_app = _share_via_mediastore(driver, device_id, album_name, count, platform)
+
+    if not in_app:
+        rc = _select_in_gallery(driver, device_id, album_name, count,
+                                flow_key(profile, platform, album_name, count), reset=reset)
+        if rc:
+            return rc
+
+
+    # ⭐ ROUTAGE SELON LA PLATEFORME ⭐
+    with timed("platform_flow"):
+        if platform == "WhatsApp":
+            if not in_app:
+                choose_whatsapp_business_if_needed(driver, profile_name)
+            share_to_my_status(driver)
+            log("✔ Multi selection posted (WhatsApp Status).")
+        else:
+            share_to_platform(driver, platform, platform_opts, in_app=in_app)
+            log(f"✔ Multi selection posted on {platform}.")
+
+    # 🕒 Rendre la main dès que l'upload est terminé (jamais avant),
+    #    puis revenir sur la Galerie
+    try:
+        log("Attente de la fin de l'upload, puis retour sur la Galerie...")
+        with timed("upload_wait"):
+            wait_platform_upload(driver, device_id, platform)
+        start_gallery(driver)    # ⬅️ met la Galerie au premier plan, sans fermer les autres apps
+    except Exception:
+        log("[WARN] Impossible de ramener la Galerie au premier plan (MULTI).")
+
+    # Job publié : plus rien à reprendre
+    clear_checkpoint(device_id)
+    return 0
+
+
 def run(
     profile: dict,
     album_name: str,
     count: int,
     platform: str = "WhatsApp",
     platform_opts: dict | None = None,
-) -> int:
+) -> RunResult:
     """
     Engine MULTI :
       - remet la Galerie dans un état propre (reset_gallery_home)
@@ -74,28 +337,36 @@ def run(
       - partage vers la plateforme choisie :
           * WhatsApp Business (My status) si platform == "WhatsApp"
           * sinon Facebook / Instagram / TikTok via share_to_platform()
+      - profil "media_source": "mediastore" et count == 1 → média tiré dans
+        MediaStore + intent SEND vers l'app (sans Galerie), sinon Galerie
 
-    Codes retour :
-      1 : ADB non connecté ou profil sans device_id
+    Codes retour (cf. retry_policy) :
+      1 : ADB non connecté
       2 : impossible de remettre la Galerie propre (reset_gallery_home)
+      3 : profil sans device_id
       4 : album introuvable
       5 : impossible de faire le long press sur la première vignette
       6 : pas assez d’images sélectionnées
       7 : bouton Share introuvable
       0 : succès
+    (dans un RunResult : rc + durées par étape, cf. engine.results)
     """
     platform_opts = platform_opts or {}
 
     device_id = profile.get("device_id")
     plat_ver  = profile.get("platform_version")
     profile_name = profile.get("profile_name")  # éventuellement utile plus tard
+    result = begin("multi", profile_name, platform)
 
     if not device_id:
         log("[multi] Profil sans device_id, abort.")
-        return 1
+        return result.finish(3)
 
-    if not ensure_adb_connected(device_id):
-        return 1
+    with timed("adb_connect"):
+        connected = ensure_adb_connected(device_id)
+    if not connected:
+        fail("adb_connect")
+        return result.finish(1)
 
     # S’assurer que count est bien un int
     try:
@@ -103,171 +374,33 @@ def run(
     except Exception:
         count = 11
 
-    # driver = make_driver(device_id, plat_ver)
-    driver = make_driver(device_id, plat_ver, profile=profile)
+    # Flow interrompu (relance / remise en file) : écran laissé tel quel
+    resuming = resumable(device_id, flow_key(profile, platform, album_name, count))
+    if resuming:
+        log("[multi] Reprise du flow interrompu : ni nettoyage de l'écran ni pre_platform_setup.")
 
-    unlock_screen_if_needed(driver)
+    # Session Appium empruntée au pool (réutilisée si encore vivante)
+    with timed("session"):
+        driver = acquire_driver(device_id, plat_ver, profile=profile, resume=resuming)
 
     try:
-        # Déverrouillage simple si besoin
-        try:
-            if driver.is_locked():
-                driver.press_keycode(82)
-                time.sleep(0.5)
-        except Exception:
-            pass
-
-        # Préparation éventuelle (utile surtout pour Facebook)
-        pre_platform_setup(driver, platform, platform_opts)
-
-        # 🔥 Toujours repartir d'une Galerie propre sur l'onglet Albums
-        if not reset_gallery_home(driver):
-            log("[multi] Impossible de remettre la Galerie dans un état propre.")
-            return 2
-
-        # Ouvrir l’album
-        if not open_album(driver, album_name):
-            log(f"[multi] Album '{album_name}' introuvable.")
-            return 4
-
-        # Activer la multi-sélection (long press sur la première vignette)
-        if not long_press_first_thumb(driver):
-            log("[multi] Impossible de faire le long press sur la première vignette.")
-            return 5
-
-        # Scroll max dynamique en fonction de l'album (basé sur albums.json)
-        scroll_max   = compute_scroll_max_for_album(album_name)
-        album_total  = get_album_size(album_name)
-        log(f"[multi] scroll_max={scroll_max} pour l'album '{album_name}' (album_size={album_total}).")
-
-        # Par sécurité : ne jamais demander plus d'images que l'album n'en contient
-        if album_total and count > album_total:
-            count = album_total
-            log(f"[multi] count ajusté à {count} (taille réelle de l'album).")
-
-        # ------------------------------------------------------------------
-        # MODE 1 : petits albums (≤ 32 photos) → une seule page, aucun scroll
-        # ------------------------------------------------------------------
-        if album_total and album_total <= 32:
-            log("[multi] Mode 'small album' activé (≤ 32 photos) : aucune analyse de scroll.")
-
-            thumbs = driver.find_elements(
-                AppiumBy.XPATH,
-                "(//android.widget.FrameLayout[@resource-id="
-                "'com.sec.android.gallery3d:id/thumbnail_preview_layout'])",
-            )
-
-            if not thumbs:
-                log("[multi] ❌ Aucune vignette trouvée sur la page unique.")
-                # Debug spécial S23 pour voir ce que Samsung renvoie
-                debug_dump_thumbnails(driver)
-                return 6
-
-            idxs = list(range(len(thumbs)))
-            random.shuffle(idxs)
-
-            selected = 0
-            for i in idxs:
-                if selected >= count:
-                    break
-                try:
-                    thumbs[i].click()
-                    selected += 1
-                    log(f"[multi] Image sélectionnée (total={selected}/{count}).")
-                    time.sleep(0.2)
-                except Exception:
-                    continue
-
-            if selected < count:
-                log(f"[multi] Seulement {selected}/{count} images sélectionnées → code 6 (small album).")
-                return 6
+        with timed("unlock"):
+            unlock_screen_if_needed(driver)
 
-        # ------------------------------------------------------------------
-        # MODE 2 : grands albums (> 32 photos) → algo classique avec scroll
-        # ------------------------------------------------------------------
-        else:
-            # --- Sélection multi : 1 image puis scroll, comme ton ancien script ---
-            selected = 0
-            empty_loops = 0
-            max_empty_loops = 10
-
-            while selected < count and empty_loops < max_empty_loops:
-                thumbs = driver.find_elements(
-                    AppiumBy.XPATH,
-                    "(//android.widget.FrameLayout[@resource-id="
-                    "'com.sec.android.gallery3d:id/thumbnail_preview_layout'])",
-                )
-
-                if not thumbs:
-                    empty_loops += 1
-                    log(f"[multi] Aucune vignette trouvée (loop={empty_loops}), on scroll.")
-
-                    # 🔍 DEBUG SPÉCIAL S23 : voir ce que Samsung affiche réellement
-                    if empty_loops == 1:
-                        debug_dump_thumbnails(driver)
-
-                else:
-                    idxs = list(range(len(thumbs)))
-                    random.shuffle(idxs)
-
-                    clicked = False
-                    for i in idxs:
-                        if selected >= count:
-                            break
-                        try:
-                            thumbs[i].click()
-                            selected += 1
-                            clicked = True
-                            log(f"[multi] Image sélectionnée (total={selected}/{count}).")
-                            time.sleep(0.2)
-                            break
-                        except Exception:
-                            continue
-
-                    if not clicked:
-                        empty_loops += 1
-                        log(
-                            f"[multi] Impossible de sélectionner une image sur cette page "
-                            f"(loop={empty_loops})."
-                        )
-
-                # Scroll 1 → scroll_max fois selon la taille de l'album
-                size = driver.get_window_size()
-                start_x = size["width"] // 2
-                start_y = int(size["height"] * 0.75)
-                end_y   = int(size["height"] * 0.25)
-
-                scroll_times = random.randint(1, scroll_max)
-                for _ in range(scroll_times):
-                    driver.swipe(start_x, start_y, start_x, end_y, 900)
-                    time.sleep(0.4)
-
-            if selected < count:
-                log(f"[multi] Seulement {selected}/{count} images sélectionnées → code 6.")
-                return 6
-
-        # Bouton Share
-        if not tap_share_button(driver):
-            return 7
+            # Déverrouillage simple si besoin
+            try:
+                if driver.is_locked():
+                    driver.press_keycode(82)
+                    time.sleep(0.5)
+            except Exception:
+                pass
 
-        # ⭐ ROUTAGE SELON LA PLATEFORME ⭐
-        if platform == "WhatsApp":
-            choose_whatsapp_business_if_needed(driver, profile_name)
-            share_to_my_status(driver)
-            log("✔ Multi selection posted (WhatsApp Status).")
-        else:
-            share_to_platform(driver, platform, platform_opts)
-            log(f"✔ Multi selection posted on {platform}.")
-
-        # 🕒 Laisser le temps à l'upload de partir, puis revenir sur la Galerie
-        try:
-            log("Attente 2 s, puis retour sur la Galerie...")
-            time.sleep(2.0)
-            start_gallery(driver)    # ⬅️ met la Galerie au premier plan, sans fermer les autres apps
-        except Exception:
-            log("[WARN] Impossible de ramener la Galerie au premier plan (MULTI).")
+        # Préparation éventuelle (utile surtout pour Facebook), déjà faite si reprise
+        if not resuming:
+            with timed("platform_setup"):
+                pre_platform_setup(driver, platform, platform_opts)
 
-        return 0
+        return result.finish(post_multi(driver, profile, album_name, count, platform, platform_opts))
 
 
         # # ⭐ ROUTAGE SELON LA PLATEFORME ⭐
@@ -284,7 +417,7 @@ def run(
         # return 0
 
     finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
+        # Rendre la session au pool (plus de driver.quit() à chaque run)
+        release_driver(driver)
+        # Durées réelles des attentes de ce run (remplacent les sleeps fixes)
+        log_wait_summary()
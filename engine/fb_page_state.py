@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Page Facebook active, par téléphone
+-----------------------------------
+config/fb_page_state.json :
+
+    {"192.168.10.56:5555": {"page": "CM", "verified_at": "2026-10-17T09:12:03"}}
+
+`page` = clé de la page demandée (page_name saisi en UI, sinon code CM / CI).
+fb_preselect_page() ne tue / relance plus Facebook ni n'ouvre le sélecteur
+de profils quand la page en cache est déjà la bonne : l'app est ramenée
+devant telle quelle et l'en-tête du menu (1 snapshot) confirme la page.
+Toute vérification ratée efface l'entrée → flow complet au prochain run.
+"""
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from ui.ui_paths_helpers import FB_PAGE_STATE, load_json, save_json_atomic
+
+_LOCK = threading.Lock()
+
+
+def _load() -> Dict[str, dict]:
+    return load_json(FB_PAGE_STATE, {})
+
+
+def _save(data: Dict[str, dict]) -> None:
+    try:
+        save_json_atomic(FB_PAGE_STATE, data)
+    except Exception:
+        pass
+
+
+def page_key(page_code: Optional[str], page_name: Optional[str]) -> str:
+    return (page_name or page_code or "").strip()
+
+
+def get_page(device_id: str) -> Optional[str]:
+    """Page active connue sur ce téléphone, sinon None."""
+    if not device_id:
+        return None
+    with _LOCK:
+        entry = _load().get(device_id) or {}
+    return entry.get("page") or None
+
+
+def record_page(device_id: str, page: str) -> None:
+    """Page confirmée active (switch réussi ou en-tête vérifié)."""
+    if not device_id or not page:
+        return
+    with _LOCK:
+        data = _load()
+        data[device_id] = {"page": page, "verified_at": datetime.now().isoformat(timespec="seconds")}
+        _save(data)
+
+
+def forget(device_id: str) -> None:
+    """Page inconnue (vérification ratée, switch en échec)."""
+    if not device_id:
+        return
+    with _LOCK:
+        data = _load()
+        if data.pop(device_id, None) is not None:
+            _save(data)
@@ -8,51 +8,56 @@ Gestion centralisée des plateformes de publication :
 - WhatsApp
 """
 
-import time
 from pathlib import Path
-from appium.webdriver.common.appiumby import AppiumBy
 from .core import log, choose_whatsapp_business_if_needed
+from . import fb_page_state
+from .selector_compiler import find_elements
+from .screens import classify, wait_for_screen
+from .selector_cache import driver_context
+from .snapshot import get_snapshot, parse_bounds, snapshot_enabled
+from .tracing import trace_module
+from .waits import (
+    click_first,
+    first_match,
+    wait_for_change,
+    wait_for_match,
+    wait_for_package,
+    wait_gone,
+    wait_until,
+)
 from selenium.common.exceptions import WebDriverException
+import sys
 import traceback
 
 # ---------- Petits helpers ----------
-def _findall(driver, xp): return driver.find_elements(AppiumBy.XPATH, xp)
+def _findall(driver, xp): return find_elements(driver, xp)   # XPath compilé (ID / UiSelector)
 
-def _click(driver, xp, delay=0.8):
-    els = _findall(driver, xp)
-    if els:
-        els[0].click()
-        time.sleep(delay)
-        return True
-    return False
+def _click(driver, xp, timeout=0.0, label="click"):
+    return click_first(driver, xp, timeout=timeout, label=label)
 
 def _maybe_click(
     driver,
     selectors: list[str],
-    delay: float = 0.5,
+    timeout: float = 3.0,
     strategy: str = "xpath",
+    label: str = "click",
+    remember: bool = True,
 ) -> bool:
     """
-    Essaie de cliquer sur le premier élément trouvable parmi 'selectors'.
+    Clique sur le premier élément trouvable parmi 'selectors'.
+
+    Tous les sélecteurs sont réessayés à chaque tour de polling jusqu'à
+    'timeout' : on clique DÈS que l'écran est prêt (plus de pause fixe
+    après le clic, c'est l'étape suivante qui attend son propre élément).
+    Le sélecteur qui a marché au dernier run (même profil, même version de
+    l'app) est essayé en premier (engine.selector_cache).
 
     strategy:
       - "xpath"       → selectors sont des XPATH (AppiumBy.XPATH)
       - "uiautomator" → selectors sont des UiSelector(...) (AppiumBy.ANDROID_UIAUTOMATOR)
     """
-    if strategy == "uiautomator":
-        by = AppiumBy.ANDROID_UIAUTOMATOR
-    else:
-        by = AppiumBy.XPATH
-
-    for sel in selectors:
-        try:
-            el = driver.find_element(by, sel)
-            el.click()
-            time.sleep(delay)
-            return True
-        except Exception:
-            continue
-    return False
+    return click_first(driver, selectors, timeout=timeout, label=label, strategy=strategy,
+                       remember=remember)
 
 
 # ===================== FACEBOOK =====================
@@ -74,235 +79,266 @@ def _reset_facebook(driver):
             # si l'app n'est pas installée ou déjà fermée, on ignore
             pass
 
-def fb_preselect_page(driver, page_code: str | None, page_name: str | None):
-    """
-    Ouvre Facebook, sélectionne la page cible puis revient HOME.
-    """
-
-    log(f"[FB] fb_preselect_page() START (page_name={page_name!r}, page_code={page_code!r})")
-    try:
-        cur_pkg = getattr(driver, "current_package", None)
-        log(f"[FB] current_package au début: {cur_pkg}")
-    except Exception as e:
-        log(f"[FB] Impossible de lire current_package au début: {e!r}")
-
-    # 🔥 0) RESET FACEBOOK AVANT DE LA LANCER
-    _reset_facebook(driver)
+# Pages connues (code CM / CI → nom affiché dans Facebook)
+FB_PAGES = {
+    "CM": "Jerry Kamgang",                   # Page Cameroun
+    "CI": "Jerry Kamgang Côte d'Ivoire",     # Page Côte d'Ivoire
+}
 
-    # 1) Lancer / ramener Facebook devant
-    launched = False
 
+def _fb_launch(driver) -> bool:
+    """Lance / ramène Facebook devant (activate_app, repli start_activity)."""
     try:
         log("[FB] Tentative activate_app('com.facebook.katana')...")
         driver.activate_app("com.facebook.katana")
-        time.sleep(2.0)
+        wait_for_package(driver, "com.facebook.katana", timeout=8.0, label="fb.launch")
         log(f"[FB] current_package après activate_app: {driver.current_package}")
-        launched = True
+        return True
     except Exception as e:
         log(f"[FB] activate_app a échoué: {e!r}")
         traceback.print_exc()
 
-    if not launched:
-        try:
-            log("[FB] Tentative start_activity(com.facebook.katana, LoginActivity)...")
-            driver.start_activity("com.facebook.katana", "com.facebook.katana.LoginActivity")
-            time.sleep(2.0)
-            log(f"[FB] current_package après start_activity: {driver.current_package}")
-            launched = True
-        except Exception as e2:
-            log(f"[FB] start_activity a échoué: {e2!r}")
-            traceback.print_exc()
-
-    if not launched:
-        log("[FB] ❌ Impossible de lancer Facebook via activate_app/start_activity. Abandon pré-sélection page.")
-        return
-
-    log("[FB] Facebook lancé, ouverture du menu (dernier onglet)...")
+    try:
+        log("[FB] Tentative start_activity(com.facebook.katana, LoginActivity)...")
+        driver.start_activity("com.facebook.katana", "com.facebook.katana.LoginActivity")
+        wait_for_package(driver, "com.facebook.katana", timeout=8.0, label="fb.launch")
+        log(f"[FB] current_package après start_activity: {driver.current_package}")
+        return True
+    except Exception as e2:
+        log(f"[FB] start_activity a échoué: {e2!r}")
+        traceback.print_exc()
+    return False
 
-    # 2) Ouvrir le menu (icône tout à droite, quel que soit le nombre d'onglets)
-    for attempt in range(8):
-        try:
-            menu_tabs = driver.find_elements(
-                AppiumBy.XPATH,
-                "//android.view.View[starts-with(@content-desc,'Menu, tab ') "
-                "and contains(@content-desc,' of ')]"
-            )
-
-            if menu_tabs:
-                # Dernier onglet : Menu, tab 5/5, 6/6, 7/7, ...
-                menu_tabs[-1].click()
-                time.sleep(1.0)
-                log(f"[FB] Menu ouvert via liste des onglets (attempt={attempt+1}).")
-                break
-
-            # Fallback explicites si jamais la liste est vide
-            fallback_xpaths = [
-                "//android.view.View[@content-desc='Menu, tab 6 of 6']",
-                "//android.view.View[@content-desc='Menu, tab 5 of 5']",
-                "//android.view.View[@content-desc='Menu, tab 7 of 7']",
-                "//android.view.View[@content-desc='Menu, tab 8 of 8']",
-            ]
-            clicked = False
-            for xp in fallback_xpaths:
-                try:
-                    driver.find_element(AppiumBy.XPATH, xp).click()
-                    time.sleep(1.0)
-                    log(f"[FB] Menu ouvert via fallback XPath {xp} (attempt={attempt+1}).")
-                    clicked = True
-                    break
-                except Exception:
-                    continue
 
-            if clicked:
-                break
+def _fb_open_menu(driver) -> bool:
+    """Ouvre le menu (icône tout à droite, quel que soit le nombre d'onglets)."""
+    #    Polling jusqu'à ~10 s (≈ les 8 anciennes tentatives + pauses)
+    menu_xp = (
+        "//android.view.View[starts-with(@content-desc,'Menu, tab ') "
+        "and contains(@content-desc,' of ')]"
+    )
+    # Fallback explicites si jamais la liste est vide
+    fallback_xpaths = [
+        "//android.view.View[@content-desc='Menu, tab 6 of 6']",
+        "//android.view.View[@content-desc='Menu, tab 5 of 5']",
+        "//android.view.View[@content-desc='Menu, tab 7 of 7']",
+        "//android.view.View[@content-desc='Menu, tab 8 of 8']",
+    ]
+    match = wait_for_match(driver, [menu_xp] + fallback_xpaths, timeout=10.0, label="fb.menu",
+                           remember=True)
+    if match is None:
+        log("[FB] ❌ Échec définitif pour ouvrir l'onglet Menu.")
+        return False
+    try:
+        xp, el = match
+        if xp == menu_xp:
+            # Dernier onglet : Menu, tab 5/5, 6/6, 7/7, ...
+            el = _findall(driver, menu_xp)[-1]
+        el.click()
+        log(f"[FB] Menu ouvert via {xp}.")
+        return True
+    except WebDriverException as e:
+        # Cas typique UiAutomator2 crash : instrumentation pas démarrée
+        log(f"[FB] ❌ WebDriverException lors de l'ouverture du menu: {e!r}. Abandon fb_preselect_page.")
+        traceback.print_exc()
+        return False
 
-            raise Exception("Menu tab not found")
-
-        except WebDriverException as e:
-            # Cas typique UiAutomator2 crash : instrumentation pas démarrée
-            log(f"[FB] WebDriverException lors de la recherche du menu (attempt={attempt+1}): {e!r}")
-            if attempt >= 2:
-                log("[FB] ❌ Problème UiAutomator2 persistant lors de l'ouverture du menu. Abandon fb_preselect_page.")
-                traceback.print_exc()
-                return
-            time.sleep(1.0)
-        except Exception as e:
-            log(f"[FB] Échec pour ouvrir l'onglet Menu (attempt={attempt+1}): {e!r}")
-            if attempt == 7:
-                log("[FB] ❌ Échec définitif pour ouvrir l'onglet Menu.")
-                traceback.print_exc()
-                return
-            time.sleep(0.7)
 
+def _fb_header_page(driver, names: list[str], timeout: float = 3.0) -> str | None:
+    """
+    Nom de page affiché dans l'en-tête du menu (1 snapshot par tour) :
+    le plus haut des noms connus dans le tiers supérieur de l'écran.
+    """
+    if not snapshot_enabled():
+        return None
+
+    def probe():
+        snap = get_snapshot(driver, fresh=True)
+        if snap is None:
+            return None
+        bottom, found = 0, []
+        for node in snap.root.iter():
+            b = parse_bounds(node.get("bounds"))
+            if b is None:
+                continue
+            bottom = max(bottom, b[3])
+            labels = (node.get("text") or "", node.get("content-desc") or "")
+            for name in names:
+                if any(lbl == name or lbl.startswith(name + ",") for lbl in labels):
+                    found.append((b[1], name))
+        found = [f for f in found if f[0] < bottom / 3]
+        return min(found)[1] if found else None
+
+    return wait_until(probe, timeout=timeout, label="fb.header")
+
+
+def _fb_switch_page(driver, page_code: str | None, page_name: str | None) -> bool:
+    """Profile switcher → clic sur la page cible (menu déjà ouvert)."""
     # 3) Ouvrir le profile switcher (icône en haut permettant de choisir la page)
     log("[FB] Recherche du profile switcher (Open profile switcher / 9+)...")
+    switcher_xpaths = [
+        # 3a) bouton standard (avec ou sans 'you have notifications')
+        "//android.widget.Button[contains(@content-desc,'Open profile switcher')]",
+        # 3b) fallback : le ViewGroup '9+'
+        "//android.view.ViewGroup[@content-desc='9+']",
+        # 3c) fallback plus large : n’importe quel content-desc contenant 'profile switcher'
+        "//*[contains(@content-desc,'profile switcher')]",
+    ]
     opened_switcher = False
-    for attempt in range(8):
+    match = wait_for_match(driver, switcher_xpaths, timeout=10.0, label="fb.profile_switcher",
+                           remember=True)
+    if match is not None:
         try:
-            # 3a) bouton standard (avec ou sans 'you have notifications')
-            if _click(driver,
-                      "//android.widget.Button[contains(@content-desc,'Open profile switcher')]",
-                      delay=1.0):
-                log(f"[FB] Profile switcher ouvert via bouton (attempt={attempt+1}).")
-                opened_switcher = True
-                break
-
-            # 3b) fallback : le ViewGroup '9+'
-            if _click(driver,
-                      "//android.view.ViewGroup[@content-desc='9+']",
-                      delay=1.0):
-                log(f"[FB] Profile switcher ouvert via ViewGroup '9+' (attempt={attempt+1}).")
-                opened_switcher = True
-                break
-
-            # 3c) fallback plus large : n’importe quel content-desc contenant 'profile switcher'
-            if _click(driver,
-                      "//*[contains(@content-desc,'profile switcher')]",
-                      delay=1.0):
-                log(f"[FB] Profile switcher ouvert via content-desc contenant 'profile switcher' (attempt={attempt+1}).")
-                opened_switcher = True
-                break
-
+            match[1].click()
+            log(f"[FB] Profile switcher ouvert via {match[0]}.")
+            opened_switcher = True
         except WebDriverException as e:
-            log(f"[FB] WebDriverException lors de l'ouverture du profile switcher (attempt={attempt+1}): {e!r}")
-        except Exception as e:
-            log(f"[FB] Erreur lors de l'ouverture du profile switcher (attempt={attempt+1}): {e!r}")
-
-        time.sleep(0.7)
+            log(f"[FB] WebDriverException lors de l'ouverture du profile switcher: {e!r}")
 
     if not opened_switcher:
         log("[FB] ❌ Impossible d’ouvrir le profile switcher (flèche / 9+).")
-        return
+        return False
 
     # 4) Sélection de la page dans la liste
-    clicked = False
+    xpaths = []
 
     # 4a) priorité au page_name saisi dans l’UI
     if page_name:
         log(f"[FB] Sélection de la page par page_name='{page_name}'...")
-        xpaths = [
+        xpaths += [
             f"//android.view.View[@text='{page_name}']",
             f"//android.view.View[contains(@text,'{page_name}')]",
             f"//*[@text='{page_name}']",
         ]
-        for xp in xpaths:
-            try:
-                driver.find_element(AppiumBy.XPATH, xp).click()
-                # ✅ Laisser le temps à Facebook de basculer sur la page
-                time.sleep(2.0)
-                log(f"[FB] Page sélectionnée avec XPath: {xp}")
-                clicked = True
-                break
-            except Exception as e:
-                log(f"[FB] XPath '{xp}' KO pour page_name (err={e!r})")
-
 
     # 4b) fallback par code CM / CI
-    if not clicked:
-        log(f"[FB] Sélection de la page via page_code='{page_code}'...")
-        if page_code == "CM":
-            # Page Cameroun
-            xpaths = [
-                "//android.view.View[@text='Jerry Kamgang']",
-                "//*[contains(@text,'Jerry Kamgang')]",
-            ]
-        elif page_code == "CI":
-            # Page Côte d'Ivoire
-            xpaths = [
-                "//android.view.View[@text=\"Jerry Kamgang Côte d'Ivoire\"]",
-                "//*[contains(@text,\"Jerry Kamgang Côte d'Ivoire\")]",
-            ]
-        else:
-            xpaths = []
+    if page_code in FB_PAGES:
+        name = FB_PAGES[page_code]
+        xpaths += [
+            f'//android.view.View[@text="{name}"]',
+            f'//*[contains(@text,"{name}")]',
+        ]
 
-        for xp in xpaths:
-            try:
-                driver.find_element(AppiumBy.XPATH, xp).click()
-                # ✅ Laisser 2s pour que Facebook charge bien la page
-                time.sleep(2.0)
-                log(f"[FB] Page sélectionnée avec XPath (code={page_code}): {xp}")
-                clicked = True
-                break
-            except Exception as e:
-                log(f"[FB] XPath '{xp}' KO pour code {page_code} (err={e!r})")
+    match = (wait_for_match(driver, xpaths, timeout=5.0, label="fb.page", remember=True)
+             if xpaths else None)
+    if match is not None:
+        xp, el = match
+        try:
+            el.click()
+            log(f"[FB] Page sélectionnée avec XPath: {xp}")
+            # ✅ Facebook a basculé sur la page quand la liste des pages a disparu
+            #    (au lieu de 2 s + 1 s fixes)
+            wait_gone(driver, xp, timeout=5.0, label="fb.page_switch")
+            return True
+        except Exception as e:
+            log(f"[FB] XPath '{xp}' KO (err={e!r})")
 
-    if not clicked:
-        log("[FB] ❌ Impossible de sélectionner la page Facebook.")
-        return
+    log("[FB] ❌ Impossible de sélectionner la page Facebook.")
+    return False
 
-    # 5) Retour HOME
-    log("[FB] ✅ Page Facebook sélectionnée. Retour HOME avant Galerie...")
+
+def _fb_home(driver):
+    """Retour HOME avant la Galerie."""
     try:
-        # ✅ Petite pause pour laisser le temps à l’UI de se stabiliser sur la page
-        time.sleep(1.0)
         driver.press_keycode(3)  # HOME
-        time.sleep(0.8)
+        wait_for_change(driver, before_package="com.facebook.katana", timeout=3.0,
+                        label="fb.home")
         log(f"[FB] current_package après HOME: {driver.current_package}")
     except Exception as e:
         log(f"[FB] Problème lors du retour HOME: {e!r}")
         traceback.print_exc()
 
 
-def share_to_facebook(driver, platform_opts: dict | None = None) -> None:
+def fb_preselect_page(driver, page_code: str | None, page_name: str | None):
+    """
+    Ouvre Facebook, sélectionne la page cible puis revient HOME.
+
+    Page déjà active d'après engine.fb_page_state → pas de reset ni de
+    démarrage à froid : Facebook est ramené devant, l'en-tête du menu
+    confirme la page, et le profile switcher n'est ouvert que si elle diffère.
+    """
+
+    log(f"[FB] fb_preselect_page() START (page_name={page_name!r}, page_code={page_code!r})")
+    try:
+        cur_pkg = getattr(driver, "current_package", None)
+        log(f"[FB] current_package au début: {cur_pkg}")
+    except Exception as e:
+        log(f"[FB] Impossible de lire current_package au début: {e!r}")
+
+    device_id = driver_context(driver).get("device_id")
+    key = fb_page_state.page_key(page_code, page_name)
+    wanted = [n for n in (page_name, FB_PAGES.get(page_code or "")) if n]
+    known = wanted + [n for n in FB_PAGES.values() if n not in wanted]
+
+    cached = fb_page_state.get_page(device_id) == key
+    if cached:
+        log(f"[FB] Page '{key}' déjà active d'après le cache : vérification sans redémarrer Facebook...")
+    else:
+        # 🔥 0) RESET FACEBOOK AVANT DE LA LANCER
+        _reset_facebook(driver)
+
+    # 1) Lancer / ramener Facebook devant
+    if not _fb_launch(driver):
+        log("[FB] ❌ Impossible de lancer Facebook via activate_app/start_activity. Abandon pré-sélection page.")
+        fb_page_state.forget(device_id)
+        return
+
+    # 2) Ouvrir le menu
+    log("[FB] Facebook lancé, ouverture du menu (dernier onglet)...")
+    if not _fb_open_menu(driver):
+        fb_page_state.forget(device_id)
+        return
+
+    # 3) En-tête du menu : déjà sur la bonne page ? (1 seule sonde hors cache)
+    active = _fb_header_page(driver, known, timeout=3.0 if cached else 0.0)
+    if active is not None and active in wanted:
+        log(f"[FB] ✅ Page '{active}' déjà active : pas de changement de page.")
+    else:
+        if cached:
+            log(f"[FB] En-tête : {active!r} ≠ cache '{key}' → changement de page.")
+        fb_page_state.forget(device_id)
+        # 4) Profile switcher + sélection de la page
+        if not _fb_switch_page(driver, page_code, page_name):
+            return
+    fb_page_state.record_page(device_id, key)
+
+    # 5) Retour HOME
+    log("[FB] ✅ Page Facebook sélectionnée. Retour HOME avant Galerie...")
+    _fb_home(driver)
+
+
+FB_SHARE_TARGETS = [
+    # XPath principal (Appium Inspector)
+    "//android.widget.TextView[@resource-id='android:id/text1' and @text='Facebook']",
+
+    # Variantes texte + content-desc
+    "//android.widget.TextView[contains(@text,'Facebook')]",
+    "//*[@text='Facebook']",
+    "//*[@text='Facebook Your Story']",
+    "//*[@content-desc='Facebook']",
+    "//*[contains(@content-desc,'Facebook')]",
+]
+
+
+def share_to_facebook(driver, platform_opts: dict | None = None, in_app: bool = False) -> None:
     """
     Sélectionne l’icône 'Facebook' dans la feuille de partage,
     puis clique sur le bouton Share/Partager dans Facebook.
+
+    in_app=True : médias déjà envoyés à Facebook par intent (pas de feuille
+    de partage ; l'entrée n'apparaît que si Facebook propose plusieurs cibles).
     """
-    log("[FB] Sélection de l’icône Facebook dans la feuille de partage...")
     platform_opts = platform_opts or {}
 
-    # 1) Essais robustes sur le texte pour l’icône Facebook
-    clicked = _maybe_click(driver, [
-        # XPath principal (Appium Inspector)
-        "//android.widget.TextView[@resource-id='android:id/text1' and @text='Facebook']",
-
-        # Variantes texte + content-desc
-        "//android.widget.TextView[contains(@text,'Facebook')]",
-        "//*[@text='Facebook']",
-        "//*[@text='Facebook Your Story']",
-        "//*[@content-desc='Facebook']",
-        "//*[contains(@content-desc,'Facebook')]",
-    ], delay=1.0)
+    if in_app:
+        # Sélecteur Android affiché seulement si Facebook expose plusieurs cibles
+        if not snapshot_enabled() or classify(driver, ["share_sheet"]) == "share_sheet":
+            _maybe_click(driver, FB_SHARE_TARGETS, timeout=1.5, label="fb.share_target")
+        clicked = True
+    else:
+        log("[FB] Sélection de l’icône Facebook dans la feuille de partage...")
+        # 1) Essais robustes sur le texte pour l’icône Facebook
+        clicked = _maybe_click(driver, FB_SHARE_TARGETS, timeout=4.0, label="fb.share_target")
 
     # 2) Fallback : ton Share_Ico.txt historique
     if not clicked:
@@ -310,7 +346,7 @@ def share_to_facebook(driver, platform_opts: dict | None = None) -> None:
             ico_path = Path(__file__).resolve().parent.parent / "Share_Ico.txt"
             xp = ico_path.read_text(encoding="utf-8").strip().replace('"', "'")
             if xp:
-                if _maybe_click(driver, [xp], delay=1.0):
+                if _maybe_click(driver, [xp], timeout=0.0, label="fb.share_target"):
                     log("✔ Icône Facebook tapée via Share_Ico.txt.")
                     clicked = True
         except Exception as e:
@@ -320,13 +356,11 @@ def share_to_facebook(driver, platform_opts: dict | None = None) -> None:
         log("❌ Impossible de taper sur l’icône Facebook dans la feuille de partage.")
         return
 
-    log("[FB] Icône Facebook sélectionnée, attente que l’éditeur charge...")
-
-    # 🔥 Laisser le temps à Facebook de charger l’écran de partage
-    # (surtout pour les VIDÉOS : on allonge volontairement)
-    time.sleep(3.0)
+    log("[FB] Icône Facebook sélectionnée, attente du bouton Share/Partager...")
 
-    log("[FB] Icône Facebook sélectionnée, recherche du bouton Share/Partager...")
+    # 🔥 Polling du bouton Share : les VIDÉOS peuvent être longues à charger,
+    # d'où un deadline large (l'ancien 3 s fixe + 3 s après clic), mais on
+    # clique dès que l’éditeur est prêt.
 
     # 3) Bouton Share dans Facebook (toutes les possibilités connues)
     clicked_share = _maybe_click(driver, [
@@ -348,16 +382,22 @@ def share_to_facebook(driver, platform_opts: dict | None = None) -> None:
         "//*[@content-desc='Partager']",
         "//*[contains(@content-desc,'Share')]",
         "//*[contains(@content-desc,'Partager')]",
-    ], delay=3.0)  # ⬅️ délai TRIPLÉ pour laisser le temps aux vidéos
+    ], timeout=15.0, label="fb.share_button")
 
     if clicked_share:
+        # L’éditeur se ferme quand la story est envoyée
+        wait_gone(driver, [
+            "//android.widget.Button[@content-desc='Share']",
+            "//*[@text='Share']",
+            "//*[@text='Partager']",
+        ], timeout=3.0, label="fb.share_sent")
         log("✅ Bouton Share Facebook cliqué (story/post envoyée).")
     else:
         log("[FB] ⚠️ Bouton Share/Partager introuvable après chargement Facebook.")
 
 
 # ===================== INSTAGRAM =====================
-def share_to_instagram(driver, mode="auto"):
+def share_to_instagram(driver, mode="auto", in_app: bool = False):
 
     """
     Flow Instagram Story générique.
@@ -366,13 +406,41 @@ def share_to_instagram(driver, mode="auto"):
       - "intro" : une seule vidéo / image (intro)
       - "multi" : plusieurs images/vidéos (album)
       - "auto"  : tente d'abord le comportement intro, puis bascule en multi si besoin
+
+    in_app=True : médias déjà envoyés à Instagram par intent (pas de feuille de partage).
     """
     mode = (mode or "auto").lower()
     is_intro = mode == "intro"
     is_multi = mode == "multi"
 
-    # Facteur de délai spécial Instagram (surtout utile pour les vidéos lourdes)
-    IG_FACTOR = 4.0
+    # Deadlines Instagram (larges : vidéos lourdes) — on n'attend plus un
+    # délai fixe × IG_FACTOR après chaque clic, on rend la main dès que
+    # l'élément suivant apparaît.
+    IG_STEP_TIMEOUT = 5.0
+    IG_LOAD_TIMEOUT = 10.0     # chargement des vignettes avant 'Next'
+
+    story_xpaths = [
+        "//*[@text='Your story']",
+        "//*[@text='Votre story']",
+        "//*[contains(@content-desc,'Your story')]",
+        "//*[contains(@content-desc,'Votre story')]",
+        "//android.widget.Button[@content-desc='Your stories']",
+    ]
+    share_to_xpath = "//android.widget.Button[@content-desc='Share to']/android.widget.TextView"
+    next_xpaths = [
+        # bouton 'Next' (content-desc)
+        "//android.widget.Button[@content-desc='Next']",
+
+        # bouton 'Next' dans le tray (texte + resource-id spécifiques)
+        "//android.widget.TextView[@resource-id='com.instagram.android:id/media_thumbnail_tray_button_text' and @text='Next']",
+        "//android.widget.TextView[@resource-id='com.instagram.android:id/media_thumbnail_tray_button_text']",
+
+        # layout qui contient le bouton Next (au cas où on clique le container)
+        "//android.widget.LinearLayout[@resource-id='com.instagram.android:id/media_thumbnail_tray_next_buttons_layout']",
+
+        # fallback texte simple
+        "//*[@text='Next']",
+    ]
 
     # Petit helper pour factoriser Share + Done
     def _ig_share_and_done(from_multi: bool):
@@ -381,19 +449,21 @@ def share_to_instagram(driver, mode="auto"):
         clicked_share = _maybe_click(driver, [
             "(//android.widget.TextView[@text='Share'])[2]",
             "//*[@text='Share']",
-        ], delay=1.0 * IG_FACTOR)
+        ], timeout=IG_STEP_TIMEOUT, label="ig.share")
         if not clicked_share:
             log("[IG] ⚠️ Bouton 'Share' introuvable, abandon.")
             return False
 
         # 5) Bouton 'Done'
         log("[IG] Recherche du bouton 'Done' dans 'Also share to'...")
-        clicked_done = _maybe_click(driver, [
+        done_xpaths = [
             "//android.widget.TextView[@text='Done']",
             "//*[@text='Done']",
-        ], delay=1.0 * IG_FACTOR)
+        ]
+        clicked_done = _maybe_click(driver, done_xpaths, timeout=IG_STEP_TIMEOUT, label="ig.done")
 
         if clicked_done:
+            wait_gone(driver, done_xpaths, timeout=IG_STEP_TIMEOUT, label="ig.done_gone")
             if from_multi:
                 log("✅ Story publiée sur Instagram (Next → Share → Done, mode multi).")
             else:
@@ -403,42 +473,57 @@ def share_to_instagram(driver, mode="auto"):
             log("[IG] ⚠️ Bouton 'Done' introuvable : publication Instagram non confirmée.")
             return False
 
+    # Écrans d'entrée Instagram → sélecteurs du handler correspondant
+    entry_screens = {"ig.story_entry": story_xpaths, "ig.share_to": [share_to_xpath]}
+    if not is_intro:
+        entry_screens["ig.gallery_next"] = next_xpaths
+
     # 1) Feuille de partage Android → entrée Instagram (si visible)
-    log("[IG] Sélection d'Instagram dans la feuille de partage (si visible)...")
-    if not _maybe_click(driver, [
-        "//*[@text='Instagram' or contains(@content-desc,'Instagram')]"
-    ], delay=1.2 * IG_FACTOR):
-        log("[IG] Instagram introuvable dans la feuille de partage (on est peut-être déjà dans l'app).")
+    #    1 snapshot : déjà dans Instagram → pas de sonde de la feuille
+    screen = classify(driver, ["share_sheet"] + list(entry_screens))
+    if screen in entry_screens:
+        log(f"[IG] Déjà dans Instagram ({screen}), pas de feuille de partage.")
+    else:
+        log("[IG] Sélection d'Instagram dans la feuille de partage (si visible)...")
+        if not _maybe_click(driver, [
+            "//*[@text='Instagram' or contains(@content-desc,'Instagram')]"
+        ], timeout=1.5 if in_app else 3.0, label="ig.share_target"):
+            log("[IG] Instagram introuvable dans la feuille de partage (on est peut-être déjà dans l'app).")
 
     # 2) ESSAI RAPIDE (INTRO / AUTO) : Your story / Your stories / Share to
     if not is_multi:
-        # 2a) Your story / Votre story / Your stories
-        log("[IG] Tentative clic sur 'Your story' / 'Votre story' / 'Your stories'...")
-        clicked_story = _maybe_click(driver, [
-            "//*[@text='Your story']",
-            "//*[@text='Votre story']",
-            "//*[contains(@content-desc,'Your story')]",
-            "//*[contains(@content-desc,'Votre story')]",
-            "//android.widget.Button[@content-desc='Your stories']",
-        ], delay=1.0 * IG_FACTOR)
-
-        if clicked_story:
-            # Dans ce cas, la story est postée directement, on ne fait PAS Next/Share/Done
-            log("✅ Story publiée sur Instagram via 'Your story / Your stories' (mode intro).")
-            return
+        # 2a + 2b) Un seul polling pour les deux écrans possibles
+        #          (+ 'Next' en mode auto pour ne pas attendre pour rien)
+        log("[IG] Attente de 'Your story' / 'Your stories' / 'Share to'...")
+        if snapshot_enabled():
+            # Classifieur : écran reconnu → sélecteurs de CE handler seulement
+            screen = wait_for_screen(driver, entry_screens, timeout=IG_LOAD_TIMEOUT, label="ig.entry")
+            match = first_match(driver, entry_screens[screen]) if screen else None
         else:
-            log("[IG] 'Your story' / 'Your stories' introuvable.")
+            candidates = [xp for xps in entry_screens.values() for xp in xps]
+            match = wait_for_match(driver, candidates, timeout=IG_LOAD_TIMEOUT, label="ig.entry")
+        xp = match[0] if match else None
 
-        # 2b) Bouton "Share to" (cas intro avec partage vers story)
-        log("[IG] Tentative clic sur 'Share to'...")
-        clicked_share_to = _maybe_click(driver, [
-            "//android.widget.Button[@content-desc='Share to']/android.widget.TextView",
-        ], delay=1.0 * IG_FACTOR)
+        if xp in story_xpaths:
+            try:
+                match[1].click()
+                # Dans ce cas, la story est postée directement, on ne fait PAS Next/Share/Done
+                wait_gone(driver, xp, timeout=IG_STEP_TIMEOUT, label="ig.story_sent")
+                log("✅ Story publiée sur Instagram via 'Your story / Your stories' (mode intro).")
+                return
+            except Exception as e:
+                log(f"[IG] Clic 'Your story' KO : {e!r}")
+        else:
+            log("[IG] 'Your story' / 'Your stories' introuvable.")
 
-        if clicked_share_to:
-            log("[IG] 'Share to' cliqué, enchaînement Share → Done (sans Next).")
-            _ig_share_and_done(from_multi=False)
-            return
+        if xp == share_to_xpath:
+            try:
+                match[1].click()
+                log("[IG] 'Share to' cliqué, enchaînement Share → Done (sans Next).")
+                _ig_share_and_done(from_multi=False)
+                return
+            except Exception as e:
+                log(f"[IG] Clic 'Share to' KO : {e!r}")
 
     # Si on est en mode INTRO explicite et qu'on n'a ni Story ni Share to,
     # on NE DOIT PAS lancer le flow multi.
@@ -451,26 +536,10 @@ def share_to_instagram(driver, mode="auto"):
     #    - ou pour mode "auto" si on n’a pas trouvé Story / Share to
     log("[IG] Flow multi Instagram (Next → Share → Done)...")
 
-    # 🔥 On laisse le temps à Instagram de charger toutes les vignettes,
-    # surtout quand il y a plusieurs vidéos (sinon 'Next' arrive trop tard).
-    log("[IG] Pause avant recherche du bouton 'Next' (chargement vidéos)...")
-    time.sleep(1.0 * IG_FACTOR)
-
+    # 🔥 'Next' n'apparaît qu'une fois toutes les vignettes chargées (vidéos) :
+    # polling jusqu'à IG_LOAD_TIMEOUT au lieu d'une pause fixe.
     log("[IG] Recherche du bouton 'Next'...")
-    clicked_next = _maybe_click(driver, [
-        # bouton 'Next' (content-desc)
-        "//android.widget.Button[@content-desc='Next']",
-
-        # bouton 'Next' dans le tray (texte + resource-id spécifiques)
-        "//android.widget.TextView[@resource-id='com.instagram.android:id/media_thumbnail_tray_button_text' and @text='Next']",
-        "//android.widget.TextView[@resource-id='com.instagram.android:id/media_thumbnail_tray_button_text']",
-
-        # layout qui contient le bouton Next (au cas où on clique le container)
-        "//android.widget.LinearLayout[@resource-id='com.instagram.android:id/media_thumbnail_tray_next_buttons_layout']",
-
-        # fallback texte simple
-        "//*[@text='Next']",
-    ], delay=1.0 * IG_FACTOR)
+    clicked_next = _maybe_click(driver, next_xpaths, timeout=IG_LOAD_TIMEOUT, label="ig.next")
 
     if not clicked_next:
         log("[IG] ⚠️ Bouton 'Next' introuvable, abandon du flow multi.")
@@ -487,22 +556,50 @@ def share_to_whatsapp_status(driver):
     log("✅ Feuille WhatsApp Business ouverte.")
 
 # ===================== TIKTOK =====================
-def share_to_tiktok(driver):
+def share_to_tiktok(driver, in_app: bool = False):
     """
     Feuille de partage → TikTok → premier bouton (Photo/story)
     → mute éventuel → publier en story.
+
+    in_app=True : médias déjà envoyés à TikTok par intent (pas de feuille de partage).
     """
 
-    # facteur global pour TikTok (délais un peu plus longs)
-    TT_FACTOR = 2.0
+    # Deadlines TikTok (l'éditeur est lent à charger) — remplacent les
+    # pauses fixes × TT_FACTOR après chaque clic.
+    TT_STEP_TIMEOUT = 5.0
+    TT_EDITOR_TIMEOUT = 8.0
+
+    publish_xpaths = [
+        # A) XPATH basé sur le texte "Your Story" / "Story"
+        "//android.widget.TextView[@resource-id='com.zhiliaoapp.musically:id/s30' and (@text='Your Story' or @text='Story')]",
+        "//android.widget.TextView[contains(@text,'Your Story') or contains(@text,'Story')]",
+
+        # B) Layout complet du bouton de story (container)
+        "//android.widget.FrameLayout[@resource-id='com.zhiliaoapp.musically:id/mnh']/android.widget.LinearLayout",
+        "//android.widget.FrameLayout[@resource-id='com.zhiliaoapp.musically:id/mnh']",
+
+        # C) Autres vues associées au bouton "Your Story"
+        "//android.view.View[@resource-id='com.zhiliaoapp.musically:id/app']",
+        "//android.widget.FrameLayout[@resource-id='com.zhiliaoapp.musically:id/mni']",
+        "//android.widget.ImageView[@resource-id='com.zhiliaoapp.musically:id/hlr']",
+    ]
+    mute_xpaths = [
+        "//android.widget.ImageView[@resource-id='com.zhiliaoapp.musically:id/c8b']",
+        "//android.view.View[@resource-id='com.zhiliaoapp.musically:id/c8f']",
+    ]
 
     # 1) Feuille de partage Android → entrée TikTok
-    log("[TT] Sélection de TikTok dans la feuille de partage...")
-    if not _maybe_click(driver, [
-        "//*[@text='TikTok' or contains(@content-desc,'TikTok')]",
-    ], delay=1.2 * TT_FACTOR):
-        log("[TT] ⚠️ TikTok introuvable dans la feuille de partage.")
-        return
+    if in_app:
+        if not snapshot_enabled() or classify(driver, ["share_sheet"]) == "share_sheet":
+            _maybe_click(driver, ["//*[@text='TikTok' or contains(@content-desc,'TikTok')]"],
+                         timeout=1.5, label="tt.share_target")
+    else:
+        log("[TT] Sélection de TikTok dans la feuille de partage...")
+        if not _maybe_click(driver, [
+            "//*[@text='TikTok' or contains(@content-desc,'TikTok')]",
+        ], timeout=3.0, label="tt.share_target"):
+            log("[TT] ⚠️ TikTok introuvable dans la feuille de partage.")
+            return
 
     # 2) Premier bouton dans TikTok (Photo / première vignette)
     log("[TT] Sélection du premier bouton (Photo / Vidéo / première image)...")
@@ -516,7 +613,8 @@ def share_to_tiktok(driver):
             # en DERNIER recours seulement : la 1re image ktq (fragile si l’ordre change)
             "(//android.widget.ImageView[@resource-id='com.zhiliaoapp.musically:id/ktq'])[1]",
         ],
-        delay=2.5 * TT_FACTOR,
+        timeout=TT_STEP_TIMEOUT,
+        label="tt.first_button",
     )
 
     if not clicked_first:
@@ -524,39 +622,24 @@ def share_to_tiktok(driver):
         # On continue quand même, au cas où l'écran suivant est déjà affiché
 
     # 3) Désactiver le son (mute) pour publier en story
+    #    On attend l'éditeur (mute OU bouton story) : le mute est optionnel,
+    #    inutile de payer son timeout s'il n'existe pas sur ce téléphone.
     log("[TT] Tentative de désactivation du son (mute)...")
-    _maybe_click(
-        driver,
-        [
-            "//android.widget.ImageView[@resource-id='com.zhiliaoapp.musically:id/c8b']",
-            "//android.view.View[@resource-id='com.zhiliaoapp.musically:id/c8f']",
-        ],
-        delay=0.8 * TT_FACTOR,
-    )
-
-    # petite pause pour laisser TikTok préparer l'écran "Your Story"
-    time.sleep(1.0 * TT_FACTOR)
+    match = wait_for_match(driver, mute_xpaths + publish_xpaths,
+                           timeout=TT_EDITOR_TIMEOUT, label="tt.editor")
+    if match is not None and match[0] in mute_xpaths:
+        try:
+            match[1].click()
+        except Exception:
+            pass
+    elif match is not None:
+        # Éditeur affiché : courte chance au mute (icône parfois dessinée après)
+        _maybe_click(driver, mute_xpaths, timeout=1.0, label="tt.mute")
 
     # 4) Bouton de publication en story ("Your Story" / "Story")
     log("[TT] Recherche du bouton de publication (story / post)...")
-    clicked_publish = _maybe_click(
-        driver,
-        [
-            # A) XPATH basé sur le texte "Your Story" / "Story"
-            "//android.widget.TextView[@resource-id='com.zhiliaoapp.musically:id/s30' and (@text='Your Story' or @text='Story')]",
-            "//android.widget.TextView[contains(@text,'Your Story') or contains(@text,'Story')]",
-
-            # B) Layout complet du bouton de story (container)
-            "//android.widget.FrameLayout[@resource-id='com.zhiliaoapp.musically:id/mnh']/android.widget.LinearLayout",
-            "//android.widget.FrameLayout[@resource-id='com.zhiliaoapp.musically:id/mnh']",
-
-            # C) Autres vues associées au bouton "Your Story"
-            "//android.view.View[@resource-id='com.zhiliaoapp.musically:id/app']",
-            "//android.widget.FrameLayout[@resource-id='com.zhiliaoapp.musically:id/mni']",
-            "//android.widget.ImageView[@resource-id='com.zhiliaoapp.musically:id/hlr']",
-        ],
-        delay=1.5 * TT_FACTOR,
-    )
+    clicked_publish = _maybe_click(driver, publish_xpaths, timeout=TT_STEP_TIMEOUT,
+                                   label="tt.publish")
 
     # D) Dernière chance : UiSelector sur le texte
     if not clicked_publish:
@@ -568,11 +651,14 @@ def share_to_tiktok(driver):
                 'new UiSelector().descriptionContains("Your Story")',
                 'new UiSelector().descriptionContains("Story")',
             ],
-            delay=1.5 * TT_FACTOR,
+            timeout=0.0,
             strategy="uiautomator",
+            label="tt.publish",
         )
 
     if clicked_publish:
+        # Publication partie quand le bouton story disparaît
+        wait_gone(driver, publish_xpaths[:2], timeout=TT_STEP_TIMEOUT, label="tt.published")
         log("✅ Vidéo postée en story TikTok.")
     else:
         log("[TT] ⚠️ Bouton de publication TikTok introuvable : story non confirmée.")
@@ -592,30 +678,38 @@ def pre_platform_setup(driver, platform: str, options: dict | None):
         if page_code or page_name:
             fb_preselect_page(driver, page_code, page_name)
 
-def share_to_platform(driver, platform: str, options: dict | None = None) -> None:
+def share_to_platform(driver, platform: str, options: dict | None = None, in_app: bool = False) -> None:
     """
     Action APRÈS avoir tapé 'Share' dans la Galerie.
+    in_app=True : médias envoyés par intent, l'app cible est déjà ouverte.
     """
     options = options or {}
     platform = (platform or "").strip()
 
     if platform == "WhatsApp":
         # On se contente d’ouvrir la feuille WAB, le reste est fait dans engine_intro
-        share_to_whatsapp_status(driver)
+        if not in_app:
+            share_to_whatsapp_status(driver)
         return
 
     if platform == "Facebook":
-        share_to_facebook(driver, options)
+        share_to_facebook(driver, options, in_app=in_app)
         return
 
     if platform == "Instagram":
         # Plus de variante IG : un seul Instagram par téléphone
-        share_to_instagram(driver)
+        share_to_instagram(driver, in_app=in_app)
         return
 
 
     if platform == "TikTok":
-        share_to_tiktok(driver)
+        share_to_tiktok(driver, in_app=in_app)
         return
 
     log(f"[WARN] Plateforme inconnue pour share_to_platform : {platform}")
+
+
+# ==========================================================================
+# 🔬 Tracing (STORYFX_TRACE=1) : span autour de chaque helper du module
+# ==========================================================================
+trace_module(sys.modules[__name__])
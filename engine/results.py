@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Résultat structuré d'un run d'engine
+------------------------------------
+Les engines retournent un RunResult au lieu d'un int nu :
+
+    {"engine": "multi", "profile": "S23_IG", "platform": "Instagram",
+     "rc": 7, "failed_step": "share", "attempts": 2,
+     "steps": [{"name": "adb_connect", "s": 0.41, "ok": true},
+               {"name": "session", "s": 0.02, "ok": true}, ...],
+     "selectors": {"gallery.share_button": "//*[@content-desc='Share']"},
+     "started_at": "...", "duration_s": 38.2}
+
+Enregistrement sans faire passer l'objet partout : begin() le déclare
+"en cours" pour le thread, puis
+
+    with timed("unlock"):
+        unlock_screen_if_needed(driver)
+
+mesure l'étape (échec si exception), fail("reset") marque l'étape en
+échec, note_selector() garde le sélecteur gagnant de chaque attente
+(engine.waits). runner.py écrit le résultat en UNE ligne JSON
+(--result-file) : timings agrégeables sans parser les logs. Chaque étape
+mesurée est aussi un span "step" de engine.tracing (STORYFX_TRACE=1).
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .tracing import span
+
+_CURRENT = threading.local()
+
+
+class RunResult:
+    """Résultat d'un run : rc, étape en échec, durées par étape, sélecteurs."""
+
+    def __init__(self, engine: str, profile: Optional[str] = None, platform: Optional[str] = None):
+        self.engine = engine
+        self.profile = profile
+        self.platform = platform
+        self.rc: Optional[int] = None
+        self.failed_step: Optional[str] = None
+        self.attempts = 1
+        self.steps: List[Dict[str, Any]] = []
+        self.selectors: Dict[str, str] = {}
+        self.prefix = ""
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._t0 = time.monotonic()
+        self.duration_s: Optional[float] = None
+
+    def record(self, name: str, seconds: float, ok: bool) -> None:
+        name = f"{self.prefix}.{name}" if self.prefix else name
+        self.steps.append({"name": name, "s": round(seconds, 3), "ok": ok})
+        if not ok and self.failed_step is None:
+            self.failed_step = name
+
+    def fail(self, name: str) -> None:
+        """L'étape `name` (déjà mesurée) a rendu un code d'échec."""
+        name = f"{self.prefix}.{name}" if self.prefix else name
+        for st in reversed(self.steps):
+            if st["name"] == name:
+                st["ok"] = False
+                break
+        if self.failed_step is None:
+            self.failed_step = name
+
+    def finish(self, rc: int) -> "RunResult":
+        self.rc = rc
+        self.duration_s = round(time.monotonic() - self._t0, 3)
+        if _CURRENT.__dict__.get("result") is self:
+            _CURRENT.result = None
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "engine": self.engine,
+            "profile": self.profile,
+            "platform": self.platform,
+            "rc": self.rc,
+            "failed_step": self.failed_step,
+            "attempts": self.attempts,
+            "steps": list(self.steps),
+            "selectors": dict(self.selectors),
+            "started_at": self.started_at,
+            "duration_s": self.duration_s,
+        }
+
+
+def begin(engine: str, profile: Optional[str] = None, platform: Optional[str] = None) -> RunResult:
+    """Nouveau résultat "en cours" pour ce thread."""
+    result = RunResult(engine, profile, platform)
+    _CURRENT.result = result
+    return result
+
+
+def current() -> Optional[RunResult]:
+    return _CURRENT.__dict__.get("result")
+
+
+def reset() -> None:
+    """Oublie le résultat en cours (début de job : rien d'un job précédent)."""
+    _CURRENT.result = None
+
+
+@contextmanager
+def timed(name: str):
+    """Mesure l'étape `name` dans le résultat en cours (no-op sans résultat) + span de trace."""
+    result = current()
+    t0 = time.monotonic()
+    try:
+        with span(f"{result.prefix}.{name}" if result is not None and result.prefix else name, cat="step"):
+            yield
+    except BaseException:
+        if result is not None:
+            result.record(name, time.monotonic() - t0, False)
+        raise
+    if result is not None:
+        result.record(name, time.monotonic() - t0, True)
+
+
+@contextmanager
+def phase(name: str):
+    """Préfixe les étapes mesurées dedans ("intro.album", "multi.share"...)."""
+    result = current()
+    if result is None:
+        yield
+        return
+    old, result.prefix = result.prefix, name
+    try:
+        yield
+    finally:
+        result.prefix = old
+
+
+def fail(name: str) -> None:
+    result = current()
+    if result is not None:
+        result.fail(name)
+
+
+def note_selector(label: str, selector: str) -> None:
+    result = current()
+    if result is not None:
+        result.selectors[label] = selector
+
+
+def rc_of(value) -> int:
+    """rc d'un retour d'engine (RunResult ou int des anciennes signatures)."""
+    return value.rc if isinstance(value, RunResult) else value
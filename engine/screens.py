@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Classifieur d'écran : "où est-on ?" en UNE sonde
+------------------------------------------------
+Les flows devinaient l'écran courant en essayant des sélecteurs les uns
+après les autres (feuille de partage ? 'Your story' ? 'Share to' ?
+'Next' ?), chaque essai raté coûtant son timeout. Ici :
+
+    ✔ 1 snapshot (driver.page_source, engine.snapshot) → package du
+      premier plan + ensemble des resource-id + XPath clés
+    ✔ comparaison à une bibliothèque d'écrans connus (SCREENS)
+    ✔ l'appelant dispatche directement vers le bon handler
+
+Un écran = dict :
+    {"name": "ig.share_to",
+     "packages": ["com.instagram.android"],   # vide = tous
+     "ids": ["com.instagram.android:id/..."], # resource-id présents
+     "xpaths": ["//android.widget.Button[@content-desc='Share to']"],
+     "min": 1}                                # nb de signaux requis
+
+Bibliothèque extensible depuis des page_source enregistrés
+(config/screens.json, prioritaire sur les écrans intégrés) :
+
+    python -m engine.screens learn ig.reel_editor dump_reel.xml
+    python -m engine.screens classify dump_reel.xml
+
+Sans lxml (snapshot indisponible) classify() renvoie None : les flows
+gardent leurs sondes historiques.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from ui.ui_paths_helpers import CONFIG, load_json, save_json_atomic
+
+from .snapshot import etree, get_snapshot, snapshot_enabled
+from .waits import wait_until
+
+SCREENS_FILE = CONFIG / "screens.json"
+
+GALLERY = "com.sec.android.gallery3d"
+WAB = "com.whatsapp.w4b"
+FB = "com.facebook.katana"
+IG = "com.instagram.android"
+TT = "com.zhiliaoapp.musically"
+
+# Ordre = priorité (le premier écran reconnu gagne)
+SCREENS: List[Dict] = [
+    # ---------- Feuille de partage / sélecteur Android ----------
+    {"name": "share_sheet",
+     "packages": ["android", "com.android.intentresolver", "com.samsung.android.intentresolver"]},
+
+    # ---------- Galerie Samsung ----------
+    {"name": "gallery.album_content", "packages": [GALLERY],
+     "ids": [f"{GALLERY}:id/thumbnail_preview_layout"]},
+    {"name": "gallery.tabs", "packages": [GALLERY],
+     "ids": [f"{GALLERY}:id/tab_albums"],
+     "xpaths": ['//android.widget.LinearLayout[@content-desc="Albums"]',
+                f'//android.widget.TextView[@resource-id="{GALLERY}:id/title" and @text="Albums"]']},
+
+    # ---------- WhatsApp Business ----------
+    {"name": "wab.contact_picker", "packages": [WAB],
+     "ids": [f"{WAB}:id/contactpicker_row_name"]},
+
+    # ---------- Instagram ----------
+    {"name": "ig.story_entry", "packages": [IG],
+     "xpaths": ["//*[@text='Your story']", "//*[@text='Votre story']",
+                "//*[contains(@content-desc,'Your story')]",
+                "//*[contains(@content-desc,'Votre story')]",
+                "//android.widget.Button[@content-desc='Your stories']"]},
+    {"name": "ig.share_to", "packages": [IG],
+     "xpaths": ["//android.widget.Button[@content-desc='Share to']"]},
+    {"name": "ig.gallery_next", "packages": [IG],
+     "ids": [f"{IG}:id/media_thumbnail_tray_button_text",
+             f"{IG}:id/media_thumbnail_tray_next_buttons_layout"],
+     "xpaths": ["//android.widget.Button[@content-desc='Next']"]},
+
+    # ---------- TikTok ----------
+    {"name": "tt.editor", "packages": [TT],
+     "ids": [f"{TT}:id/c8b", f"{TT}:id/c8f", f"{TT}:id/mnh", f"{TT}:id/mni"]},
+    {"name": "tt.picker", "packages": [TT],
+     "ids": [f"{TT}:id/ktc", f"{TT}:id/ktq"]},
+]
+
+_LIB_LOCK = threading.Lock()
+_LIB_CACHE: Dict[str, object] = {"mtime": None, "screens": SCREENS}
+
+
+def library() -> List[Dict]:
+    """Écrans appris (config/screens.json) puis écrans intégrés."""
+    try:
+        mtime = os.path.getmtime(SCREENS_FILE)
+    except OSError:
+        mtime = None
+    with _LIB_LOCK:
+        if mtime != _LIB_CACHE["mtime"]:
+            learned = load_json(SCREENS_FILE, []) if mtime is not None else []
+            learned = [s for s in learned if isinstance(s, dict) and s.get("name")]
+            names = {s["name"] for s in learned}
+            _LIB_CACHE["screens"] = learned + [s for s in SCREENS if s["name"] not in names]
+            _LIB_CACHE["mtime"] = mtime
+        return _LIB_CACHE["screens"]
+
+
+# ==========================================================================
+# 🔎 Classification
+# ==========================================================================
+def foreground_package(root) -> str:
+    """Package du premier nœud applicatif du XML (fenêtre au premier plan)."""
+    for node in root.iter():
+        pkg = node.get("package")
+        if pkg and pkg != "com.android.systemui":
+            return pkg
+    return ""
+
+
+def _xpath_hit(root, xp: str) -> bool:
+    try:
+        return bool(root.xpath(xp))
+    except Exception:
+        return False
+
+
+def classify_tree(root, candidates: Optional[Iterable[str]] = None) -> Optional[str]:
+    """Nom du premier écran de la bibliothèque qui correspond à l'arbre `root`."""
+    wanted = set(candidates) if candidates is not None else None
+    package = foreground_package(root)
+    ids = None
+
+    for screen in library():
+        if wanted is not None and screen["name"] not in wanted:
+            continue
+        packages = screen.get("packages") or []
+        if packages and package not in packages:
+            continue
+
+        screen_ids = screen.get("ids") or []
+        xpaths = screen.get("xpaths") or []
+        need = min(int(screen.get("min", 1)), len(screen_ids) + len(xpaths))
+        if need <= 0:
+            return screen["name"]
+
+        if screen_ids and ids is None:
+            ids = {n.get("resource-id") for n in root.iter() if n.get("resource-id")}
+        hits = 0
+        for rid in screen_ids:
+            hits += rid in ids
+            if hits >= need:
+                return screen["name"]
+        for xp in xpaths:
+            hits += _xpath_hit(root, xp)
+            if hits >= need:
+                return screen["name"]
+    return None
+
+
+def classify(driver, candidates: Optional[Iterable[str]] = None, fresh: bool = True) -> Optional[str]:
+    """Écran courant (parmi `candidates` si donné) ou None si inconnu / sans snapshot."""
+    snap = get_snapshot(driver, fresh=fresh)
+    if snap is None:
+        return None
+    return classify_tree(snap.root, candidates)
+
+
+def wait_for_screen(driver, candidates: Iterable[str], timeout: float = 5.0,
+                    label: str = "screen") -> Optional[str]:
+    """Polling de classify() jusqu'à ce qu'un des écrans `candidates` soit reconnu."""
+    candidates = list(candidates)
+    if not snapshot_enabled():
+        return None
+    return wait_until(lambda: classify(driver, candidates), timeout=timeout, label=label)
+
+
+# ==========================================================================
+# 📚 Apprentissage depuis un page_source enregistré
+# ==========================================================================
+def _parse(xml) -> object:
+    data = xml.encode("utf-8") if isinstance(xml, str) else xml
+    return etree.fromstring(data, parser=etree.XMLParser(recover=True, huge_tree=True))
+
+
+def learn_screen(name: str, xml, max_ids: int = 6) -> Dict:
+    """
+    Empreinte d'un écran à partir de son XML : package + resource-id
+    présents UNE seule fois (structure de l'écran, pas les cellules de liste).
+    """
+    root = _parse(xml)
+    package = foreground_package(root)
+    order: List[str] = []
+    counts: Counter = Counter()
+    for node in root.iter():
+        rid = node.get("resource-id")
+        if rid and (not package or rid.startswith(package + ":id/")):
+            if rid not in counts:
+                order.append(rid)
+            counts[rid] += 1
+    ids = [rid for rid in order if counts[rid] == 1][:max_ids]
+    return {
+        "name": name,
+        "packages": [package] if package else [],
+        "ids": ids,
+        "min": max(1, (len(ids) + 1) // 2),
+    }
+
+
+def save_learned(screen: Dict) -> None:
+    """Ajoute / remplace l'écran dans config/screens.json."""
+    learned = [s for s in load_json(SCREENS_FILE, []) if s.get("name") != screen["name"]]
+    learned.append(screen)
+    save_json_atomic(SCREENS_FILE, learned)
+
+
+def main(argv: List[str]) -> int:
+    if etree is None:
+        print("lxml requis.")
+        return 2
+    if len(argv) == 3 and argv[0] == "learn":
+        screen = learn_screen(argv[1], Path(argv[2]).read_bytes())
+        save_learned(screen)
+        print(f"Écran '{screen['name']}' appris : {screen}")
+        return 0
+    if len(argv) == 2 and argv[0] == "classify":
+        root = _parse(Path(argv[1]).read_bytes())
+        print(f"{foreground_package(root)} → {classify_tree(root) or 'inconnu'}")
+        return 0
+    print("Usage : python -m engine.screens learn <nom> <dump.xml> | classify <dump.xml>")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
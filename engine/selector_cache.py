@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Cache des sélecteurs gagnants (selector_cache.json, à côté de locators.json)
+----------------------------------------------------------------------------
+Les listes de fallbacks (bouton Share, icônes Facebook / Instagram /
+TikTok...) sont toujours essayées dans le même ordre ; sur un S23 le bon
+sélecteur est souvent le 5e ou le 6e. Ici on retient, par :
+
+    (profil, plateforme, étape, versionCode de l'app)
+
+le sélecteur qui a marché la dernière fois (+ durée + nb de succès), et
+les runs suivants l'essaient EN PREMIER.
+
+    ✔ versionCode lu via `dumpsys package` (mis en cache 10 min par téléphone)
+      → une mise à jour de l'app crée une nouvelle clé, l'ancienne est purgée
+    ✔ contexte (device_id / profil) attaché au driver par make_driver()
+      et par le pool de sessions (set_driver_context)
+    ✔ fichier relu seulement si modifié (plusieurs workers en parallèle)
+    ✔ lisible / vidable depuis l'onglet Admin → Locators
+"""
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from ui.ui_paths_helpers import (
+    SELECTOR_CACHE,
+    adb_shell,
+    load_selector_cache_dict,
+    save_selector_cache_dict,
+)
+
+VERSION_TTL = 600.0
+
+# Préfixe de l'étape (label des attentes) → (plateforme, package de l'app)
+STEP_APPS: Dict[str, Tuple[str, str]] = {
+    "gallery": ("Gallery", "com.sec.android.gallery3d"),
+    "wab": ("WhatsApp", "com.whatsapp.w4b"),
+    "fb": ("Facebook", "com.facebook.katana"),
+    "ig": ("Instagram", "com.instagram.android"),
+    "tt": ("TikTok", "com.zhiliaoapp.musically"),
+}
+
+_VERSION_RE = re.compile(r"versionCode=(\d+)")
+
+
+# ==========================================================================
+# 🔖 Contexte attaché au driver
+# ==========================================================================
+def set_driver_context(driver, device_id: Optional[str], profile_name: Optional[str]) -> None:
+    try:
+        driver._storyfx_ctx = {"device_id": device_id or "", "profile": profile_name or "default"}
+    except Exception:
+        pass
+
+
+def driver_context(driver) -> Dict[str, str]:
+    return getattr(driver, "_storyfx_ctx", None) or {}
+
+
+def cache_key(profile: str, platform: str, step: str, version_code: str) -> str:
+    return f"{profile}|{platform}|{step}|{version_code}"
+
+
+# ==========================================================================
+# 📦 versionCode des apps
+# ==========================================================================
+_VERSIONS: Dict[Tuple[str, str], Tuple[float, str]] = {}
+_VERSIONS_LOCK = threading.Lock()
+
+
+def app_version_code(device_id: str, package: str) -> str:
+    """versionCode installé ('?' si illisible), relu au plus toutes les VERSION_TTL s."""
+    now = time.monotonic()
+    with _VERSIONS_LOCK:
+        hit = _VERSIONS.get((device_id, package))
+    if hit is not None and now - hit[0] < VERSION_TTL:
+        return hit[1]
+
+    version = "?"
+    if device_id:
+        try:
+            _, out = adb_shell(device_id, f"dumpsys package {package} | grep versionCode")
+            m = _VERSION_RE.search(out or "")
+            if m:
+                version = m.group(1)
+        except Exception:
+            pass
+
+    with _VERSIONS_LOCK:
+        _VERSIONS[(device_id, package)] = (now, version)
+    return version
+
+
+# ==========================================================================
+# 💾 Cache persistant
+# ==========================================================================
+class SelectorCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._mtime: Optional[float] = None
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.path.getmtime(SELECTOR_CACHE)
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self._entries = load_selector_cache_dict() if mtime is not None else {}
+            self._mtime = mtime
+
+    def _context(self, driver, step: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        app = STEP_APPS.get(step.split(".", 1)[0])
+        ctx = driver_context(driver)
+        if app is None or not ctx:
+            return None
+        platform, package = app
+        version = app_version_code(ctx.get("device_id", ""), package)
+        meta = {"profile": ctx.get("profile", "default"), "platform": platform,
+                "step": step, "version_code": version}
+        return cache_key(meta["profile"], platform, step, version), meta
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def order(self, driver, step: str, selectors: List[str]) -> List[str]:
+        """selectors avec le dernier gagnant connu en tête (ordre inchangé sinon)."""
+        ctx = self._context(driver, step)
+        if ctx is None:
+            return selectors
+        key, _ = ctx
+        with self._lock:
+            self._reload_if_changed()
+            entry = self._entries.get(key)
+        best = entry.get("selector") if entry else None
+        if best in selectors and selectors[0] != best:
+            return [best] + [s for s in selectors if s != best]
+        return selectors
+
+    def record(self, driver, step: str, selector: str, duration_s: float) -> None:
+        """Mémorise le sélecteur gagnant (et purge les anciennes versions de l'app)."""
+        ctx = self._context(driver, step)
+        if ctx is None:
+            return
+        key, meta = ctx
+        with self._lock:
+            self._reload_if_changed()
+            prev = self._entries.get(key) or {}
+
+            # Mise à jour de l'app → les clés des anciennes versions sont obsolètes
+            stem = cache_key(meta["profile"], meta["platform"], step, "")
+            for old in [k for k in self._entries if k.startswith(stem) and k != key]:
+                self._entries.pop(old, None)
+
+            self._entries[key] = dict(
+                meta,
+                selector=selector,
+                duration_s=round(duration_s, 3),
+                hits=(prev.get("hits", 0) + 1) if prev.get("selector") == selector else 1,
+                updated_at=datetime.now().isoformat(timespec="seconds"),
+            )
+            try:
+                save_selector_cache_dict(self._entries)
+                self._mtime = os.path.getmtime(SELECTOR_CACHE)
+            except Exception:
+                pass
+
+
+SELECTORS = SelectorCache()
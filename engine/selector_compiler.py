@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Compilateur de sélecteurs : XPath → stratégies natives UiAutomator2
+-------------------------------------------------------------------
+Une recherche XPath oblige le serveur UiAutomator2 à sérialiser TOUTE la
+hiérarchie en XML avant de l'évaluer ; ID / ACCESSIBILITY_ID / UiSelector
+parcourent l'arbre natif et s'arrêtent au premier nœud trouvé.
+
+compile_xpath() réécrit les formes courantes de nos locators :
+
+    //*[@resource-id='pkg:id/x']                 → AppiumBy.ID
+    //*[@content-desc='Share']                   → AppiumBy.ACCESSIBILITY_ID
+    //android.widget.TextView[@text='Done']      → UiSelector().className(..).text(..)
+    //*[contains(@content-desc,'Instagram')]     → UiSelector().descriptionContains(..)
+    //*[starts-with(@resource-id,'pkg:id/')]     → UiSelector().resourceIdMatches(..)
+    (//android.widget.FrameLayout[@resource-id='..'])[1] → ....instance(0)
+
+(prédicats combinés par `and` uniquement). Tout le reste (`or`, axes
+enfants, index par nœud, fonctions inconnues) reste en XPath.
+"""
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from appium.webdriver.common.appiumby import AppiumBy
+
+# '...' ou "..." (pas d'échappement en XPath 1.0)
+_STR = r"""(?:'([^']*)'|"([^"]*)")"""
+
+_CLASS = r"(\*|[A-Za-z_][\w.$]*)"
+_OUTER_INDEX_RE = re.compile(r"^\(\s*(//.+)\s*\)\s*\[\s*(\d+)\s*\]$", re.S)
+_OUTER_PAREN_RE = re.compile(r"^\(\s*(//[^()]*(?:\([^()]*\)[^()]*)*)\s*\)$", re.S)
+_STEP_RE = re.compile(rf"^//{_CLASS}(?:\[(.*)\])?$", re.S)
+
+_EQ_RE = re.compile(rf"^@([\w-]+)\s*=\s*{_STR}$")
+_FN_RE = re.compile(rf"^(contains|starts-with)\(\s*@([\w-]+)\s*,\s*{_STR}\s*\)$")
+
+# attribut → (égalité, contains, starts-with) en UiSelector
+_UI_METHODS = {
+    "text": ("text", "textContains", "textStartsWith"),
+    "content-desc": ("description", "descriptionContains", "descriptionStartsWith"),
+    "resource-id": ("resourceId", None, None),
+    "class": ("className", None, None),
+}
+
+
+def java_string(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _split_and(expr: str) -> Optional[List[str]]:
+    """Coupe 'a and b and c' hors des chaînes ; None si un 'or' est présent."""
+    parts, buf, quote, depth = [], [], None, 0
+    i = 0
+    while i < len(expr):
+        ch = expr[i]
+        if quote:
+            buf.append(ch)
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+            buf.append(ch)
+        elif ch in "([":
+            depth += 1
+            buf.append(ch)
+        elif ch in ")]":
+            depth -= 1
+            buf.append(ch)
+        elif depth == 0 and expr.startswith(" and ", i):
+            parts.append("".join(buf).strip())
+            buf = []
+            i += 5
+            continue
+        elif depth == 0 and expr.startswith(" or ", i):
+            return None
+        else:
+            buf.append(ch)
+        i += 1
+    if quote or depth:
+        return None
+    parts.append("".join(buf).strip())
+    return [p for p in parts if p]
+
+
+def _predicate(pred: str) -> Optional[Tuple[str, str, str]]:
+    """'@text='x'' → ('eq', 'text', 'x') ; None si forme non gérée."""
+    m = _EQ_RE.match(pred)
+    if m:
+        return "eq", m.group(1), m.group(2) if m.group(2) is not None else m.group(3)
+    m = _FN_RE.match(pred)
+    if m:
+        kind = "contains" if m.group(1) == "contains" else "starts"
+        return kind, m.group(2), m.group(3) if m.group(3) is not None else m.group(4)
+    return None
+
+
+@lru_cache(maxsize=1024)
+def compile_xpath(xpath: str) -> Tuple[str, str]:
+    """(by, valeur) natif si la forme est reconnue, sinon (AppiumBy.XPATH, xpath)."""
+    fallback = (AppiumBy.XPATH, xpath)
+    expr = (xpath or "").strip()
+
+    instance = None
+    m = _OUTER_INDEX_RE.match(expr)
+    if m:
+        expr, instance = m.group(1).strip(), int(m.group(2)) - 1
+        if instance < 0:
+            return fallback
+    else:
+        # "(//X[...])" sans index : parenthèses inutiles
+        m = _OUTER_PAREN_RE.match(expr)
+        if m:
+            expr = m.group(1).strip()
+
+    m = _STEP_RE.match(expr)
+    if not m or "//" in (m.group(2) or "") or "/" in m.group(1):
+        return fallback
+    cls, body = m.group(1), m.group(2)
+
+    preds = []
+    if body is not None:
+        parts = _split_and(body)
+        if not parts:
+            return fallback
+        for part in parts:
+            p = _predicate(part)
+            if p is None:
+                return fallback
+            preds.append(p)
+
+    # Formes "id seul" / "content-desc seul" → stratégies les plus rapides
+    if cls == "*" and instance is None and len(preds) == 1 and preds[0][0] == "eq":
+        _, attr, value = preds[0]
+        if attr == "resource-id":
+            return AppiumBy.ID, value
+        if attr == "content-desc":
+            return AppiumBy.ACCESSIBILITY_ID, value
+
+    calls = []
+    if cls != "*":
+        calls.append(f"className({java_string(cls)})")
+    for kind, attr, value in preds:
+        methods = _UI_METHODS.get(attr)
+        if methods is None:
+            return fallback
+        if attr == "resource-id" and kind == "starts":
+            calls.append(f"resourceIdMatches({java_string('^' + re.escape(value) + '.*')})")
+            continue
+        method = methods[{"eq": 0, "contains": 1, "starts": 2}[kind]]
+        if method is None:
+            return fallback
+        calls.append(f"{method}({java_string(value)})")
+    methods_used = [c.split("(", 1)[0] for c in calls]
+    if not calls or len(set(methods_used)) != len(methods_used):
+        # UiSelector garde une seule valeur par méthode → 2× textContains impossible
+        return fallback
+    if instance is not None:
+        calls.append(f"instance({instance})")
+    return AppiumBy.ANDROID_UIAUTOMATOR, "new UiSelector()." + ".".join(calls)
+
+
+def find_elements(driver, xpath: str):
+    """driver.find_elements avec la stratégie native compilée pour ce XPath."""
+    by, value = compile_xpath(xpath)
+    return driver.find_elements(by, value)
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de sessions Appium (une session UiAutomator2 par téléphone)
+----------------------------------------------------------------
+- acquire_driver() : réutilise la session du téléphone si elle répond
+  encore (sonde légère : current_package), sinon en recrée une
+  (make_driver → force-stop uiautomator2 + nouvelle session).
+- acquire_driver(resume=True) : flow interrompu à reprendre (engine.steps) →
+  ni BACK / HOME ni retour Galerie, l'écran (sélection, feuille de partage)
+  reste tel que la tentative précédente l'a laissé.
+- release_driver() : rend la session au pool au lieu de driver.quit().
+- Les sessions inutilisées depuis plus de STORYFX_SESSION_TTL secondes
+  (défaut 600) sont fermées ; toutes sont fermées à la sortie du process.
+- STORYFX_SESSION_POOL=0 → comportement historique (1 session par run).
+- Session déjà prêtée : on attend sa restitution (BORROW_WAIT s) puis
+  SessionBusy — jamais de 2ᵉ session sur le téléphone (make_driver
+  force-stop uiautomator2 et tuerait celle en cours).
+
+Gain : intro_multi n'ouvre plus qu'une session, et un worker du pool
+(worker_pool.py) garde la session du téléphone entre deux jobs.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .core import log, make_driver, clear_popups_and_go_home, open_gallery
+from .selector_cache import set_driver_context
+
+DEFAULT_SESSION_TTL = 600
+BORROW_WAIT = 30.0
+
+
+class SessionBusy(RuntimeError):
+    """La session du téléphone est encore prêtée à un autre engine (transitoire)."""
+
+
+def get_session_ttl() -> int:
+    try:
+        return max(30, int(os.environ.get("STORYFX_SESSION_TTL", DEFAULT_SESSION_TTL)))
+    except ValueError:
+        return DEFAULT_SESSION_TTL
+
+
+def session_pool_enabled() -> bool:
+    return os.environ.get("STORYFX_SESSION_POOL", "1").strip() not in ("0", "false", "no", "")
+
+
+def _session_key(platform_version: Optional[str], profile: Optional[dict]) -> str:
+    """Les capabilities qui imposent une nouvelle session si elles changent."""
+    profile = profile or {}
+    return json.dumps(
+        [str(platform_version or ""), profile.get("gallery") or {}, profile.get("appium_overrides") or {}],
+        sort_keys=True, default=str,
+    )
+
+
+def _is_alive(driver) -> bool:
+    """Sonde bon marché : 1 requête HTTP, lève si la session est morte."""
+    try:
+        return bool(driver.session_id) and driver.current_package is not None
+    except Exception:
+        return False
+
+
+def _quit(driver) -> None:
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+class SessionPool:
+    """Une session par device_id, prêtée à un seul engine à la fois."""
+
+    def __init__(self, ttl: Optional[int] = None):
+        self.ttl = ttl or get_session_ttl()
+        self._lock = threading.Lock()
+        self._returned = threading.Condition(self._lock)   # notifié à chaque restitution
+        self._sessions: Dict[str, Dict[str, Any]] = {}   # device_id -> entrée
+        self._reaper: Optional[threading.Thread] = None
+        atexit.register(self.close_all)
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def acquire(self, device_id: str, platform_version: Optional[str] = None,
+                profile: Optional[dict] = None, resume: bool = False):
+        """Retourne un driver prêt (Galerie au premier plan, écran intact si resume)."""
+        if not session_pool_enabled():
+            return make_driver(device_id, platform_version, profile=profile, resume=resume)
+
+        key = _session_key(platform_version, profile)
+        stale = None
+
+        with self._lock:
+            # Déjà prêtée (ne devrait pas arriver : 1 job par téléphone) → on attend
+            deadline = time.monotonic() + BORROW_WAIT
+            while self._sessions.get(device_id, {}).get("borrowed"):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SessionBusy(f"Session {device_id} toujours prêtée après {BORROW_WAIT:.0f} s")
+                self._returned.wait(remaining)
+
+            entry = self._sessions.get(device_id)
+            if entry is not None:
+                if entry["key"] == key and time.monotonic() - entry["last_used"] < self.ttl:
+                    entry["borrowed"] = True
+                else:
+                    stale = self._sessions.pop(device_id)
+                    entry = None
+            if entry is None:
+                # Place réservée dans la même section critique que la recherche :
+                # un acquire concurrent attend au lieu d'ouvrir une 2ᵉ session
+                self._sessions[device_id] = {"driver": None, "key": key, "borrowed": True,
+                                             "last_used": time.monotonic(), "uses": 0}
+
+        if stale is not None:
+            _quit(stale["driver"])
+
+        if entry is not None:
+            driver = entry["driver"]
+            if _is_alive(driver):
+                entry["uses"] += 1
+                log(f"[session] Réutilisation session {driver.session_id} "
+                    f"({device_id}, utilisation n°{entry['uses']}).")
+                # Même téléphone, mais le profil peut changer (S23_IG → S23_FB_CM)
+                set_driver_context(driver, device_id, (profile or {}).get("profile_name"))
+                if resume:
+                    log(f"[session] Reprise de flow : écran laissé tel quel ({device_id}).")
+                    return driver
+                try:
+                    clear_popups_and_go_home(driver)
+                    open_gallery(driver)
+                except Exception as e:
+                    log(f"[WARN] Impossible de nettoyer l'écran / ouvrir la Galerie : {e!r}")
+                return driver
+
+            # L'entrée (toujours prêtée) sert de réservation pendant make_driver
+            log(f"[session] Session {device_id} morte → recréation.")
+            _quit(driver)
+
+        try:
+            driver = make_driver(
+                device_id, platform_version, profile=profile,
+                new_command_timeout=self.ttl + 60, resume=resume,
+            )
+        except BaseException:
+            with self._lock:
+                self._sessions.pop(device_id, None)
+                self._returned.notify_all()
+            raise
+        with self._lock:
+            self._sessions[device_id] = {
+                "driver": driver,
+                "key": key,
+                "borrowed": True,
+                "last_used": time.monotonic(),
+                "uses": 1,
+            }
+        return driver
+
+    def release(self, driver, healthy: bool = True) -> None:
+        """Rend la session (à appeler dans le finally des engines)."""
+        if driver is None:
+            return
+        if not session_pool_enabled():
+            _quit(driver)
+            return
+
+        drop = None
+        with self._lock:
+            for device_id, entry in self._sessions.items():
+                if entry["driver"] is driver:
+                    if healthy:
+                        entry["borrowed"] = False
+                        entry["last_used"] = time.monotonic()
+                    else:
+                        drop = self._sessions.pop(device_id)
+                    self._returned.notify_all()
+                    break
+            else:
+                drop = {"driver": driver}   # driver inconnu du pool
+
+        if drop is not None:
+            _quit(drop["driver"])
+        else:
+            self._start_reaper()
+
+    def discard(self, device_id: str) -> None:
+        """Ferme la session d'un téléphone (ex : après reset ADB)."""
+        with self._lock:
+            entry = self._sessions.pop(device_id, None)
+            self._returned.notify_all()
+        if entry is not None and entry["driver"] is not None:
+            _quit(entry["driver"])
+
+    def evict_idle(self) -> int:
+        """Ferme les sessions libres inutilisées depuis plus de ttl secondes."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for device_id, entry in list(self._sessions.items()):
+                if not entry["borrowed"] and now - entry["last_used"] >= self.ttl:
+                    expired.append((device_id, self._sessions.pop(device_id)))
+        for device_id, entry in expired:
+            log(f"[session] Session {device_id} inactive depuis {self.ttl}s → fermée.")
+            _quit(entry["driver"])
+        return len(expired)
+
+    def close_all(self) -> None:
+        with self._lock:
+            entries = list(self._sessions.values())
+            self._sessions.clear()
+        for entry in entries:
+            if entry["driver"] is not None:
+                _quit(entry["driver"])
+
+    # ------------------------------------------------------------------ #
+    # Interne
+    # ------------------------------------------------------------------ #
+    def _start_reaper(self) -> None:
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+
+        def loop():
+            while True:
+                time.sleep(min(60.0, self.ttl / 4))
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=loop, name="storyfx-session-reaper", daemon=True)
+        self._reaper.start()
+
+
+SESSIONS = SessionPool()
+
+
+def acquire_driver(device_id: str, platform_version: Optional[str] = None,
+                   profile: Optional[dict] = None, resume: bool = False):
+    return SESSIONS.acquire(device_id, platform_version, profile, resume=resume)
+
+
+def release_driver(driver, healthy: bool = True) -> None:
+    SESSIONS.release(driver, healthy=healthy)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Partage sans Galerie ni feuille de partage : intents lancés par `am start`
+-------------------------------------------------------------------------
+L'URI content://media/... (lue par ui.ui_mediastore) est envoyée
+directement à l'activité de partage de la plateforme :
+
+    am start -a android.intent.action.SEND -t video/*
+             -n com.whatsapp.w4b/com.whatsapp.contact.picker.ContactPicker
+             --grant-read-uri-permission
+             --eu android.intent.extra.STREAM content://media/external/video/media/42
+
+Cibles (SHARE_TARGETS) : package + composant par plateforme, surchargeables
+dans config/share_targets.json. La présence du composant est vérifiée une
+fois par téléphone (`cmd package query-activities`, cache VERIFY_TTL) :
+
+    composant présent → -n : écran connu (activité de partage de l'app),
+                        mode "component" → les flows continuent dans l'app
+    composant absent  → -p package seulement si allow_package : Android
+                        propose les cibles de l'app, écran inconnu des
+                        flows (mode "package") ; sinon rien n'est lancé
+    package absent    → None : l'engine repasse par Galerie + feuille de partage
+
+Un seul média par intent : `am` ne sait pas construire l'ArrayList<Uri>
+que SEND_MULTIPLE attend dans EXTRA_STREAM (--esal = ArrayList<String> →
+aucun média ou ClassCastException côté app). Plusieurs médias → Galerie.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from ui.ui_paths_helpers import SHARE_TARGETS, adb_shell, load_json
+from ui.ui_mediastore import sh_quote
+
+from .core import log
+
+ACTION_SEND = "android.intent.action.SEND"
+
+VERIFY_TTL = 600.0
+
+# Plateforme → package + activité de partage (1 média)
+DEFAULT_SHARE_TARGETS: Dict[str, Dict[str, str]] = {
+    "WhatsApp": {
+        "package": "com.whatsapp.w4b",
+        "send": "com.whatsapp.w4b/com.whatsapp.contact.picker.ContactPicker",
+    },
+    "Facebook": {
+        "package": "com.facebook.katana",
+        "send": "com.facebook.katana/com.facebook.composer.shareintent.ImplicitShareIntentHandlerDefaultAlias",
+    },
+    "Instagram": {
+        "package": "com.instagram.android",
+        "send": "com.instagram.android/com.instagram.share.handleractivity.StoryShareHandlerActivity",
+    },
+    "TikTok": {
+        "package": "com.zhiliaoapp.musically",
+        "send": "com.zhiliaoapp.musically/com.ss.android.ugc.aweme.share.SystemShareActivity",
+    },
+}
+
+
+def share_target(platform: str) -> Optional[Dict[str, str]]:
+    """Descripteur de la plateforme (config/share_targets.json prioritaire)."""
+    target = dict(DEFAULT_SHARE_TARGETS.get(platform) or {})
+    override = (load_json(SHARE_TARGETS, {}) or {}).get(platform)
+    if isinstance(override, dict):
+        target.update({k: v for k, v in override.items() if isinstance(v, str)})
+    return target or None
+
+
+def mime_for(items: Sequence[dict]) -> str:
+    """image/* ou video/* si homogène, sinon */*."""
+    kinds = {(it.get("mime_type") or "").split("/", 1)[0] for it in items}
+    if len(kinds) == 1 and kinds <= {"image", "video"}:
+        return f"{kinds.pop()}/*"
+    return "*/*"
+
+
+# ==========================================================================
+# 🔎 Composants présents sur le téléphone (cache par device)
+# ==========================================================================
+_COMPONENTS: Dict[Tuple[str, str, str], Tuple[float, Set[str]]] = {}
+_COMPONENTS_LOCK = threading.Lock()
+
+
+def device_share_components(device_id: str, action: str, mime: str) -> Optional[Set[str]]:
+    """Activités 'pkg/cls' qui acceptent (action, mime) ; None si illisible."""
+    key = (device_id, action, mime)
+    now = time.monotonic()
+    with _COMPONENTS_LOCK:
+        hit = _COMPONENTS.get(key)
+    if hit is not None and now - hit[0] < VERIFY_TTL:
+        return hit[1]
+
+    code, out = adb_shell(device_id, f"cmd package query-activities --components -a {action} -t {sh_quote(mime)}")
+    if code != 0 or not out or "Exception" in out or "Unknown command" in out:
+        return None
+    comps = set()
+    for line in out.splitlines():
+        line = line.strip()
+        if "/" in line and " " not in line:
+            pkg, cls = line.split("/", 1)
+            comps.add(f"{pkg}/{pkg}{cls}" if cls.startswith(".") else line)
+
+    with _COMPONENTS_LOCK:
+        _COMPONENTS[key] = (now, comps)
+    return comps
+
+
+def resolve_target(device_id: str, platform: str, action: str, mime: str) -> Optional[Tuple[str, str]]:
+    """('-n', composant) | ('-p', package) | None (→ Galerie + feuille de partage)."""
+    target = share_target(platform)
+    if not target or not target.get("package"):
+        return None
+    package = target["package"]
+    component = target.get("send")
+
+    comps = device_share_components(device_id, action, mime)
+    if comps is None:
+        # Vérification impossible (vieil Android) : on tente le package
+        return "-p", package
+    if component and component in comps:
+        return "-n", component
+    if any(c.startswith(package + "/") for c in comps):
+        log(f"[intent] Composant {component} absent sur {device_id} → cibles du package {package}.")
+        return "-p", package
+    log(f"[intent] {package} n'accepte pas {action} ({mime}) sur {device_id}.")
+    return None
+
+
+# ==========================================================================
+# 🚀 Lancement
+# ==========================================================================
+LAUNCH_MODES = {"-n": "component", "-p": "package"}
+
+
+def send_media(device_id: str, platform: str, uris: List[str], mime: str,
+               allow_package: bool = False) -> Optional[Tuple[str, str]]:
+    """
+    Envoie UN média à la plateforme. Retourne (package, mode) si `am`
+    accepte l'intent — mode "component" (-n, activité de partage connue) ou
+    "package" (-p, uniquement si allow_package) — sinon None (→ l'engine
+    repasse par la Galerie, rien n'a été lancé).
+    Plusieurs URIs → None : pas d'ArrayList<Uri> possible via `am`.
+    """
+    if len(uris) != 1:
+        if uris:
+            log(f"[intent] {len(uris)} médias : SEND_MULTIPLE impossible via am → Galerie.")
+        return None
+    action = ACTION_SEND
+    resolved = resolve_target(device_id, platform, action, mime)
+    if resolved is None:
+        return None
+    flag, value = resolved
+    if flag == "-p" and not allow_package:
+        log(f"[intent] Pas d'activité de partage connue pour {platform} sur {device_id} → Galerie.")
+        return None
+
+    cmd = (f"am start -a {action} -t {sh_quote(mime)} --grant-read-uri-permission {flag} {value}"
+           f" --eu android.intent.extra.STREAM {sh_quote(uris[0])}")
+
+    code, out = adb_shell(device_id, cmd)
+    if code != 0 or "Error" in (out or ""):
+        log(f"[intent] {action.rsplit('.', 1)[-1]} refusé : {(out or '').strip()[:200]}")
+        return None
+    log(f"[intent] {action.rsplit('.', 1)[-1]} → {value} ({len(uris)} média(s)).")
+    return value.split("/", 1)[0], LAUNCH_MODES[flag]
+
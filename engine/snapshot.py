@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Résolution multi-sélecteurs sur UN seul snapshot de l'écran
+-----------------------------------------------------------
+Une liste de fallbacks XPath (bouton Share de la Galerie, icônes de la
+feuille de partage, boutons Instagram / TikTok...) coûtait un aller-retour
+find_elements PAR sélecteur raté. Ici :
+
+    ✔ 1 seul driver.page_source (XML UiAutomator2) par écran
+    ✔ tous les XPath évalués en local avec lxml (même XML que côté Appium)
+    ✔ clic au centre des bounds du nœud trouvé (1 requête W3C)
+    ✔ snapshot gardé en cache jusqu'à la prochaine action UI
+      (clic via ce module / engine.waits → invalidate()) ou SNAPSHOT_MAX_AGE
+
+Sans lxml (ou STORYFX_SNAPSHOT=0) → NotImplemented : l'appelant repasse
+par find_elements (XPath compilé, engine.selector_compiler). Les
+sélecteurs UiSelector ne sont pas gérés ici.
+"""
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    from lxml import etree
+except Exception:   # lxml absent → résolution classique (find_elements)
+    etree = None
+
+from appium.webdriver.common.appiumby import AppiumBy
+
+from .selector_compiler import compile_xpath
+
+# Filet de sécurité : un swipe / keycode fait hors de nos helpers
+# ne passe pas par invalidate(), le snapshot expire donc vite.
+SNAPSHOT_MAX_AGE = 0.5
+
+_BOUNDS_RE = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+
+
+def snapshot_enabled() -> bool:
+    return etree is not None and os.environ.get("STORYFX_SNAPSHOT", "1").strip() not in ("0", "false", "no")
+
+
+def parse_bounds(bounds: Optional[str]) -> Optional[Tuple[int, int, int, int]]:
+    """'[x1,y1][x2,y2]' → (x1, y1, x2, y2)."""
+    m = _BOUNDS_RE.match(bounds or "")
+    if not m:
+        return None
+    return tuple(int(v) for v in m.groups())
+
+
+class SnapshotElement:
+    """
+    Nœud du snapshot qui se comporte comme un WebElement pour nos flows :
+    click() (tap au centre des bounds), text, get_attribute(), rect.
+    resolve() → vrai WebElement si une API Selenium l'exige (ActionChains).
+    """
+
+    def __init__(self, driver, node, selector: str):
+        self._driver = driver
+        self._node = node
+        self.selector = selector
+
+    @property
+    def text(self) -> str:
+        return self._node.get("text") or ""
+
+    def get_attribute(self, name: str):
+        return self._node.get(name)
+
+    @property
+    def rect(self) -> Dict[str, int]:
+        b = parse_bounds(self._node.get("bounds"))
+        if b is None:
+            return {}
+        x1, y1, x2, y2 = b
+        return {"x": x1, "y": y1, "width": x2 - x1, "height": y2 - y1}
+
+    def resolve(self):
+        """WebElement réel : par resource-id si unique, sinon par le XPath d'origine."""
+        rid = self._node.get("resource-id")
+        if rid:
+            els = self._driver.find_elements(AppiumBy.ID, rid)
+            if len(els) == 1:
+                return els[0]
+        return self._driver.find_element(*compile_xpath(self.selector))
+
+    def click(self) -> None:
+        b = parse_bounds(self._node.get("bounds"))
+        try:
+            if b is not None and b[2] > b[0] and b[3] > b[1]:
+                x1, y1, x2, y2 = b
+                self._driver.tap([((x1 + x2) // 2, (y1 + y2) // 2)])
+            else:
+                self.resolve().click()
+        finally:
+            invalidate(self._driver)
+
+
+class UiSnapshot:
+    """XML d'un écran parsé une fois, interrogeable par XPath en local."""
+
+    def __init__(self, xml: str):
+        self.taken_at = time.monotonic()
+        data = xml.encode("utf-8") if isinstance(xml, str) else xml
+        self.root = etree.fromstring(data, parser=etree.XMLParser(recover=True, huge_tree=True))
+
+    def age(self) -> float:
+        return time.monotonic() - self.taken_at
+
+    def find(self, selector: str):
+        """Premier nœud correspondant au XPath (None si aucun / XPath invalide)."""
+        try:
+            nodes = self.root.xpath(selector)
+        except Exception:
+            return None
+        for node in nodes:
+            if isinstance(node, etree._Element):
+                return node
+        return None
+
+
+# ==========================================================================
+# 🗂 Cache par driver
+# ==========================================================================
+_CACHE: Dict[int, UiSnapshot] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def invalidate(driver) -> None:
+    """À appeler après toute action UI (clic, swipe, touche...)."""
+    with _CACHE_LOCK:
+        _CACHE.pop(id(driver), None)
+
+
+def get_snapshot(driver, fresh: bool = False) -> Optional[UiSnapshot]:
+    """Snapshot courant (mis en cache) ou None si indisponible."""
+    if not snapshot_enabled():
+        return None
+    key = id(driver)
+    if not fresh:
+        with _CACHE_LOCK:
+            snap = _CACHE.get(key)
+        if snap is not None and snap.age() < SNAPSHOT_MAX_AGE:
+            return snap
+    try:
+        snap = UiSnapshot(driver.page_source)
+    except Exception:
+        return None
+    with _CACHE_LOCK:
+        _CACHE[key] = snap
+    return snap
+
+
+def resolve_first(driver, selectors: Iterable[str], fresh: bool = False):
+    """
+    (sélecteur, SnapshotElement) du premier XPath présent, dans l'ordre de
+    la liste ; None si aucun ; NotImplemented si le snapshot est indisponible
+    (→ l'appelant repasse par find_elements).
+    """
+    snap = get_snapshot(driver, fresh=fresh)
+    if snap is None:
+        return NotImplemented
+    for sel in selectors:
+        node = snap.find(sel)
+        if node is not None:
+            return sel, SnapshotElement(driver, node, sel)
+    return None
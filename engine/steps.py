@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Étapes d'engine avec points de reprise
+--------------------------------------
+Un flow = liste ordonnée d'étapes (dicts) :
+
+    {"name": "album",
+     "run":   lambda ctx: 0 | rc,          # 0 = OK, sinon code retour de l'engine
+     "check": lambda ctx: bool}            # postcondition lue sur l'écran réel
+
+Chaque étape réussie est notée dans un checkpoint par téléphone :
+config/step_checkpoints/<device_id>.json. Sur disque et non en mémoire :
+une relance dans le même run (run_with_retries), un job remis en file
+(--requeue, nouveau runner) ou repris par un autre worker du pool
+retrouvent le même checkpoint.
+
+À la relance, l'engine voit le checkpoint (resumable) et laisse l'écran
+tel quel : session reprise sans BACK / HOME (acquire_driver(resume=True)),
+pas de pre_platform_setup. run_steps() ramène l'app devant (`resume`),
+puis remonte les étapes déjà faites de la dernière à la première : la
+première dont la postcondition tient encore sur l'écran est le point de
+reprise, le flow repart juste après. Exemple multi : Share introuvable
+(rc 7) → sélection toujours affichée → on ne refait que le tap Share, pas
+reset + album + long press + sélection.
+
+Aucune postcondition vérifiée → reprise depuis le début (comportement
+historique). Un checkpoint expire après CHECKPOINT_TTL s et est remplacé
+dès qu'un autre flow démarre sur le téléphone. Un seul job à la fois par
+téléphone : 1 fichier par téléphone, sans verrou entre processus.
+"""
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ui.ui_paths_helpers import STEP_CHECKPOINTS, load_json, save_json_atomic
+
+from .core import log
+from .results import fail, timed
+
+CHECKPOINT_TTL = 300.0   # s, horloge murale (checkpoint relu par d'autres processus)
+JOB_PROGRESS_TTL = 3600.0   # s : couvre les remises en file (REQUEUE_DELAYS) d'un créneau
+
+
+def _path(device_id: str, suffix: str = "") -> Path:
+    safe = re.sub(r"[^\w.-]+", "_", device_id)   # "192.168.10.56:5555" → nom de fichier
+    return Path(STEP_CHECKPOINTS) / f"{safe}{suffix}.json"
+
+
+def _checkpoint(device_id: str, key: str) -> Optional[Dict[str, Any]]:
+    cp = load_json(_path(device_id), {})
+    if not cp or cp.get("key") != key or time.time() - float(cp.get("at") or 0) > CHECKPOINT_TTL:
+        return None
+    return cp
+
+
+def _save(device_id: str, key: str, done: List[str]) -> None:
+    try:
+        save_json_atomic(_path(device_id), {"key": key, "done": list(done), "at": time.time()})
+    except OSError as e:
+        log(f"[steps] ⚠ Checkpoint non écrit ({device_id}) : {e!r}")
+
+
+def clear(device_id: str) -> None:
+    """Flow terminé (ou abandonné) : plus rien à reprendre sur ce téléphone."""
+    if not device_id:
+        return
+    try:
+        _path(device_id).unlink()
+    except OSError:
+        pass
+
+
+def resumable(device_id: str, key: str) -> bool:
+    """
+    Flow `key` interrompu sur ce téléphone (checkpoint vivant, au moins une
+    étape faite) : l'appelant ne doit PAS remettre l'écran à zéro avant run_steps.
+    """
+    if not device_id:
+        return False
+    cp = _checkpoint(device_id, key)
+    return bool(cp and cp.get("done"))
+
+
+# ==========================================================================
+# 🧾 Phases publiées d'un job composite (intro_multi)
+# ==========================================================================
+# <device_id>.job.json : {"key": clé du job, "progress": {"intro": 0}, "at": ...}
+# Un job remis en file (--requeue) repart dans un nouveau processus : sans
+# ce fichier, l'intro déjà publiée serait postée une 2ᵉ fois.
+def load_progress(device_id: str, job_key: str) -> Dict[str, Any]:
+    """Phases déjà publiées du job `job_key` sur ce téléphone ({} si aucune)."""
+    if not device_id:
+        return {}
+    data = load_json(_path(device_id, ".job"), {})
+    if not data or data.get("key") != job_key or time.time() - float(data.get("at") or 0) > JOB_PROGRESS_TTL:
+        return {}
+    return dict(data.get("progress") or {})
+
+
+def save_progress(device_id: str, job_key: str, progress: Dict[str, Any]) -> None:
+    """À appeler dès qu'une phase est publiée (avant toute suite du job)."""
+    if not device_id:
+        return
+    try:
+        save_json_atomic(_path(device_id, ".job"), {"key": job_key, "progress": dict(progress), "at": time.time()})
+    except OSError as e:
+        log(f"[steps] ⚠ Progression du job non écrite ({device_id}) : {e!r}")
+
+
+def clear_progress(device_id: str) -> None:
+    """Job terminé (publié ou en échec définitif)."""
+    if not device_id:
+        return
+    try:
+        _path(device_id, ".job").unlink()
+    except OSError:
+        pass
+
+
+def _holds(step: Dict[str, Any], ctx: Dict[str, Any]) -> bool:
+    check = step.get("check")
+    if check is None:
+        return False
+    try:
+        return bool(check(ctx))
+    except Exception:
+        return False
+
+
+def resume_index(device_id: str, key: str, steps: List[Dict[str, Any]], ctx: Dict[str, Any],
+                 resume: Optional[Callable[[], Any]] = None) -> int:
+    """Index de la première étape à (re)jouer d'après le checkpoint et l'écran réel."""
+    cp = _checkpoint(device_id, key)
+    if cp is None or not cp["done"]:
+        return 0
+    if resume is not None:
+        try:
+            resume()
+        except Exception:
+            pass
+    done = set(cp["done"])
+    for i in range(len(steps) - 1, -1, -1):
+        if steps[i]["name"] in done and _holds(steps[i], ctx):
+            log(f"[steps] {key} : '{steps[i]['name']}' toujours vrai à l'écran → reprise à "
+                f"'{steps[i + 1]['name'] if i + 1 < len(steps) else 'fin'}'.")
+            return i + 1
+    log(f"[steps] {key} : aucun point de reprise valide → flow depuis le début.")
+    return 0
+
+
+def run_steps(device_id: str, key: str, steps: List[Dict[str, Any]],
+              ctx: Optional[Dict[str, Any]] = None,
+              resume: Optional[Callable[[], Any]] = None) -> int:
+    """
+    Joue les étapes à partir du point de reprise. 0 si toutes passent,
+    sinon le rc de l'étape en échec (le checkpoint reste pour la relance).
+    Les exceptions remontent telles quelles, checkpoint conservé.
+    Le checkpoint n'est PAS effacé en fin de flow : l'appelant appelle
+    clear() quand le job complet a réussi (publication comprise).
+    """
+    ctx = ctx if ctx is not None else {}
+    start = resume_index(device_id, key, steps, ctx, resume) if device_id else 0
+    done = [s["name"] for s in steps[:start]]
+    if device_id:
+        _save(device_id, key, done)
+
+    for step in steps[start:]:
+        with timed(step["name"]):
+            rc = step["run"](ctx)
+        if rc:
+            fail(step["name"])
+            return rc
+        done.append(step["name"])
+        if device_id:
+            _save(device_id, key, done)
+    return 0
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Spans de trace du chemin chaud des engines (export Chrome trace / Perfetto)
+--------------------------------------------------------------------------
+Question à laquelle répondre : un post lent, c'est la création de session
+Appium, un scan XPath dans _maybe_click ou un time.sleep ?
+
+STORYFX_TRACE=1 active (lu une fois, à l'import) :
+
+    ✔ chaque helper de engine.core / engine.platforms   (trace_module)
+    ✔ chaque commande WebDriver : findElement, click...  (instrument_driver)
+    ✔ chaque time.sleep                                 (sleep tracé)
+    ✔ les étapes de engine.results.timed                (cat "step")
+    ✔ du code à la main :
+
+        with span("scan_thumbs", album=album):
+            ...
+
+        @traced()
+        def helper(driver): ...
+
+Un fichier par run : traces/<date>_<engine>_<profil>.json (format
+trace-event, {"traceEvents": [...]}) — à ouvrir dans ui.perfetto.dev ou
+chrome://tracing. runner.py l'ouvre / l'écrit autour du job et note le
+chemin dans le résultat (clé "trace").
+
+Désactivé (défaut) : décorateurs et trace_module rendent les fonctions
+telles quelles, driver et time.sleep ne sont pas touchés, span() rend un
+contexte vide partagé → coût quasi nul, peut rester en production.
+"""
+import functools
+import inspect
+import json
+import os
+import re
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ui.ui_paths_helpers import TRACES_DIR
+
+ENABLED = os.environ.get("STORYFX_TRACE", "").strip().lower() in ("1", "true", "yes", "on")
+
+# Garde-fou mémoire : au-delà, les spans du run sont ignorés (compteur "dropped")
+MAX_EVENTS = 200_000
+
+_NOOP = nullcontext()
+_LOCK = threading.Lock()
+_EVENTS: List[Dict[str, Any]] = []
+_RUN: Dict[str, Any] = {"label": None, "dropped": 0, "threads": {}}
+_PID = os.getpid()
+
+
+def tracing_enabled() -> bool:
+    return ENABLED
+
+
+def _now_us() -> float:
+    return time.perf_counter_ns() / 1000.0
+
+
+def _emit(name: str, cat: str, ts: float, dur: float, args: Optional[dict]) -> None:
+    if _RUN["label"] is None:
+        return   # hors run (import, worker inactif) : rien n'est gardé
+    tid = threading.get_ident()
+    event = {"name": name, "cat": cat, "ph": "X", "ts": ts, "dur": dur, "pid": _PID, "tid": tid}
+    if args:
+        event["args"] = args
+    with _LOCK:
+        if len(_EVENTS) >= MAX_EVENTS:
+            _RUN["dropped"] += 1
+            return
+        _EVENTS.append(event)
+        if tid not in _RUN["threads"]:
+            _RUN["threads"][tid] = threading.current_thread().name
+
+
+class _Span:
+    """Span "X" (début + durée) ; l'exception éventuelle est notée dans args."""
+    __slots__ = ("name", "cat", "args", "t0")
+
+    def __init__(self, name: str, cat: str, args: Optional[dict]):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.t0 = 0.0
+
+    def __enter__(self):
+        self.t0 = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        dur = _now_us() - self.t0
+        args = self.args
+        if exc_type is not None:
+            args = dict(args or {}, error=exc_type.__name__)
+        _emit(self.name, self.cat, self.t0, dur, args)
+        return False
+
+
+def span(name: str, cat: str = "engine", **args):
+    """Contexte mesuré `name` (no-op partagé quand le tracing est coupé)."""
+    if not ENABLED:
+        return _NOOP
+    return _Span(name, cat, {k: _arg(v) for k, v in args.items()} or None)
+
+
+def _arg(value):
+    return value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+
+
+def _wrap(fn: Callable, name: str, cat: str) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(*a, **kw):
+        with _Span(name, cat, None):
+            return fn(*a, **kw)
+    wrapper.__storyfx_traced__ = True
+    return wrapper
+
+
+def traced(name: Optional[str] = None, cat: str = "engine"):
+    """Décorateur : span autour de chaque appel (fonction inchangée si coupé)."""
+    def deco(fn: Callable) -> Callable:
+        if not ENABLED:
+            return fn
+        return _wrap(fn, name or fn.__qualname__, cat)
+    return deco
+
+
+def trace_module(module, cat: Optional[str] = None, skip=("log",)) -> int:
+    """
+    Enveloppe toutes les fonctions DÉFINIES dans `module` (pas les imports),
+    à appeler en fin de module. Les appels internes passent par les globals
+    du module → eux aussi tracés. Retourne le nombre de fonctions tracées.
+    """
+    if not ENABLED:
+        return 0
+    short = module.__name__.rsplit(".", 1)[-1]
+    cat = cat or short
+    count = 0
+    for attr, fn in list(vars(module).items()):
+        if (attr in skip or not inspect.isfunction(fn) or fn.__module__ != module.__name__
+                or getattr(fn, "__storyfx_traced__", False)):
+            continue
+        setattr(module, attr, _wrap(fn, f"{short}.{attr}", cat))
+        count += 1
+    return count
+
+
+def instrument_driver(driver):
+    """Span par commande WebDriver (driver.execute, utilisé aussi par les WebElement)."""
+    if not ENABLED or driver is None or getattr(driver, "_storyfx_traced", False):
+        return driver
+    execute = driver.execute
+
+    def traced_execute(driver_command, params=None):
+        with _Span(f"wd.{driver_command}", "webdriver", None):
+            return execute(driver_command, params)
+
+    try:
+        driver.execute = traced_execute
+        driver._storyfx_traced = True
+    except Exception:
+        pass
+    return driver
+
+
+def _install_sleep() -> None:
+    """time.sleep tracé (engines, waits, runner) ; installé une seule fois."""
+    if getattr(time.sleep, "__storyfx_traced__", False):
+        return
+    sleep = time.sleep
+
+    def traced_sleep(seconds):
+        with _Span("sleep", "sleep", {"s": seconds}):
+            sleep(seconds)
+
+    traced_sleep.__storyfx_traced__ = True
+    time.sleep = traced_sleep
+
+
+if ENABLED:
+    _install_sleep()
+
+
+# ==========================================================================
+# 📝 Run → fichier trace
+# ==========================================================================
+def start_run(label: str) -> None:
+    """Début d'un run : vide le tampon, les spans sont gardés jusqu'à end_run()."""
+    if not ENABLED:
+        return
+    with _LOCK:
+        _EVENTS.clear()
+        _RUN.update(label=label, dropped=0, threads={},
+                    started=datetime.now().strftime("%Y%m%d_%H%M%S"))
+
+
+def end_run(meta: Optional[dict] = None) -> Optional[str]:
+    """Écrit la trace du run (Chrome trace-event JSON). Chemin du fichier, None si coupé."""
+    if not ENABLED or _RUN["label"] is None:
+        return None
+    with _LOCK:
+        events, _EVENTS[:] = list(_EVENTS), []
+        label, started, threads, dropped = _RUN["label"], _RUN["started"], dict(_RUN["threads"]), _RUN["dropped"]
+        _RUN["label"] = None
+
+    names = [{"name": "process_name", "ph": "M", "pid": _PID, "tid": 0, "args": {"name": f"StoryFX {label}"}}]
+    names += [{"name": "thread_name", "ph": "M", "pid": _PID, "tid": tid, "args": {"name": tname}}
+              for tid, tname in threads.items()]
+    other = {"label": label, "dropped": dropped}
+    other.update({k: _arg(v) for k, v in (meta or {}).items()})
+
+    safe = re.sub(r"[^\w.-]+", "_", label).strip("_") or "run"
+    path = Path(TRACES_DIR) / f"{started}_{safe}_{_PID}.json"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": names + events, "displayTimeUnit": "ms", "otherData": other},
+                      f, ensure_ascii=False)
+    except OSError as e:
+        print(f"[trace] Impossible d'écrire {path} : {e!r}")
+        return None
+    return str(path)
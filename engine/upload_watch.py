@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Fin d'upload : on attend que la publication soit partie, ni plus ni moins
+-------------------------------------------------------------------------
+Avant : 2 s fixes puis retour Galerie — une grosse vidéo pouvait encore
+être en cours d'envoi quand le job suivant (reset_gallery_home) tuait
+Instagram / TikTok / Facebook.
+
+Signaux "upload en cours" pour un package (le premier trouvé suffit) :
+
+    ✔ notification : `dumpsys notification --noredact` → notification du
+      package avec une progression (android.progress < progressMax,
+      progressIndeterminate) ou un titre "Posting / Uploading / Envoi..."
+    ✔ trafic : octets émis par l'UID de l'app (xt_qtaguid, quand le noyau
+      l'expose encore) > TRAFFIC_MIN_BPS entre deux sondes
+    ✔ UI : ProgressBar dans l'app au premier plan (1 snapshot)
+
+wait_upload_done() : laisse `grace` s à l'upload pour apparaître, puis
+rend la main dès que plus aucun signal n'est présent (STORYFX_UPLOAD_TIMEOUT
+au plus, 180 s par défaut).
+"""
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from ui.ui_paths_helpers import adb_shell
+
+from .snapshot import get_snapshot
+
+DEFAULT_UPLOAD_TIMEOUT = 180.0
+POLL_INTERVAL = 1.0
+TRAFFIC_MIN_BPS = 20_000
+
+# Délai laissé à l'upload pour apparaître après le dernier clic
+GRACE = {"WhatsApp": 2.0, "Facebook": 4.0, "Instagram": 4.0, "TikTok": 4.0}
+
+# Titres "en cours" (pas "Shared / Partagé" : la notification de fin reste affichée)
+UPLOAD_WORDS = ("posting", "uploading", "sharing", "en cours", "envoi", "importation")
+
+_RECORD_RE = re.compile(r"NotificationRecord\(0x[0-9a-f]+: pkg=([\w.]+)")
+_EXTRA_RE = re.compile(r"android\.(progress|progressMax|progressIndeterminate|title)=(?:\w+ \()?([^)\n]*)")
+_UID_RE = re.compile(r"uid:(\d+)")
+
+
+def upload_timeout() -> float:
+    try:
+        return max(10.0, float(os.environ.get("STORYFX_UPLOAD_TIMEOUT", DEFAULT_UPLOAD_TIMEOUT)))
+    except ValueError:
+        return DEFAULT_UPLOAD_TIMEOUT
+
+
+# ==========================================================================
+# 🔔 Notifications
+# ==========================================================================
+def _notification_blocks(dump: str, package: str):
+    """Blocs texte des NotificationRecord du package."""
+    starts = [(m.start(), m.group(1)) for m in _RECORD_RE.finditer(dump or "")]
+    for i, (pos, pkg) in enumerate(starts):
+        if pkg == package:
+            end = starts[i + 1][0] if i + 1 < len(starts) else len(dump)
+            yield dump[pos:end]
+
+
+def notification_dump(device_id: str) -> str:
+    code, out = adb_shell(device_id, "dumpsys notification --noredact")
+    return out if code == 0 and out else ""
+
+
+def notification_uploading(device_id: str, package: str, dump: Optional[str] = None) -> bool:
+    """Notification de progression / de publication du package ? (`dump` : sortie déjà lue)."""
+    if dump is None:
+        dump = notification_dump(device_id)
+    for block in _notification_blocks(dump, package):
+        extras = {k: v.strip() for k, v in _EXTRA_RE.findall(block)}
+        try:
+            progress = int(extras.get("progress") or 0)
+            progress_max = int(extras.get("progressMax") or 0)
+        except ValueError:
+            progress, progress_max = 0, 0
+        if progress_max > 0 and progress < progress_max:
+            return True
+        if extras.get("progressIndeterminate") == "true":
+            return True
+        title = extras.get("title", "").lower()
+        if any(w in title for w in UPLOAD_WORDS):
+            return True
+    return False
+
+
+# ==========================================================================
+# 📶 Trafic par UID
+# ==========================================================================
+_UIDS: Dict[Tuple[str, str], Optional[str]] = {}
+_UIDS_LOCK = threading.Lock()
+
+
+def package_uid(device_id: str, package: str) -> Optional[str]:
+    key = (device_id, package)
+    with _UIDS_LOCK:
+        if key in _UIDS:
+            return _UIDS[key]
+    code, out = adb_shell(device_id, f"cmd package list packages -U {package}")
+    uid = None
+    for line in (out or "").splitlines():
+        if line.strip().startswith(f"package:{package} "):
+            m = _UID_RE.search(line)
+            uid = m.group(1) if m else None
+    with _UIDS_LOCK:
+        _UIDS[key] = uid
+    return uid
+
+
+def tx_bytes(device_id: str, uid: str) -> Optional[int]:
+    """Octets émis par l'UID (None si xt_qtaguid absent : Android 10+)."""
+    code, out = adb_shell(device_id, "cat /proc/net/xt_qtaguid/stats")
+    if code != 0 or not out or "No such file" in out:
+        return None
+    total = 0
+    for line in out.splitlines()[1:]:
+        cols = line.split()
+        # idx iface acct_tag_hex uid_tag_int cnt_set rx_bytes rx_packets tx_bytes ...
+        if len(cols) > 7 and cols[3] == uid and cols[2] == "0x0":
+            try:
+                total += int(cols[7])
+            except ValueError:
+                pass
+    return total
+
+
+class _TrafficProbe:
+    def __init__(self, device_id: str, package: str):
+        self.device_id = device_id
+        self.uid = package_uid(device_id, package)
+        self.last: Optional[Tuple[float, int]] = None
+        self.available = self.uid is not None
+
+    def uploading(self) -> bool:
+        if not self.available:
+            return False
+        sent = tx_bytes(self.device_id, self.uid)
+        if sent is None:
+            self.available = False
+            return False
+        now = time.monotonic()
+        prev, self.last = self.last, (now, sent)
+        if prev is None or now <= prev[0]:
+            return False
+        return (sent - prev[1]) / (now - prev[0]) >= TRAFFIC_MIN_BPS
+
+
+# ==========================================================================
+# 📱 UI
+# ==========================================================================
+def ui_uploading(driver, package: str) -> bool:
+    """ProgressBar visible dans l'app `package` au premier plan."""
+    if driver is None:
+        return False
+    snap = get_snapshot(driver, fresh=True)
+    if snap is None:
+        return False
+    return bool(snap.root.xpath(f"//android.widget.ProgressBar[@package='{package}']"))
+
+
+# ==========================================================================
+# ⏳ API
+# ==========================================================================
+def upload_in_progress(device_id: str, package: str, driver=None,
+                       traffic: Optional[_TrafficProbe] = None) -> Optional[str]:
+    """'notification' | 'traffic' | 'ui' si un upload du package est en cours, sinon None."""
+    if notification_uploading(device_id, package):
+        return "notification"
+    if traffic is not None and traffic.uploading():
+        return "traffic"
+    if ui_uploading(driver, package):
+        return "ui"
+    return None
+
+
+def wait_upload_done(driver, device_id: str, package: str, grace: float = 3.0,
+                     timeout: Optional[float] = None, label: str = "upload") -> bool:
+    """
+    Attend la fin de l'upload du package. True dès qu'aucun signal n'est
+    présent (après `grace` s sans signal, ou quand le dernier disparaît),
+    False si l'upload tourne encore après `timeout`.
+    """
+    from .core import log   # import tardif : core importe ce module
+    from .waits import WAIT_STATS
+
+    timeout = upload_timeout() if timeout is None else timeout
+    traffic = _TrafficProbe(device_id, package)
+    t0 = time.monotonic()
+    seen = None
+
+    while True:
+        elapsed = time.monotonic() - t0
+        reason = upload_in_progress(device_id, package, driver, traffic)
+        if reason and not seen:
+            log(f"[upload] {package} : upload en cours ({reason}), on attend la fin...")
+        seen = seen or reason
+        if not reason and (seen or elapsed >= grace):
+            break
+        if elapsed >= timeout:
+            log(f"[upload] ⚠️ {package} : upload toujours en cours après {timeout:.0f} s.")
+            WAIT_STATS.record(label, elapsed, False)
+            return False
+        time.sleep(POLL_INTERVAL)
+
+    elapsed = time.monotonic() - t0
+    WAIT_STATS.record(label, elapsed, True)
+    if seen:
+        log(f"[upload] {package} : upload terminé en {elapsed:.1f} s.")
+    return True
+
+
+def wait_platform_upload(driver, device_id: str, platform: str) -> bool:
+    """wait_upload_done() pour le package de la plateforme (share_intents.share_target)."""
+    from .share_intents import share_target   # import tardif : share_intents importe core
+
+    package = (share_target(platform) or {}).get("package")
+    if not device_id or not package:
+        return True
+    return wait_upload_done(driver, device_id, package, grace=GRACE.get(platform, 3.0),
+                            label=f"upload.{platform.lower()}")
+
+
+def guard_uploads(device_id: str, packages) -> set:
+    """
+    Avant un terminate_app : attend la fin des uploads signalés par
+    notification (1 seul dumpsys pour tous les packages). Retourne les
+    packages encore en upload après le timeout → à NE PAS tuer.
+    """
+    if not device_id:
+        return set()
+    dump = notification_dump(device_id)
+    busy = [p for p in packages if notification_uploading(device_id, p, dump)]
+    return {p for p in busy if not wait_upload_done(None, device_id, p, grace=0.0, label="upload.reset")}
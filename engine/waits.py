@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Attentes adaptatives (remplacent les time.sleep fixes des engines)
+------------------------------------------------------------------
+Au lieu de dormir "le pire cas" après chaque action (1.5 s après
+activate_app, 0.8 s après un clic, ×4 pour Instagram, ×2 pour TikTok...),
+on interroge l'écran toutes les POLL_INTERVAL secondes et on rend la main
+DÈS que la condition dont l'étape suivante a besoin est vraie :
+
+    ✔ wait_for_element()   → un des sélecteurs est présent
+    ✔ wait_for_package()   → l'app attendue est au premier plan
+    ✔ wait_for_change()    → package / activité différent de l'état de départ
+    ✔ wait_gone()          → l'élément a disparu (feuille de partage fermée...)
+
+Les listes de XPath sont évaluées sur un seul page_source par tour de
+polling (engine.snapshot) : N fallbacks = 1 aller-retour, pas N.
+
+Chaque attente garde un délai max par étape (le deadline), et sa durée
+réelle est enregistrée dans WAIT_STATS (log_wait_summary() en fin de run) :
+on voit ainsi ce qu'un téléphone rapide paie vraiment.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from appium.webdriver.common.appiumby import AppiumBy
+
+from . import snapshot
+from .results import note_selector
+from .selector_cache import SELECTORS
+from .selector_compiler import compile_xpath
+
+POLL_INTERVAL = 0.2
+DEFAULT_TIMEOUT = 5.0
+
+
+class SelectorMiss(RuntimeError):
+    """Élément attendu absent de l'écran (classé "selector_miss" par retry_policy)."""
+
+
+# ==========================================================================
+# 📊 Durées réelles des attentes
+# ==========================================================================
+class WaitStats:
+    """Durées réelles par étape : {label: {"n", "ok", "total_s", "max_s"}}."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, label: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            st = self._stats.setdefault(label, {"n": 0, "ok": 0, "total_s": 0.0, "max_s": 0.0})
+            st["n"] += 1
+            st["ok"] += 1 if ok else 0
+            st["total_s"] += seconds
+            st["max_s"] = max(st["max_s"], seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+WAIT_STATS = WaitStats()
+
+
+def log_wait_summary(reset: bool = True) -> None:
+    """Une ligne par étape : nb d'attentes, moyenne, max, timeouts."""
+    from .core import log   # import tardif : core importe ce module
+
+    snap = WAIT_STATS.snapshot()
+    if not snap:
+        return
+    total = sum(st["total_s"] for st in snap.values())
+    log(f"[wait] Temps d'attente total : {total:.1f}s ({len(snap)} étapes)")
+    for label, st in sorted(snap.items(), key=lambda kv: -kv[1]["total_s"]):
+        timeouts = st["n"] - st["ok"]
+        log(
+            f"[wait] {label} : n={st['n']} | moy={st['total_s'] / st['n']:.2f}s | "
+            f"max={st['max_s']:.2f}s" + (f" | timeouts={timeouts}" if timeouts else "")
+        )
+    if reset:
+        WAIT_STATS.reset()
+
+
+# ==========================================================================
+# ⏱ Primitive
+# ==========================================================================
+def wait_until(cond: Callable[[], Any], timeout: float = DEFAULT_TIMEOUT,
+               interval: float = POLL_INTERVAL, label: str = "wait") -> Any:
+    """
+    Appelle cond() jusqu'à ce qu'elle renvoie une valeur vraie (retournée
+    immédiatement) ou que timeout soit écoulé (→ None).
+    Une exception dans cond() compte comme "pas encore".
+    """
+    t0 = time.monotonic()
+    deadline = t0 + max(0.0, timeout)
+    result = None
+    while True:
+        try:
+            result = cond()
+        except Exception:
+            result = None
+        if result or time.monotonic() >= deadline:
+            break
+        time.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+
+    WAIT_STATS.record(label, time.monotonic() - t0, bool(result))
+    return result or None
+
+
+def _by(strategy: str):
+    return AppiumBy.ANDROID_UIAUTOMATOR if strategy == "uiautomator" else AppiumBy.XPATH
+
+
+def first_match(driver, selectors: Iterable[str], strategy: str = "xpath",
+                fresh: bool = False):
+    """
+    Un seul passage : (sélecteur, élément) du premier trouvé, sinon None.
+    XPath → 1 page_source évalué en local (engine.snapshot) au lieu d'un
+    find_elements par sélecteur ; sans lxml, chaque XPath est d'abord
+    compilé en ID / UiSelector (engine.selector_compiler).
+    """
+    if strategy == "xpath":
+        match = snapshot.resolve_first(driver, selectors, fresh=fresh)
+        if match is not NotImplemented:
+            return match
+
+    for sel in selectors:
+        by, value = compile_xpath(sel) if strategy == "xpath" else (_by(strategy), sel)
+        try:
+            els = driver.find_elements(by, value)
+        except Exception:
+            continue
+        if els:
+            return sel, els[0]
+    return None
+
+
+def find_first(driver, selectors: Iterable[str], strategy: str = "xpath",
+               fresh: bool = False):
+    """Un seul passage : premier élément trouvé parmi selectors, sinon None."""
+    match = first_match(driver, selectors, strategy, fresh=fresh)
+    return match[1] if match else None
+
+
+def _polling_match(driver, sels: List[str], strategy: str) -> Callable[[], Any]:
+    """cond() pour wait_until : snapshot du cache au 1er tour, puis frais."""
+    state = {"fresh": False}
+
+    def cond():
+        fresh, state["fresh"] = state["fresh"], True
+        return first_match(driver, sels, strategy, fresh=fresh)
+
+    return cond
+
+
+def _as_list(selectors) -> List[str]:
+    return [selectors] if isinstance(selectors, str) else list(selectors)
+
+
+# ==========================================================================
+# 🎯 Conditions usuelles
+# ==========================================================================
+def wait_for_match(driver, selectors, timeout: float = DEFAULT_TIMEOUT,
+                   label: str = "element", strategy: str = "xpath",
+                   interval: float = POLL_INTERVAL, remember: bool = False):
+    """
+    (sélecteur, élément) dès qu'un des selectors est présent, sinon None.
+    remember=True → le dernier gagnant de cette étape (label) est essayé en
+    premier et le nouveau gagnant est mémorisé (engine.selector_cache).
+    """
+    sels = _as_list(selectors)
+    if remember:
+        sels = SELECTORS.order(driver, label, sels)
+    t0 = time.monotonic()
+    match = wait_until(_polling_match(driver, sels, strategy),
+                       timeout=timeout, interval=interval, label=label)
+    if remember and match:
+        SELECTORS.record(driver, label, match[0], time.monotonic() - t0)
+    if match:
+        note_selector(label, match[0])
+    return match
+
+
+def wait_for_element(driver, selectors, timeout: float = DEFAULT_TIMEOUT,
+                     label: str = "element", strategy: str = "xpath",
+                     interval: float = POLL_INTERVAL, remember: bool = False):
+    """Premier élément présent parmi selectors (str ou liste), sinon None."""
+    match = wait_for_match(driver, selectors, timeout, label, strategy, interval, remember)
+    return match[1] if match else None
+
+
+def wait_gone(driver, selectors, timeout: float = DEFAULT_TIMEOUT,
+              label: str = "gone", strategy: str = "xpath") -> bool:
+    """True dès qu'aucun des selectors n'est plus présent."""
+    cond = _polling_match(driver, _as_list(selectors), strategy)
+    return bool(wait_until(lambda: cond() is None, timeout=timeout, label=label))
+
+
+def current_package(driver) -> Optional[str]:
+    try:
+        return driver.current_package
+    except Exception:
+        return None
+
+
+def current_activity(driver) -> Optional[str]:
+    try:
+        return driver.current_activity
+    except Exception:
+        return None
+
+
+def wait_for_package(driver, packages, timeout: float = DEFAULT_TIMEOUT,
+                     label: str = "package") -> Optional[str]:
+    """Package au premier plan dès qu'il fait partie de packages (str ou liste)."""
+    wanted = set(_as_list(packages))
+
+    def in_front():
+        pkg = current_package(driver)
+        return pkg if pkg in wanted else None
+
+    return wait_until(in_front, timeout=timeout, label=label)
+
+
+def wait_for_change(driver, before_package: Optional[str] = None,
+                    before_activity: Optional[str] = None,
+                    timeout: float = DEFAULT_TIMEOUT, label: str = "transition") -> bool:
+    """True dès que le package OU l'activité diffère de l'état de départ."""
+    def changed():
+        if before_package is not None and current_package(driver) != before_package:
+            return True
+        if before_activity is not None and current_activity(driver) != before_activity:
+            return True
+        return False
+
+    return bool(wait_until(changed, timeout=timeout, label=label))
+
+
+def click_first(driver, selectors, timeout: float = DEFAULT_TIMEOUT,
+                label: str = "click", strategy: str = "xpath",
+                remember: bool = False) -> bool:
+    """Attend qu'un des selectors apparaisse (≤ timeout) puis clique dessus."""
+    sels = _as_list(selectors)
+    el = wait_for_element(driver, sels, timeout=timeout, label=label, strategy=strategy,
+                          remember=remember)
+    if el is None:
+        return False
+    try:
+        el.click()
+        return True
+    except Exception:
+        # Élément recyclé entre find et click → un essai de plus
+        el = find_first(driver, sels, strategy, fresh=True)
+        if el is None:
+            return False
+        try:
+            el.click()
+            return True
+        except Exception:
+            return False
+    finally:
+        snapshot.invalidate(driver)
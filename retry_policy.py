@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+StoryFX — politique de relance par type d'erreur
+------------------------------------------------
+Avant : tout rc ≠ 0 était relancé 5 fois (5/10/20/40/80 s de sommeil),
+téléphone bloqué jusqu'à 155 s même pour un album introuvable.
+
+Chaque échec est classé (code retour de l'engine ou type d'exception) :
+
+    config          → profil / album / config faux : échec immédiat
+    adb             → téléphone injoignable (ADB) : transitoire
+    appium_session  → session UiAutomator2 / serveur Appium : transitoire
+    selector_miss   → écran inattendu, élément absent : 1 relance puis file
+    unknown         → relances locales comme avant (sans file)
+
+Sous le scheduler (runner.py --requeue), un échec transitoire ne dort
+plus dans le job : runner.py sort avec RC_REQUEUE et le scheduler remet le
+job en file avec une date "pas avant" (REQUEUE_DELAYS) — le téléphone sert
+les autres créneaux entre-temps.
+
+Module sans dépendance (importé par runner.py, scheduler_executor.py).
+"""
+from typing import Dict, Optional
+
+# ---------- Codes retour des engines ----------
+RC_OK = 0
+RC_ADB = 1            # ADB non connecté
+RC_RESET = 2          # Galerie impossible à remettre propre
+RC_CONFIG = 3         # profil sans device_id / config invalide
+RC_ALBUM = 4          # album introuvable
+RC_LONG_PRESS = 5     # long press sur la 1ʳᵉ vignette impossible
+RC_SELECTION = 6      # pas assez de médias sélectionnés
+RC_SHARE = 7          # bouton Share introuvable
+RC_REQUEUE = 75       # (EX_TEMPFAIL) échec transitoire → à remettre en file
+
+RC_CLASS: Dict[int, str] = {
+    RC_ADB: "adb",
+    RC_RESET: "selector_miss",
+    RC_CONFIG: "config",
+    RC_ALBUM: "config",
+    RC_LONG_PRESS: "selector_miss",
+    RC_SELECTION: "selector_miss",
+    RC_SHARE: "selector_miss",
+}
+
+# Nom de classe d'exception (cherché dans le MRO : la plus précise gagne)
+EXC_CLASS: Dict[str, str] = {
+    "SelectorMiss": "selector_miss",
+    "NoSuchElementException": "selector_miss",
+    "StaleElementReferenceException": "selector_miss",
+    "TimeoutException": "selector_miss",
+    "SessionBusy": "appium_session",
+    "InvalidSessionIdException": "appium_session",
+    "WebDriverException": "appium_session",
+    "MaxRetryError": "appium_session",
+    "ConnectionError": "appium_session",
+    "TimeoutExpired": "adb",
+    "CalledProcessError": "adb",
+    "KeyError": "config",
+    "FileNotFoundError": "config",
+    "JSONDecodeError": "config",
+}
+
+# attempts        : tentatives dans le job (runner.py seul, sans scheduler)
+# before_requeue  : tentatives dans le job avant de rendre la main au scheduler
+# delays          : attente entre deux tentatives dans le job (s)
+RETRY_POLICY: Dict[str, Dict] = {
+    "config":         {"attempts": 1, "before_requeue": 1, "delays": (), "requeue": False},
+    "adb":            {"attempts": 3, "before_requeue": 1, "delays": (5, 10), "requeue": True},
+    "appium_session": {"attempts": 3, "before_requeue": 2, "delays": (2, 10), "requeue": True},
+    "selector_miss":  {"attempts": 2, "before_requeue": 2, "delays": (5,), "requeue": True},
+    "unknown":        {"attempts": 3, "before_requeue": 3, "delays": (5, 10), "requeue": False},
+}
+
+# Remises en file successives d'un même créneau (s avant nouvelle tentative)
+REQUEUE_DELAYS = (60, 180)
+
+
+def classify(rc: Optional[int] = None, exc: Optional[BaseException] = None) -> str:
+    """Classe d'erreur d'un échec (exception prioritaire sur le code retour)."""
+    if exc is not None:
+        for cls in type(exc).__mro__:
+            if cls.__name__ in EXC_CLASS:
+                return EXC_CLASS[cls.__name__]
+        return "unknown"
+    return RC_CLASS.get(rc, "unknown")
+
+
+def policy_for(kind: str) -> Dict:
+    return RETRY_POLICY.get(kind, RETRY_POLICY["unknown"])
+
+
+def retry_delay(kind: str, attempt: int) -> float:
+    """Attente avant la tentative attempt+1 (dernière valeur répétée)."""
+    delays = policy_for(kind)["delays"] or (0,)
+    return float(delays[min(attempt - 1, len(delays) - 1)])
+
+
+def requeue_delay(rc: int, requeues: int) -> Optional[float]:
+    """Délai "pas avant" de la prochaine remise en file, None si épuisé / non transitoire."""
+    if rc != RC_REQUEUE or requeues >= len(REQUEUE_DELAYS):
+        return None
+    return float(REQUEUE_DELAYS[requeues])
@@ -6,17 +6,27 @@ Avec support complet :
 - Instagram
 - TikTok
 - WhatsApp
+
+Client léger : si le pool de workers (worker_pool.py) tourne, le job lui est
+confié (engines déjà importés) ; sinon exécution locale comme avant.
+Les engines (appium / selenium) ne sont importés qu'en exécution locale.
 """
 
-import json, time
+import json, time, sys
 import argparse
 from pathlib import Path
 
-from engine import engine_intro, engine_multi
+import retry_policy
 
 from datetime import datetime
 import os
 
+
+def load_engines():
+    """Import paresseux des engines (appium / selenium = plusieurs secondes)."""
+    from engine import engine_intro, engine_multi, engine_intro_multi
+    return engine_intro, engine_multi, engine_intro_multi
+
 def get_display_time() -> str:
     """Heure à afficher dans les logs (rattrapage ou réelle)."""
     t = os.environ.get("STORYFX_TIME")
@@ -40,20 +50,25 @@ def load_json(path: str | Path):
         return json.load(f)
 
 
-def die(msg: str, code: int = 2):
+def die(msg: str, code: int = retry_policy.RC_CONFIG):
     print(f"[runner] {msg}")
     raise SystemExit(code)
 
-def run_with_retries(label, fn, max_attempts=5):
+def run_with_retries(label, fn, max_attempts=5, requeue=False, stats=None):
     """
-    Exécute fn() avec retries :
-    - jusqu’à max_attempts tentatives
-    - délais progressifs : 5s, 10s, 20s, 40s, 80s
-    - NE RELANCE PAS l’exception à la fin : retourne juste 1 en cas d’échec.
+    Exécute fn() avec relances selon la classe d'erreur (retry_policy) :
+    - config (album introuvable, profil sans device_id...) → échec immédiat
+    - transitoire (ADB, session Appium, sélecteur) → relances courtes, puis
+      avec requeue=True (job lancé par le scheduler) retourne RC_REQUEUE :
+      le scheduler remet le job en file au lieu de dormir ici
+    - au plus max_attempts tentatives
+    - NE RELANCE PAS l’exception à la fin : retourne le rc de l'engine (ou 1).
+    stats (dict) : stats["attempts"] = nombre de tentatives jouées.
     """
     global args  # ⬅️ OBLIGATOIRE pour utiliser args.profile / args.engine / args.platform
 
     last_exc = None
+    rc = 1
 
     for attempt in range(1, max_attempts + 1):
         # --- LOG RUN HEADER ---
@@ -69,7 +84,10 @@ def run_with_retries(label, fn, max_attempts=5):
         print(f"[StoryFX] [RUN] {now} | Device = {args.profile} | engine = {args.engine} | platform = {args.platform}")
 
         print(f"[StoryFX] [{label}] tentative {attempt}/{max_attempts}...")
+        if stats is not None:
+            stats["attempts"] = attempt
 
+        exc = None
         try:
             rc = fn()
             if rc == 0:
@@ -78,21 +96,45 @@ def run_with_retries(label, fn, max_attempts=5):
             else:
                 print(f"[StoryFX] [{label}] retour rc={rc} (tentative {attempt}).")
         except Exception as e:
-            last_exc = e
+            last_exc = exc = e
+            rc = None
             print(f"[StoryFX] [{label}] ERREUR à la tentative {attempt}: {e!r}")
 
-        # Si ce n’est pas la dernière tentative → on attend (5, 10, 20, 40, 80)
-        if attempt < max_attempts:
-            delay = 5 * (2 ** (attempt - 1))  # 1→5s, 2→10s, 3→20s, 4→40s, 5→80s
-            print(f"[StoryFX] [{label}] nouvelle tentative dans {delay} s...")
-            time.sleep(delay)
+        kind = retry_policy.classify(rc, exc)
+        policy = retry_policy.policy_for(kind)
+        limit = policy["before_requeue"] if requeue and policy["requeue"] else policy["attempts"]
+
+        if attempt >= min(limit, max_attempts):
+            if requeue and policy["requeue"]:
+                print(f"[StoryFX] [{label}] échec transitoire ({kind}) → remis au scheduler.")
+                return retry_policy.RC_REQUEUE
+            if kind == "config":
+                print(f"[StoryFX] [{label}] erreur permanente ({kind}) : pas de nouvelle tentative.")
+            break
 
-    print(f"[StoryFX] [{label}] échec après {max_attempts} tentatives.")
+        delay = retry_policy.retry_delay(kind, attempt)
+        print(f"[StoryFX] [{label}] {kind} : nouvelle tentative dans {delay:.0f} s...")
+        time.sleep(delay)
+
+    print(f"[StoryFX] [{label}] échec après {attempt} tentative(s).")
     if last_exc:
         print(f"[StoryFX] [{label}] dernière exception : {last_exc!r}")
 
-    # On NE relance pas l’exception → le process se termine proprement avec code 1
-    return 1
+    # On NE relance pas l’exception → le process se termine proprement (rc de l'engine, sinon 1)
+    return rc or 1
+
+def emit_result(record: dict, path: str | None) -> None:
+    """Résultat structuré du job : UNE ligne JSON ajoutée au fichier --result-file."""
+    global LAST_RESULT
+    LAST_RESULT = record
+    if not path:
+        return
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"[runner] Impossible d'écrire le résultat dans {path} : {e!r}")
+
 
 # ---------- CLI ----------
 def build_argparser() -> argparse.ArgumentParser:
@@ -134,17 +176,48 @@ def build_argparser() -> argparse.ArgumentParser:
         type=str,
         help=argparse.SUPPRESS,
     )
+
+    # Résultat structuré (1 ligne JSON par job) ; "" pour désactiver
+    ap.add_argument(
+        "--result-file",
+        dest="result_file",
+        default=os.environ.get("STORYFX_RESULT_FILE", str(Path(__file__).with_name("run_results.jsonl"))),
+        help="Fichier JSONL des résultats (rc, étapes, durées, sélecteurs)",
+    )
+
+    # Job lancé par le scheduler : échec transitoire → rc 75, remis en file
+    ap.add_argument("--requeue", action="store_true", help=argparse.SUPPRESS)
+
+    # Forcer l'exécution dans ce processus (sans pool de workers)
+    ap.add_argument("--local", action="store_true", help="Ne pas utiliser le pool de workers")
     return ap
 
 
 args = None
+LAST_RESULT = None   # dernier résultat structuré (relu par worker_pool)
 
-# ---------- Main ----------
-def main():
-    # print(f"[StoryFX] [{label}] tentative {attempt}/{max_attempts}...")
+# ---------- Exécution d'un job ----------
+def run_cli(argv=None) -> int:
+    """
+    Exécute un job complet (intro | multi | intro_multi) et retourne le code.
+    Appelé par main() en local, ou par un worker du pool (worker_pool.py).
+    """
+    global args, LAST_RESULT
+    args = build_argparser().parse_args(argv)
+    LAST_RESULT = None
 
-    global args
-    args = build_argparser().parse_args()
+    engine_intro, engine_multi, engine_intro_multi = load_engines()
+    from engine import results as engine_results, steps as engine_steps, tracing
+    engine_results.reset()
+    tracing.start_run(f"{args.engine}_{args.profile}")
+
+    # Dernier RunResult rendu par un engine (les anciennes signatures rendent un int)
+    last = {"result": None}
+    stats = {"attempts": 0}
+
+    def keep(value):
+        last["result"] = value if isinstance(value, engine_results.RunResult) else None
+        return engine_results.rc_of(value)
 
     # --- Chargement du profil ---
     profiles = load_json(args.profiles)
@@ -170,35 +243,37 @@ def main():
 
         def call_intro():
             try:
-                return engine_intro.run(
+                return keep(engine_intro.run(
                     profile,
                     args.album,
                     platform=args.platform,
                     platform_opts=platform_opts,
-                )
+                ))
             except TypeError:
                 # Compat anciennes signatures
-                return engine_intro.run(profile, args.album)
+                return keep(engine_intro.run(profile, args.album))
 
-        rc = run_with_retries("intro", call_intro, max_attempts=5)
+        rc = run_with_retries("intro", call_intro, max_attempts=5, requeue=args.requeue,
+                              stats=stats)
 
     # ========== ENGINE MULTI ==========
     elif args.engine == "multi":
 
         def call_multi():
             try:
-                return engine_multi.run(
+                return keep(engine_multi.run(
                     profile,
                     args.album,
                     args.count,
                     platform=args.platform,
                     platform_opts=platform_opts,
-                )
+                ))
             except TypeError:
                 # Compat anciennes signatures
-                return engine_multi.run(profile, args.album, args.count)
+                return keep(engine_multi.run(profile, args.album, args.count))
 
-        rc = run_with_retries("multi", call_multi, max_attempts=5)
+        rc = run_with_retries("multi", call_multi, max_attempts=5, requeue=args.requeue,
+                              stats=stats)
 
     # ========== ENGINE INTRO + MULTI ==========
     elif args.engine == "intro_multi":
@@ -206,35 +281,96 @@ def main():
         album_intro = args.album
         album_multi = args.album2 or args.album
 
-        def call_intro():
-            try:
-                return engine_intro.run(
-                    profile,
-                    album_intro,
-                    platform=args.platform,
-                    platform_opts=platform_opts,
-                )
-            except TypeError:
-                return engine_intro.run(profile, album_intro)
+        # 1 seule session pour les 2 phases ; une relance après une intro
+        # publiée ne rejoue que la phase MULTI. Progression relue sur disque :
+        # un job remis en file (--requeue) tourne dans un nouveau processus.
+        device_id = profile.get("device_id")
+        job_key = "|".join(str(v) for v in (
+            "intro_multi", args.profile, args.platform, album_intro, album_multi, args.count,
+            os.environ.get("STORYFX_TIME") or "",
+        ))
+        progress = engine_steps.load_progress(device_id, job_key)
+        if "intro" in progress:
+            print("[runner] intro_multi : intro déjà publiée (job remis en file) → phase MULTI seule.")
+
+        def call_intro_multi():
+            return keep(engine_intro_multi.run(
+                profile,
+                album_intro,
+                album_multi,
+                args.count,
+                platform=args.platform,
+                platform_opts=platform_opts,
+                skip_intro="intro" in progress,
+                progress=progress,
+                job_key=job_key,
+            ))
+
+        rc = run_with_retries("intro_multi", call_intro_multi, max_attempts=5, requeue=args.requeue,
+                              stats=stats)
+        if rc != retry_policy.RC_REQUEUE:
+            engine_steps.clear_progress(device_id)   # job terminé : publié ou échec définitif
+
+    # --- Échec définitif (erreur permanente / relances épuisées) : le point de
+    #     reprise ne doit pas servir au prochain job du téléphone ---
+    if rc not in (retry_policy.RC_OK, retry_policy.RC_REQUEUE):
+        engine_steps.clear(profile.get("device_id"))
+
+    # --- Résultat structuré : rc final, étapes, durées, sélecteurs ---
+    result = engine_results.current() or last["result"]   # current() : run interrompu par une exception
+    if result is None:
+        result = engine_results.RunResult(args.engine, args.profile, args.platform)
+    if result.rc is None or result.rc != rc:
+        result.finish(rc)
+    result.attempts = stats["attempts"]
+    record = result.to_dict()
+    record.update({
+        "engine": args.engine,
+        "time": os.environ.get("STORYFX_TIME") or get_display_time(),
+        "album": args.album,
+        "album2": args.album2,
+    })
+    # --- Trace Chrome / Perfetto du job (STORYFX_TRACE=1) ---
+    trace_path = tracing.end_run({"rc": rc, "platform": args.platform, "album": args.album})
+    if trace_path:
+        record["trace"] = trace_path
+        print(f"[runner] Trace : {trace_path}")
+    emit_result(record, args.result_file)
+
+    return rc
+
+
+def profile_device_key(profiles_path: str, profile_name: str) -> str:
+    """device_id du profil (affinité worker ↔ téléphone), sinon le nom du profil."""
+    try:
+        profile = load_json(profiles_path).get("profiles", {}).get(profile_name) or {}
+        return (profile.get("device_id") or "").strip() or profile_name
+    except Exception:
+        return profile_name
 
-        def call_multi():
-            try:
-                return engine_multi.run(
-                    profile,
-                    album_multi,
-                    args.count,
-                    platform=args.platform,
-                    platform_opts=platform_opts,
-                )
-            except TypeError:
-                return engine_multi.run(profile, album_multi, args.count)
 
-        rc_intro = run_with_retries("intro", call_intro, max_attempts=5)
-        if rc_intro != 0:
-            rc = rc_intro
-        else:
-            rc_multi = run_with_retries("multi", call_multi, max_attempts=5)
-            rc = rc_multi
+# ---------- Main ----------
+def main():
+    global args
+    argv = sys.argv[1:]
+    args = build_argparser().parse_args(argv)
+
+    result = None
+    if not args.local:
+        import worker_pool
+        result = worker_pool.run_remote(
+            argv,
+            time_str=os.environ.get("STORYFX_TIME"),
+            device=profile_device_key(args.profiles, args.profile),
+        )
+
+    if result is not None:
+        rc = result.get("rc", 1)
+        if result.get("error"):
+            print(f"[runner] Pool : {result['error']}")
+        print(f"[runner] (pool worker pid={result.get('worker_pid')}, {result.get('duration_s')} s)")
+    else:
+        rc = run_cli(argv)
 
     print(f"[runner] Terminé avec code {rc}")
     raise SystemExit(rc)
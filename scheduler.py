@@ -7,7 +7,20 @@ StoryFX Scheduler
 - Déclenche runner.py avec:
     --profile, --engine, --album, [--count]
     --platform, [--page], [--page_name]
-- Anti double-lancement: un job ne part qu'une fois par minute.
+- Anti double-lancement: registre SQLite persistant (date, minute, profil,
+  système) → un créneau ne part qu'une fois, même après un redémarrage ;
+  au démarrage, rattrapage des créneaux récents sans entrée
+  (voir scheduler_ledger.py).
+- Exécution non bloquante : une file FIFO par téléphone (device_id)
+  + plafond global de jobs simultanés (voir scheduler_executor.py).
+- Planning compilé minute → jobs, recompilé seulement quand un JSON
+  change (voir scheduler_timetable.py).
+- Pas de polling : le scheduler dort jusqu'à la prochaine minute utile
+  (tas d'échéances monotones) ou jusqu'à une modif de config / horloge
+  (voir scheduler_wakeup.py).
+- Pool de workers chauds : les jobs sont confiés à des processus qui ont
+  déjà importé appium / selenium (voir worker_pool.py), repli sur
+  runner.py en sous-processus si le pool ne répond pas.
 
 En plus:
 - build_planning() : renvoie la liste complète des programmations
@@ -22,6 +35,12 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Iterator, Dict, Any, List, Tuple
 from ui.ui_devices import ensure_appium_running
+from ui.ui_adb_connections import ensure_fleet_connected
+from scheduler_executor import DeviceJobExecutor, run_subprocess
+from scheduler_ledger import JobLedger, recent_slots, slot_date_for
+from scheduler_timetable import TimetableCache, config_signature
+from scheduler_wakeup import ConfigWatcher, FireHeap, seconds_until_minute
+import worker_pool
 
 RATTRAPAGE_DONE = False
 PROJECT_NAME = "StoryFX"  # anciennement WA-HUB
@@ -33,6 +52,10 @@ SYSTEMS_PATH = CONFIG_DIR / "systems.json"
 MATRIX_PATH = CONFIG_DIR / "matrix.json"
 ALBUMS_PATH   = CONFIG_DIR / "albums.json"   # 🆕
 CLOCK_PATH   = CONFIG_DIR / "scheduler_clock.json"  # 🆕 mode auto / manuel
+LEDGER_PATH  = CONFIG_DIR / "scheduler_ledger.db"   # 🆕 registre des jobs lancés
+
+# Rattrapage au démarrage : créneaux des N dernières minutes sans entrée au registre
+DEFAULT_CATCHUP_MINUTES = 120
 
 # --- Gestion écriture heure scheduler_clock.json ---
 CLOCK_PATH = CONFIG_DIR / "scheduler_clock.json"
@@ -95,7 +118,21 @@ def load_clock_state() -> dict:
       {"mode": "manual", "time": "13:00"}   # heure virtuelle HH:MM en 24h
 
     Si le fichier n'existe pas ou est invalide → mode auto.
+
+    Le fichier n'est relu que si sa date / taille a changé.
     """
+    sig = config_signature([CLOCK_PATH])
+    cached = getattr(load_clock_state, "_cache", None)
+    if cached is not None and cached[0] == sig:
+        return dict(cached[1])
+
+    state = _read_clock_state()
+    load_clock_state._cache = (sig, state)
+    return dict(state)
+
+
+def _read_clock_state() -> dict:
+    """Lecture brute de scheduler_clock.json (voir load_clock_state)."""
     if not CLOCK_PATH.exists():
         return {"mode": "auto"}
 
@@ -178,6 +215,19 @@ def get_logical_minute() -> str:
     t = get_logical_minute._logical_time
     return f"{t.hour:02d}:{t.minute:02d}"
 
+def seconds_until_next_logical_minute() -> float:
+    """
+    Secondes avant que get_logical_minute() change de valeur.
+
+    - mode manuel : l'horloge virtuelle avance 60 s après _last_real
+    - sinon       : prochaine minute pleine de l'horloge du PC
+    """
+    last = getattr(get_logical_minute, "_last_real", None)
+    if last is None:
+        now = datetime.now()
+        return 60.0 - now.second - now.microsecond / 1e6
+    return max(0.0, 60.0 - (datetime.now() - last).total_seconds())
+
 # ---------- Chargement / planning ----------
 
 def load_configs() -> Tuple[dict, dict, dict, dict]:
@@ -189,6 +239,14 @@ def load_configs() -> Tuple[dict, dict, dict, dict]:
     return profiles, systems, matrix, albums
 
 
+def build_timetable_cache() -> TimetableCache:
+    """Planning compilé, recompilé quand profiles/systems/matrix/albums changent."""
+    return TimetableCache(
+        [PROFILES_PATH, SYSTEMS_PATH, MATRIX_PATH, ALBUMS_PATH],
+        lambda: iter_jobs(*load_configs()),
+    )
+
+
 def iter_jobs(profiles: dict, systems: dict, matrix: dict, albums: dict) -> Iterator[Dict[str, Any]]:
     """
     Génère toutes les programmations possibles.
@@ -201,16 +259,19 @@ def iter_jobs(profiles: dict, systems: dict, matrix: dict, albums: dict) -> Iter
     # On prépare un dict {nom_album: config_album} pour aller vite
     albums_dict = {a.get("name"): a for a in albums.get("albums", [])}
 
+    # Lignes matrix groupées par profil (évite un parcours complet par profil)
+    rows_by_device: Dict[str, List[dict]] = {}
+    for row in matrix.get("rows", []):
+        rows_by_device.setdefault(row.get("device"), []).append(row)
+
     for dev_name, dev in profiles.get("profiles", {}).items():
         if not dev.get("enabled", True):
             continue  # 🔥 Skip ce device
 
         offset = int(dev.get("offset_minutes", 0))
+        device_id = (dev.get("device_id") or "").strip()
 
-        for row in matrix.get("rows", []):
-            if row.get("device") != dev_name:
-                continue
-
+        for row in rows_by_device.get(dev_name, []):
             sys_key = row["system"]
             sys_conf = systems.get("systems", {}).get(sys_key)
             if sys_conf is None:
@@ -248,6 +309,7 @@ def iter_jobs(profiles: dict, systems: dict, matrix: dict, albums: dict) -> Iter
                 t_effective = hhmm_add_offset(base_time, offset)
                 yield {
                     "device": dev_name,
+                    "device_id": device_id,  # téléphone physique (clé de file)
                     "system": sys_key,
                     "engine": engine,
                     "album_intro": album_intro,
@@ -261,6 +323,128 @@ def iter_jobs(profiles: dict, systems: dict, matrix: dict, albums: dict) -> Iter
                     "time_effective": t_effective,
                 }
 
+def get_catchup_minutes() -> int:
+    """Fenêtre de rattrapage au démarrage (STORYFX_CATCHUP_MINUTES, 0 = désactivé)."""
+    try:
+        n = int(os.environ.get("STORYFX_CATCHUP_MINUTES", DEFAULT_CATCHUP_MINUTES))
+    except ValueError:
+        n = DEFAULT_CATCHUP_MINUTES
+    return max(0, min(n, 1439))
+
+
+def open_ledger() -> JobLedger:
+    """Registre SQLite des jobs (config/scheduler_ledger.db)."""
+    ledger = JobLedger(LEDGER_PATH)
+    n = ledger.mark_interrupted()
+    if n:
+        print(f"[{PROJECT_NAME}] Registre : {n} job(s) interrompu(s) par un arrêt précédent.")
+    return ledger
+
+
+def build_executor(ledger: JobLedger) -> DeviceJobExecutor:
+    """Exécuteur par téléphone qui tient le registre à jour (running / done / failed)."""
+
+    def on_start(item: Dict[str, Any]) -> None:
+        if item.get("slot"):
+            ledger.mark_running(item["slot"], item["job"])
+
+    def on_finish(item: Dict[str, Any], rc: int) -> None:
+        if item.get("slot"):
+            ledger.mark_finished(item["slot"], item["job"], rc)
+
+    def on_requeue(item: Dict[str, Any], rc: int) -> None:
+        if item.get("slot"):
+            ledger.mark_requeued(item["slot"], item["job"], rc)
+
+    return DeviceJobExecutor(
+        before_run=ensure_appium_running, on_start=on_start, on_finish=on_finish,
+        on_requeue=on_requeue,
+        run_fn=run_job_cmd,
+    )
+
+
+def run_job_cmd(cmd: List[str], env: Dict[str, str], device_key: str) -> int:
+    """
+    Confie le job au pool de workers (cmd = [python, runner.py, *argv]).
+    Si le pool est injoignable → runner.py en sous-processus comme avant.
+    """
+    result = worker_pool.run_remote(cmd[2:], time_str=env.get("STORYFX_TIME"), device=device_key)
+    if result is None:
+        return run_subprocess(cmd, env, device_key)
+    if result.get("error"):
+        print(f"[{PROJECT_NAME}] [Pool] ⚠ {result['error']}", flush=True)
+    return int(result.get("rc", 1))
+
+
+def run_startup_catchup(ledger: JobLedger, executor: DeviceJobExecutor, table) -> int:
+    """
+    Mode auto, au démarrage : relance les créneaux des dernières
+    STORYFX_CATCHUP_MINUTES minutes qui n'ont AUCUNE entrée au registre
+    (scheduler arrêté / PC éteint au moment prévu).
+    Retourne le nombre de jobs remis en file.
+    """
+    window = get_catchup_minutes()
+    if window <= 0:
+        return 0
+
+    # Premier lancement avec registre : on ne sait pas ce qui a déjà tourné
+    if ledger.is_empty():
+        print(f"[{PROJECT_NAME}] Registre vide → pas de rattrapage au démarrage.")
+        return 0
+
+    missing = ledger.missing_slots(recent_slots(table.by_minute, window))
+    launched = 0
+    for slot, job in missing:
+        if not ledger.claim(slot, job):
+            continue
+        day, minute = slot
+        due = datetime.fromisoformat(day).replace(hour=minute // 60, minute=minute % 60)
+        timestamp = job["time_effective"] + ":00"
+        print(
+            f"[{PROJECT_NAME}] {timestamp} → Rattrapage démarrage : {job['device']} | "
+            f"Sys={job['system']} | Plat={job['platform']} ({day})"
+        )
+        executor.submit(job, build_runner_cmd(job), timestamp, due=due, slot=slot)
+        launched += 1
+
+    print(f"[{PROJECT_NAME}] Rattrapage démarrage : {launched} job(s) sur les {window} dernières minutes.")
+    return launched
+
+
+def build_runner_cmd(job: Dict[str, Any]) -> List[str]:
+    """Construit la commande runner.py d'un job (intro / multi / intro_multi)."""
+    engine_ui = job["engine"] or ""
+    engine_cli = "intro_multi" if engine_ui == "intro+multi" else engine_ui
+
+    cmd = [
+        sys.executable or "python",
+        str(BASE_DIR / "runner.py"),
+        "--profiles", str(PROFILES_PATH),
+        "--profile", job["device"],
+        "--engine", engine_cli,
+        "--platform", job["platform"],
+        "--requeue",   # échec transitoire → rc 75, remis en file par l'exécuteur
+    ]
+
+    if engine_cli == "intro":
+        cmd += ["--album", job["album_intro"]]
+    elif engine_cli == "multi":
+        cmd += ["--album", job["album_multi"], "--count", str(job["count"])]
+    elif engine_cli == "intro_multi":
+        cmd += [
+            "--album", job["album_intro"],
+            "--album2", job["album_multi"],
+            "--count", str(job["count"]),
+        ]
+
+    if job.get("page"):
+        cmd += ["--page", job["page"]]
+    if job.get("page_name"):
+        cmd += ["--page_name", job["page_name"]]
+
+    return cmd
+
+
 def build_planning() -> List[List[str]]:
     """
     Construit un tableau lisible pour la GUI.
@@ -295,12 +479,21 @@ def build_planning() -> List[List[str]]:
     return table
 
 
-def run_manual_catchup(state: dict) -> None:
+def run_manual_catchup(state: dict, executor: DeviceJobExecutor | None = None,
+                       ledger: JobLedger | None = None) -> None:
     """
     Exécute TOUTES les programmations entre:
         start_time ≤ job_time ≤ heure réelle (au moment du test)
     Et refait autant de passes que nécessaire jusqu'à ne rater AUCUN job.
+
+    Les jobs partent dans l'exécuteur (en parallèle entre téléphones) ;
+    on attend que toutes les files soient vides avant de repasser en auto.
+    Un créneau déjà présent dans le registre n'est pas relancé.
     """
+    if ledger is None:
+        ledger = open_ledger()
+    if executor is None:
+        executor = build_executor(ledger)
 
     start_hhmm = state.get("time")
     if not start_hhmm:
@@ -318,8 +511,6 @@ def run_manual_catchup(state: dict) -> None:
 
     print(f"[{PROJECT_NAME}] Rattrapage manuel initial… point de départ = {start_hhmm}")
 
-    already_run = set()  # éviter double exécution
-
     while True:
         now_hm = datetime.now().strftime("%H:%M")
         now_min = int(now_hm.replace(":", ""))
@@ -336,44 +527,16 @@ def run_manual_catchup(state: dict) -> None:
             if not (start_min <= job_min <= now_min):
                 continue
 
-            # Déjà exécuté ?
-            key = (job["device"], job["system"], job_min)
-            if key in already_run:
+            # Déjà exécuté ? (registre persistant)
+            minute = to_minutes(job_time)
+            slot = (slot_date_for(minute), minute)
+            if not ledger.claim(slot, job):
                 continue
 
             # ---- LANCEMENT DU JOB ----
-            # Construire commande runner
-            engine_ui = job["engine"] or ""
-            engine_cli = "intro_multi" if engine_ui == "intro+multi" else engine_ui
-
-            cmd = [
-                sys.executable or "python",
-                str(BASE_DIR / "runner.py"),
-                "--profiles", str(PROFILES_PATH),
-                "--profile", job["device"],
-                "--engine", engine_cli,
-                "--platform", job["platform"],
-            ]
-
-            if engine_cli == "intro":
-                cmd += ["--album", job["album_intro"]]
-            elif engine_cli == "multi":
-                cmd += ["--album", job["album_multi"], "--count", str(job["count"])]
-            elif engine_cli == "intro_multi":
-                cmd += [
-                    "--album", job["album_intro"],
-                    "--album2", job["album_multi"],
-                    "--count", str(job["count"]),
-                ]
-
-            if job.get("page"):
-                cmd += ["--page", job["page"]]
-            if job.get("page_name"):
-                cmd += ["--page_name", job["page_name"]]
-
-
+            cmd = build_runner_cmd(job)
+            engine_cli = "intro_multi" if job["engine"] == "intro+multi" else job["engine"]
             timestamp = job_time + ":00"
-            os.environ["STORYFX_TIME"] = timestamp
 
             print(
                 f"[{PROJECT_NAME}] {timestamp} → Rattrapage : Lancement {job['device']} | "
@@ -381,14 +544,16 @@ def run_manual_catchup(state: dict) -> None:
             )
             print("   CMD:", " ".join(cmd))
 
-            run_cmd(cmd)
-            already_run.add(key)
+            executor.submit(job, cmd, timestamp, slot=slot)
             did_run_something = True
 
         # ---- FIN DE PASSE ----
         if not did_run_something:
             break   # plus rien à rattraper → 100% OK
 
+        # On attend la fin de la passe (les files tournent en parallèle)
+        executor.wait_idle()
+
         # On boucle encore une fois car de nouveaux jobs peuvent devenir éligibles
         print(f"[{PROJECT_NAME}] Vérification jobs supplémentaires…")
 
@@ -428,7 +593,8 @@ def scheduler_loop() -> None:
     """
     Boucle infinie :
       - calcule l'heure courante logique (auto ou manuel)
-      - parcourt les jobs et déclenche ceux dont l'heure correspond
+      - parcourt les jobs et met en file ceux dont l'heure correspond
+        (la boucle continue de tourner pendant que les téléphones postent)
       - gère le rattrapage
       - transmet l'heure logique au runner via STORYFX_TIME
     """
@@ -439,10 +605,35 @@ def scheduler_loop() -> None:
     # 🔥 Nouvelle version PRO : démarrage Appium (ADB StoryFX + attente)
     print("[StoryFX] Vérification Appium…")
     ensure_appium_running()
+    # Toute la flotte Wi-Fi connectée une fois (les jobs ne touchent ensuite que leur téléphone)
+    fleet = ensure_fleet_connected(
+        dev.get("device_id") for dev in load_json(PROFILES_PATH).get("profiles", {}).values()
+        if dev.get("enabled", True)
+    )
+    if fleet:
+        ok = sum(1 for v in fleet.values() if v)
+        print(f"[{PROJECT_NAME}] ADB : {ok}/{len(fleet)} téléphone(s) connecté(s).")
+
+    # Workers pré-importés (STORYFX_POOL_WORKERS=0 pour désactiver)
+    worker_pool.ensure_pool_running()
     print(f"[{PROJECT_NAME}] Scheduler prêt ✅")
 
-    last_fired = set()
+    # Registre persistant (remplace le set last_fired en mémoire)
+    ledger = open_ledger()
+
+    # Une file par téléphone + plafond global (STORYFX_MAX_PARALLEL)
+    executor = build_executor(ledger)
+    print(f"[{PROJECT_NAME}] Exécuteur : {executor.max_parallel} job(s) en parallèle max.")
+    last_status = 0.0
 
+    timetable = build_timetable_cache()
+    fire_heap = FireHeap()
+    heap_sig = None
+    watcher = ConfigWatcher([PROFILES_PATH, SYSTEMS_PATH, MATRIX_PATH, ALBUMS_PATH, CLOCK_PATH])
+
+    # Créneaux ratés pendant l'arrêt du scheduler (mode auto uniquement)
+    if load_clock_state().get("mode", "auto") != "manual":
+        run_startup_catchup(ledger, executor, timetable.get())
 
     while True:
 
@@ -453,7 +644,7 @@ def scheduler_loop() -> None:
         # 🔥 1) RATTRAPAGE INITIAL AU LANCEMENT DU SCHEDULER
         # ---------------------------------------------------------
         if mode == "manual" and not RATTRAPAGE_DONE:
-            run_manual_catchup(state)
+            run_manual_catchup(state, executor, ledger)
             RATTRAPAGE_DONE = True
 
         # Heure réelle
@@ -474,8 +665,11 @@ def scheduler_loop() -> None:
 
         os.environ["STORYFX_TIME"] = display_time
 
-        # Charger les données
-        profiles, systems, matrix, albums = load_configs()
+        # Planning compilé (recompilé seulement si un JSON a changé)
+        table = timetable.get()
+        if table.signature != heap_sig or fire_heap.clock_jumped():
+            fire_heap.rebuild(table.minutes)
+            heap_sig = table.signature
 
         # Conversion minutes (avec gestion minuit)
         logical_min = to_minutes(logical_hm)
@@ -485,8 +679,8 @@ def scheduler_loop() -> None:
             start_min = to_minutes(state["time"])
             start_min, real_min = normalize_span(start_min, real_min)
 
-        # --- LANCEMENT DES JOBS ---
-        for job in iter_jobs(profiles, systems, matrix, albums):
+        # --- LANCEMENT DES JOBS (uniquement ceux de la minute logique) ---
+        for job in table.jobs_at(logical_min):
 
             job_hm = job["time_effective"]
             job_min = to_minutes(job_hm)
@@ -511,45 +705,20 @@ def scheduler_loop() -> None:
                 if job_hm != logical_hm:
                     continue
 
-            # --- ANTI DOUBLE-LANCEMENT ---
-            guard_key = (job_hm, job["device"], job["system"])
-            if guard_key in last_fired:
+            # --- ANTI DOUBLE-LANCEMENT (registre persistant) ---
+            minute = to_minutes(job_hm)
+            slot = (slot_date_for(minute), minute)
+            if not ledger.claim(slot, job):
                 continue
-            last_fired.add(guard_key)
-
-            # --- EXÉCUTER LE JOB ---
-            print(f"[{PROJECT_NAME}] {display_time} → Lancement {job['device']} | Sys={job['system']} | Plat={job['platform']}")
-
-            # --- AVANT de construire la commande ---
-            engine_ui = job["engine"] or ""
-            engine_cli = "intro_multi" if engine_ui == "intro+multi" else engine_ui
-
-            cmd = [
-                sys.executable, str(BASE_DIR / "runner.py"),
-                "--profiles", str(PROFILES_PATH),
-                "--profile", job["device"],
-                "--engine", engine_cli,
-                "--platform", job["platform"],
-            ]
-
-            if engine_cli == "intro":
-                cmd += ["--album", job["album_intro"]]
-            elif engine_cli == "multi":
-                cmd += ["--album", job["album_multi"], "--count", str(job["count"])]
-            elif engine_cli == "intro_multi":
-                cmd += [
-                    "--album", job["album_intro"],
-                    "--album2", job["album_multi"],
-                    "--count", str(job["count"]),
-                ]
-
-            # --- EXÉCUTER LE JOB ---
-            ensure_appium_running()  # ← ajoute ceci ici
 
-            print(
-                f"[{PROJECT_NAME}] {display_time} → Lancement {job['device']} | Sys={job['system']} | Plat={job['platform']}")
+            # --- EXÉCUTER LE JOB (non bloquant : file du téléphone) ---
+            if mode == "manual":
+                due = datetime.now()
+            else:
+                h, m = map(int, job_hm.split(":"))
+                due = datetime.now().replace(hour=h, minute=m, second=0, microsecond=0)
 
-            run_cmd(cmd)
+            executor.submit(job, build_runner_cmd(job), display_time, due=due, slot=slot)
 
         # --- FIN RATTRAPAGE : BASCULE EN MODE AUTO ---
         if mode == "manual" and logical_min >= real_min:
@@ -557,7 +726,31 @@ def scheduler_loop() -> None:
             write_clock_state("auto", now_real)
             RATTRAPAGE_DONE = True
 
-        time.sleep(1)
+        # --- ÉTAT DES FILES (toutes les 60 s tant que des jobs tournent) ---
+        if executor.busy() and time.monotonic() - last_status >= 60:
+            executor.log_status()
+            last_status = time.monotonic()
+
+        # --- DODO jusqu'au prochain événement (0 CPU entre deux posts) ---
+        fire_heap.pop_due()   # minutes traitées → reprogrammées à J+1
+
+        if mode == "manual":
+            deadline = time.monotonic() + seconds_until_next_logical_minute() + 0.005
+        else:
+            deadline = fire_heap.next_deadline()
+
+        if executor.busy():
+            status_deadline = last_status + 60
+            deadline = status_deadline if deadline is None else min(deadline, status_deadline)
+
+        changed = watcher.wait(deadline)
+
+        # Réveil sur échéance : l'horloge murale peut avoir quelques ms de retard
+        # sur l'horloge monotone → on complète pour tomber dans la bonne minute.
+        if not changed and mode != "manual" and fire_heap.peek_minute() is not None:
+            early = seconds_until_minute(fire_heap.peek_minute())
+            if early < 5.0:
+                time.sleep(early + 0.005)
 
 # ---------- Entrées CLI ----------
 
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+StoryFX Scheduler — exécuteur de jobs par téléphone
+---------------------------------------------------
+- Une file FIFO par téléphone physique (clé = device_id, ex: 192.168.10.56:5555)
+  → S23_IG, S23_FB_CM, S23_FB_CI, S23_TikTok partagent la même file.
+- Plafond global de jobs simultanés (STORYFX_MAX_PARALLEL, défaut 9).
+- La boucle du scheduler ne bloque plus : submit() rend la main tout de suite.
+- Log de la profondeur de file et du retard de chaque téléphone.
+- run_fn optionnel : exécute le job autrement qu'en sous-processus
+  (ex : pool de workers chauds, voir worker_pool.py).
+- rc RC_REQUEUE (échec transitoire, cf. retry_policy) : le job est remis dans
+  la file de son téléphone après un délai "pas avant" — le téléphone sert
+  les autres créneaux entre-temps au lieu d'attendre dans runner.py.
+"""
+import os
+import queue
+import subprocess
+import threading
+import time
+from datetime import datetime
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from retry_policy import requeue_delay
+
+PROJECT_NAME = "StoryFX"
+
+# Nombre max de runner.py en parallèle (tous téléphones confondus)
+DEFAULT_MAX_PARALLEL = 9
+
+
+def get_max_parallel() -> int:
+    """Lit le plafond global dans STORYFX_MAX_PARALLEL (≥ 1)."""
+    try:
+        n = int(os.environ.get("STORYFX_MAX_PARALLEL", DEFAULT_MAX_PARALLEL))
+    except ValueError:
+        n = DEFAULT_MAX_PARALLEL
+    return max(1, n)
+
+
+def run_subprocess(cmd: List[str], env: Dict[str, str], device_key: str) -> int:
+    """Exécution classique : un processus runner.py par job."""
+    return subprocess.run(cmd, check=False, env=env).returncode
+
+
+def device_key_for_job(job: Dict[str, Any]) -> str:
+    """Clé de file d'un job : device_id (téléphone physique), sinon nom du profil."""
+    return (job.get("device_id") or "").strip() or job["device"]
+
+
+class DeviceJobExecutor:
+    """
+    Exécute les commandes runner.py avec :
+      - 1 thread + 1 file FIFO par téléphone (jamais 2 jobs en même temps sur un téléphone)
+      - un sémaphore global (max_parallel jobs en même temps au total)
+    """
+
+    def __init__(self, max_parallel: Optional[int] = None,
+                 before_run: Optional[Callable[[], Any]] = None,
+                 on_start: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 on_finish: Optional[Callable[[Dict[str, Any], int], Any]] = None,
+                 on_requeue: Optional[Callable[[Dict[str, Any], int], Any]] = None,
+                 run_fn: Optional[Callable[[List[str], Dict[str, str], str], int]] = None):
+        self.max_parallel = max_parallel or get_max_parallel()
+        self._slots = threading.BoundedSemaphore(self.max_parallel)
+        self._before_run = before_run
+        self._before_run_lock = threading.Lock()
+        # Hooks (registre des jobs) : on_start(item) / on_finish(item, rc) / on_requeue(item, rc)
+        self._on_start = on_start
+        self._on_finish = on_finish
+        self._on_requeue = on_requeue
+        # run_fn(cmd, env, device_key) -> rc ; défaut : subprocess.run(cmd)
+        self._run_fn = run_fn or run_subprocess
+
+        self._lock = threading.Lock()
+        self._queues: Dict[str, queue.Queue] = {}
+        self._running: Dict[str, Dict[str, Any]] = {}   # device_key -> item sorti de la file
+        self._pending = 0                               # jobs soumis pas encore terminés
+        self._idle = threading.Condition(self._lock)
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def submit(self, job: Dict[str, Any], cmd: List[str], display_time: str,
+               due: Optional[datetime] = None, slot: Optional[Any] = None) -> None:
+        """Ajoute un job dans la file de son téléphone (non bloquant)."""
+        key = device_key_for_job(job)
+        item = {
+            "job": job,
+            "cmd": cmd,
+            "display_time": display_time,
+            "due": due or datetime.now(),
+            "queued_at": datetime.now(),
+            "slot": slot,
+            "requeues": 0,
+        }
+
+        with self._lock:
+            self._pending += 1
+        depth = self._enqueue(key, item)
+
+        print(
+            f"[{PROJECT_NAME}] [Exec] + {job['device']} | Sys={job['system']} → file {key} "
+            f"(profondeur={depth})",
+            flush=True,
+        )
+
+    def requeue(self, key: str, item: Dict[str, Any], delay_s: float) -> None:
+        """Remet `item` dans la file de `key` dans delay_s secondes (non bloquant)."""
+        item["requeues"] = item.get("requeues", 0) + 1
+        item["due"] = datetime.now() + timedelta(seconds=delay_s)
+        item["queued_at"] = item["due"]
+        item.pop("started", None)
+        with self._lock:
+            self._pending += 1
+        timer = threading.Timer(delay_s, self._enqueue, args=(key, item))
+        timer.daemon = True
+        timer.start()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Attend que toutes les files soient vides (utile pour le rattrapage)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._pending > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def busy(self) -> bool:
+        with self._lock:
+            return self._pending > 0
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        État par téléphone :
+          {device_key: {"depth": n, "running": profil|None, "late_s": retard max}}
+        """
+        now = datetime.now()
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for key, q in self._queues.items():
+                with q.mutex:
+                    waiting = list(q.queue)
+                running = self._running.get(key)
+                items = ([running] if running else []) + waiting
+                if not items:
+                    continue
+                late = max((now - it["due"]).total_seconds() for it in items)
+                out[key] = {
+                    "depth": len(items),
+                    "running": running["job"]["device"] if running and running.get("started") else None,
+                    "late_s": max(0.0, late),
+                }
+        return out
+
+    def log_status(self) -> None:
+        """Une ligne de log par téléphone actif (profondeur + retard)."""
+        snap = self.snapshot()
+        if not snap:
+            return
+        for key, st in sorted(snap.items()):
+            print(
+                f"[{PROJECT_NAME}] [Exec] {key} | file={st['depth']} | "
+                f"en cours={st['running'] or '-'} | retard={st['late_s']:.0f}s",
+                flush=True,
+            )
+
+    # ------------------------------------------------------------------ #
+    # Interne
+    # ------------------------------------------------------------------ #
+    def _enqueue(self, key: str, item: Dict[str, Any]) -> int:
+        """Met l'item dans la file du téléphone (créée au besoin) ; retourne la profondeur."""
+        with self._lock:
+            q = self._queues.get(key)
+            if q is None:
+                q = queue.Queue()
+                self._queues[key] = q
+                threading.Thread(
+                    target=self._device_worker, args=(key, q),
+                    name=f"storyfx-dev-{key}", daemon=True,
+                ).start()
+            q.put(item)
+            return q.qsize() + (1 if key in self._running else 0)
+
+    def _device_worker(self, key: str, q: queue.Queue) -> None:
+        while True:
+            item = q.get()
+            with self._lock:
+                self._running[key] = item   # sorti de la file (en attente d'un slot ou en cours)
+            try:
+                with self._slots:
+                    item["started"] = True
+                    self._run_item(key, q, item)
+            except Exception as e:
+                print(f"[{PROJECT_NAME}] [Exec] ⚠ Erreur job {key} : {e!r}", flush=True)
+            finally:
+                with self._idle:
+                    self._running.pop(key, None)
+                    self._pending -= 1
+                    if self._pending <= 0:
+                        self._idle.notify_all()
+                q.task_done()
+
+    def _call_hook(self, hook: Optional[Callable[..., Any]], *args: Any) -> None:
+        if hook is None:
+            return
+        try:
+            hook(*args)
+        except Exception as e:
+            print(f"[{PROJECT_NAME}] [Exec] ⚠ Hook {getattr(hook, '__name__', hook)} : {e!r}", flush=True)
+
+    def _run_item(self, key: str, q: queue.Queue, item: Dict[str, Any]) -> None:
+        job = item["job"]
+        started = datetime.now()
+        late = max(0.0, (started - item["due"]).total_seconds())
+
+        print(
+            f"[{PROJECT_NAME}] {item['display_time']} → Lancement {job['device']} | "
+            f"Sys={job['system']} | Plat={job['platform']} | file {key} "
+            f"(reste={q.qsize()}) | retard={late:.0f}s",
+            flush=True,
+        )
+
+        # Un seul thread à la fois vérifie / démarre Appium
+        if self._before_run is not None:
+            with self._before_run_lock:
+                try:
+                    self._before_run()
+                except Exception as e:
+                    print(f"[{PROJECT_NAME}] [Exec] ⚠ Vérification Appium : {e!r}", flush=True)
+
+        # STORYFX_TIME propre à chaque job (os.environ est partagé entre threads)
+        env = os.environ.copy()
+        env["STORYFX_TIME"] = item["display_time"]
+
+        self._call_hook(self._on_start, item)
+
+        t0 = time.monotonic()
+        try:
+            rc = self._run_fn(item["cmd"], env, key)
+        except Exception as e:
+            rc = -1
+            print(f"[{PROJECT_NAME}] ⚠ Erreur lors de l'exécution de la commande : {e}", flush=True)
+
+        delay = requeue_delay(rc, item.get("requeues", 0))
+        if delay is not None:
+            self._call_hook(self._on_requeue, item, rc)
+            self.requeue(key, item, delay)
+            print(
+                f"[{PROJECT_NAME}] [Exec] ↻ {job['device']} | Sys={job['system']} | échec transitoire → "
+                f"remis en file dans {delay:.0f}s (remise {item['requeues']}) | file {key}",
+                flush=True,
+            )
+            return
+
+        self._call_hook(self._on_finish, item, rc)
+
+        print(
+            f"[{PROJECT_NAME}] [Exec] ✓ {job['device']} | Sys={job['system']} | rc={rc} | "
+            f"durée={time.monotonic() - t0:.0f}s | file {key} (reste={q.qsize()})",
+            flush=True,
+        )
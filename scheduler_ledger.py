@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+StoryFX Scheduler — registre persistant des jobs (SQLite)
+---------------------------------------------------------
+Remplace les sets en mémoire (last_fired / already_run) :
+- survit aux redémarrages du scheduler (pas de double post, pas de trou)
+- une ligne par créneau : (date, minute, device, system) UNIQUE
+- états : queued → running → done / failed  (interrupted si le scheduler
+  a été coupé pendant le job ; running → queued quand un échec transitoire
+  est remis en file, rc = RC_REQUEUE)
+- index (date, device, system) → reste rapide avec 1 an d'historique
+
+Fichier : config/scheduler_ledger.db
+"""
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+PROJECT_NAME = "StoryFX"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_ledger (
+    id          INTEGER PRIMARY KEY,
+    date        TEXT    NOT NULL,   -- YYYY-MM-DD
+    minute      INTEGER NOT NULL,   -- minute du jour (0..1439)
+    device      TEXT    NOT NULL,   -- nom du profil (S23_IG, ...)
+    system      TEXT    NOT NULL,
+    engine      TEXT,
+    platform    TEXT,
+    state       TEXT    NOT NULL,   -- queued / running / done / failed / interrupted
+    rc          INTEGER,
+    started_at  TEXT,
+    finished_at TEXT,
+    UNIQUE (date, minute, device, system)
+);
+CREATE INDEX IF NOT EXISTS idx_job_ledger_date_device_system
+    ON job_ledger (date, device, system);
+"""
+
+# Slot = (date ISO, minute du jour)
+Slot = Tuple[str, int]
+
+
+def slot_date_for(minute: int, now: Optional[datetime] = None) -> str:
+    """
+    Date d'un créneau HH:MM vu depuis 'now' :
+    une minute "dans le futur" de plus d'1 min appartient à la veille
+    (rattrapage qui traverse minuit).
+    """
+    now = now or datetime.now()
+    now_min = now.hour * 60 + now.minute
+    d = now.date()
+    if minute > now_min + 1:
+        d = d - timedelta(days=1)
+    return d.isoformat()
+
+
+def _now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class JobLedger:
+    """Accès thread-safe au registre SQLite (une connexion partagée + verrou)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    # ------------------------------------------------------------------ #
+    # Écriture
+    # ------------------------------------------------------------------ #
+    def claim(self, slot: Slot, job: Dict[str, Any]) -> bool:
+        """
+        Réserve un créneau (état 'queued').
+        Retourne False si le créneau existe déjà → ne PAS relancer le job.
+        """
+        day, minute = slot
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO job_ledger "
+                "(date, minute, device, system, engine, platform, state) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'queued')",
+                (day, minute, job["device"], job["system"],
+                 job.get("engine") or "", job.get("platform") or ""),
+            )
+            self._conn.commit()
+            return cur.rowcount == 1
+
+    def mark_running(self, slot: Slot, job: Dict[str, Any]) -> None:
+        self._update(slot, job, "state = 'running', started_at = ?", (_now_iso(),))
+
+    def mark_finished(self, slot: Slot, job: Dict[str, Any], rc: int) -> None:
+        state = "done" if rc == 0 else "failed"
+        self._update(slot, job, "state = ?, rc = ?, finished_at = ?", (state, rc, _now_iso()))
+
+    def mark_requeued(self, slot: Slot, job: Dict[str, Any], rc: int) -> None:
+        """Échec transitoire remis en file : de nouveau 'queued' (le créneau reste réservé)."""
+        self._update(slot, job, "state = 'queued', rc = ?", (rc,))
+
+    def mark_interrupted(self) -> int:
+        """Au démarrage : les jobs restés queued/running viennent d'un scheduler coupé."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE job_ledger SET state = 'interrupted', finished_at = ? "
+                "WHERE state IN ('queued', 'running')",
+                (_now_iso(),),
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def _update(self, slot: Slot, job: Dict[str, Any], set_sql: str, params: tuple) -> None:
+        day, minute = slot
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE job_ledger SET {set_sql} "
+                "WHERE date = ? AND minute = ? AND device = ? AND system = ?",
+                params + (day, minute, job["device"], job["system"]),
+            )
+            self._conn.commit()
+
+    # ------------------------------------------------------------------ #
+    # Lecture
+    # ------------------------------------------------------------------ #
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM job_ledger LIMIT 1").fetchone() is None
+
+    def has_entry(self, slot: Slot, job: Dict[str, Any]) -> bool:
+        day, minute = slot
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM job_ledger "
+                "WHERE date = ? AND device = ? AND system = ? AND minute = ? LIMIT 1",
+                (day, job["device"], job["system"], minute),
+            ).fetchone()
+        return row is not None
+
+    def entries_for_day(self, day: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT date, minute, device, system, engine, platform, state, rc, "
+                "started_at, finished_at FROM job_ledger WHERE date = ? ORDER BY minute",
+                (day,),
+            )
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+    def missing_slots(self, candidates: Iterable[Tuple[Slot, Dict[str, Any]]]) -> List[Tuple[Slot, Dict[str, Any]]]:
+        """Filtre les (slot, job) qui n'ont AUCUNE ligne dans le registre."""
+        return [(slot, job) for slot, job in candidates if not self.has_entry(slot, job)]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def recent_slots(minutes_with_jobs: Dict[int, List[Dict[str, Any]]], window_minutes: int,
+                 now: Optional[datetime] = None) -> List[Tuple[Slot, Dict[str, Any]]]:
+    """
+    Créneaux passés dans la fenêtre [now - window, now[ (peut traverser minuit).
+    minutes_with_jobs : {minute_du_jour: [jobs]} (CompiledTimetable.by_minute)
+    """
+    now = (now or datetime.now()).replace(second=0, microsecond=0)
+    out: List[Tuple[Slot, Dict[str, Any]]] = []
+    for back in range(window_minutes, 0, -1):
+        t = now - timedelta(minutes=back)
+        minute = t.hour * 60 + t.minute
+        for job in minutes_with_jobs.get(minute, []):
+            out.append(((t.date().isoformat(), minute), job))
+    return out
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+StoryFX Scheduler — planning compilé
+------------------------------------
+- Index minute-du-jour (0..1439) → liste des jobs à lancer à cette minute.
+- Compilé une seule fois à partir de profiles / systems / matrix / albums.
+- Recompilé uniquement quand un fichier de config change (mtime / taille).
+
+Le tick du scheduler devient un simple dict lookup :
+    jobs = timetable.get().jobs_at(minute)
+au lieu de relire 4 JSON + parcourir tout iter_jobs() chaque seconde.
+"""
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+PROJECT_NAME = "StoryFX"
+
+# (chemin, mtime_ns, taille) pour chaque fichier surveillé ; None si absent
+Signature = Tuple[Tuple[str, Optional[int], Optional[int]], ...]
+
+
+def config_signature(paths: Sequence[Path]) -> Signature:
+    """Empreinte bon marché des fichiers de config (un os.stat par fichier)."""
+    sig = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            sig.append((str(p), st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append((str(p), None, None))
+    return tuple(sig)
+
+
+def hhmm_to_minute(hhmm: str) -> Optional[int]:
+    """'HH:MM' → minute du jour (0..1439), None si format invalide."""
+    try:
+        h, m = map(int, hhmm.split(":"))
+    except Exception:
+        return None
+    if not (0 <= h <= 23 and 0 <= m <= 59):
+        return None
+    return h * 60 + m
+
+
+class CompiledTimetable:
+    """Planning figé : {minute_du_jour: [job, ...]} (jobs au format iter_jobs)."""
+
+    def __init__(self, jobs: Iterable[Dict[str, Any]], signature: Signature = ()):
+        self.signature = signature
+        self.by_minute: Dict[int, List[Dict[str, Any]]] = {}
+        self.jobs_count = 0
+
+        for job in jobs:
+            minute = hhmm_to_minute(job.get("time_effective") or "")
+            if minute is None:
+                print(
+                    f"[{PROJECT_NAME}] ⚠ Heure invalide ignorée : {job.get('time_effective')!r} "
+                    f"({job.get('device')} / {job.get('system')})"
+                )
+                continue
+            self.by_minute.setdefault(minute, []).append(job)
+            self.jobs_count += 1
+
+        self.minutes: List[int] = sorted(self.by_minute)
+
+    def jobs_at(self, minute: int) -> List[Dict[str, Any]]:
+        """Jobs prévus à la minute donnée (liste vide si aucun)."""
+        return self.by_minute.get(minute % 1440, [])
+
+
+class TimetableCache:
+    """
+    Garde un CompiledTimetable et le recompile quand un fichier change.
+
+    build_jobs : callable sans argument qui renvoie les jobs (iter_jobs(...)).
+    """
+
+    def __init__(self, paths: Sequence[Path], build_jobs: Callable[[], Iterable[Dict[str, Any]]]):
+        self.paths = list(paths)
+        self._build_jobs = build_jobs
+        self._table: Optional[CompiledTimetable] = None
+
+    def changed(self) -> bool:
+        """True si un fichier de config a changé depuis la dernière compilation."""
+        return self._table is None or config_signature(self.paths) != self._table.signature
+
+    def get(self) -> CompiledTimetable:
+        """Retourne le planning compilé (recompile seulement si besoin)."""
+        sig = config_signature(self.paths)
+        if self._table is None or sig != self._table.signature:
+            t0 = time.perf_counter()
+            self._table = CompiledTimetable(self._build_jobs(), sig)
+            dt_ms = (time.perf_counter() - t0) * 1000
+            print(
+                f"[{PROJECT_NAME}] Planning compilé : {self._table.jobs_count} jobs "
+                f"sur {len(self._table.minutes)} minutes ({dt_ms:.1f} ms)",
+                flush=True,
+            )
+        return self._table
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+StoryFX Scheduler — réveils événementiels
+-----------------------------------------
+- FireHeap      : tas (heapq) des prochaines minutes à déclencher, avec des
+                  échéances sur horloge monotone.
+- ConfigWatcher : attend soit l'échéance, soit une modification d'un fichier
+                  de config / scheduler_clock.json.
+                  * Windows : FindFirstChangeNotificationW (0 CPU en attente)
+                  * ailleurs : os.stat des fichiers toutes les STAT_POLL_S secondes
+
+Le scheduler dort donc jusqu'à la prochaine minute utile au lieu de tourner
+toutes les secondes, et se réveille quelques ms après la frontière de minute.
+"""
+import heapq
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from scheduler_timetable import Signature, config_signature
+
+# Sur les OS sans notification native : fréquence de os.stat (très bon marché)
+STAT_POLL_S = 2.0
+
+# Sécurité : on se réveille au moins toutes les heures (resync wall clock / DST)
+MAX_SLEEP_S = 3600.0
+
+# Si l'écart horloge murale / monotone bouge de plus que ça → on reconstruit
+CLOCK_JUMP_S = 1.0
+
+
+def seconds_until_minute(minute: int, now: Optional[datetime] = None) -> float:
+    """Secondes (float) jusqu'au prochain HH:MM:00 de la minute du jour donnée."""
+    now = now or datetime.now()
+    now_s = now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+    delta = (minute * 60 - now_s) % 86400
+    return delta if delta > 0 else 86400.0
+
+
+class FireHeap:
+    """
+    Tas des prochains déclenchements : (échéance_monotone, minute_du_jour).
+
+    Une entrée par minute qui contient au moins un job ; après son passage,
+    la minute est re-programmée 24 h plus tard.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []
+        self._wall_offset = 0.0
+
+    def rebuild(self, minutes: Iterable[int]) -> None:
+        now = datetime.now()
+        mono = time.monotonic()
+        self._wall_offset = time.time() - mono
+        self._heap = [(mono + seconds_until_minute(m, now), m) for m in set(minutes)]
+        heapq.heapify(self._heap)
+
+    def clock_jumped(self) -> bool:
+        """True si l'heure murale a sauté (veille, changement d'heure, NTP...)."""
+        return abs((time.time() - time.monotonic()) - self._wall_offset) > CLOCK_JUMP_S
+
+    def next_deadline(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def peek_minute(self) -> Optional[int]:
+        return self._heap[0][1] if self._heap else None
+
+    def pop_due(self, now_mono: Optional[float] = None) -> List[int]:
+        """Retire les minutes échues et les re-programme à J+1."""
+        now_mono = time.monotonic() if now_mono is None else now_mono
+        due = []
+        while self._heap and self._heap[0][0] <= now_mono:
+            deadline, minute = heapq.heappop(self._heap)
+            due.append(minute)
+            heapq.heappush(self._heap, (deadline + 86400.0, minute))
+        return due
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class ConfigWatcher:
+    """Attend une échéance monotone OU une modification d'un des fichiers surveillés."""
+
+    def __init__(self, paths: Sequence[Path]):
+        self.paths = list(paths)
+        self._sig: Signature = config_signature(self.paths)
+        self._handles: List[int] = []
+        self._kernel32 = None
+
+        if sys.platform == "win32":
+            self._open_win32_notifications()
+
+    # ------------------------------------------------------------------ #
+    # API
+    # ------------------------------------------------------------------ #
+    def wait(self, deadline: Optional[float]) -> bool:
+        """
+        Dort jusqu'à deadline (time.monotonic()) ou jusqu'à un changement.
+        Retourne True si un fichier surveillé a changé.
+        """
+        while True:
+            now = time.monotonic()
+            remaining = MAX_SLEEP_S if deadline is None else max(0.0, deadline - now)
+            remaining = min(remaining, MAX_SLEEP_S)
+
+            if self._handles:
+                notified = self._wait_win32(remaining)
+                if not notified:
+                    return self._refresh()
+                # Un fichier du dossier a bougé : vrai changement des nôtres ?
+                if self._refresh():
+                    return True
+            else:
+                time.sleep(min(remaining, STAT_POLL_S))
+                if self._refresh():
+                    return True
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def close(self) -> None:
+        if self._kernel32 is not None:
+            for h in self._handles:
+                try:
+                    self._kernel32.FindCloseChangeNotification(h)
+                except Exception:
+                    pass
+        self._handles = []
+
+    # ------------------------------------------------------------------ #
+    # Interne
+    # ------------------------------------------------------------------ #
+    def _refresh(self) -> bool:
+        sig = config_signature(self.paths)
+        if sig != self._sig:
+            self._sig = sig
+            return True
+        return False
+
+    def _open_win32_notifications(self) -> None:
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            k32 = ctypes.WinDLL("kernel32", use_last_error=True)
+            k32.FindFirstChangeNotificationW.argtypes = [wintypes.LPCWSTR, wintypes.BOOL, wintypes.DWORD]
+            k32.FindFirstChangeNotificationW.restype = wintypes.HANDLE
+            k32.FindNextChangeNotification.argtypes = [wintypes.HANDLE]
+            k32.FindCloseChangeNotification.argtypes = [wintypes.HANDLE]
+            k32.WaitForMultipleObjects.argtypes = [
+                wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE), wintypes.BOOL, wintypes.DWORD,
+            ]
+            k32.WaitForMultipleObjects.restype = wintypes.DWORD
+
+            FILE_NOTIFY_CHANGE_FILE_NAME = 0x01
+            FILE_NOTIFY_CHANGE_SIZE = 0x08
+            FILE_NOTIFY_CHANGE_LAST_WRITE = 0x10
+            flags = FILE_NOTIFY_CHANGE_FILE_NAME | FILE_NOTIFY_CHANGE_SIZE | FILE_NOTIFY_CHANGE_LAST_WRITE
+            INVALID = wintypes.HANDLE(-1).value
+
+            for folder in sorted({str(Path(p).parent) for p in self.paths}):
+                h = k32.FindFirstChangeNotificationW(folder, False, flags)
+                if h and h != INVALID:
+                    self._handles.append(h)
+
+            self._kernel32 = k32
+            self._ctypes = ctypes
+            self._wintypes = wintypes
+        except Exception:
+            self._handles = []
+            self._kernel32 = None
+
+    def _wait_win32(self, timeout_s: float) -> bool:
+        """True si une notification est arrivée avant le timeout."""
+        WAIT_OBJECT_0 = 0x0
+        WAIT_TIMEOUT = 0x102
+        arr = (self._wintypes.HANDLE * len(self._handles))(*self._handles)
+        ms = int(max(0.0, timeout_s) * 1000)
+        rc = self._kernel32.WaitForMultipleObjects(len(self._handles), arr, False, ms)
+        if rc == WAIT_TIMEOUT:
+            return False
+        idx = rc - WAIT_OBJECT_0
+        if 0 <= idx < len(self._handles):
+            self._kernel32.FindNextChangeNotification(self._handles[idx])
+            return True
+        # Erreur inattendue → on repasse en mode os.stat
+        self.close()
+        return False
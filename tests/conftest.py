@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Modules absents de l'environnement de test (winsound hors Windows, Appium,
+Selenium, psutil, requests) remplacés par des modules factices : les tests
+visent la logique des engines, pas le téléphone.
+"""
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import sys
+import types
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+STUBBED_ROOTS = ("winsound", "appium", "selenium", "psutil", "requests")
+
+
+class _StubModule(types.ModuleType):
+    """Tout attribut existe : classes d'exception réelles, MagicMock sinon."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if name.endswith(("Exception", "Error")):
+            value = type(name, (Exception,), {})
+        else:
+            value = mock.MagicMock(name=f"{self.__name__}.{name}")
+        setattr(self, name, value)
+        return value
+
+
+class _StubFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    def __init__(self, roots):
+        self.roots = set(roots)
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname.split(".", 1)[0] in self.roots:
+            return importlib.machinery.ModuleSpec(fullname, self, is_package=True)
+        return None
+
+    def create_module(self, spec):
+        module = _StubModule(spec.name)
+        module.__path__ = []
+        return module
+
+    def exec_module(self, module):
+        pass
+
+
+_missing = [name for name in STUBBED_ROOTS if importlib.util.find_spec(name) is None]
+if _missing:
+    sys.meta_path.append(_StubFinder(_missing))
+
+
+@pytest.fixture(autouse=True)
+def checkpoints(monkeypatch, tmp_path):
+    """Checkpoints / progression des jobs (engine.steps) dans un dossier temporaire."""
+    from engine import steps
+    monkeypatch.setattr(steps, "STEP_CHECKPOINTS", tmp_path)
+    return tmp_path
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+intro_multi remis en file après une intro publiée : le nouveau processus
+relit la progression sur disque et ne reposte pas l'intro.
+"""
+from engine import engine_intro_multi, steps
+
+DEVICE = "192.168.10.56:5555"
+JOB = "intro_multi|S23_WA|WhatsApp|Intro|Multi|3|09:00:00"
+
+
+def test_requeued_job_skips_published_intro(monkeypatch):
+    posted = []
+    multi_rc = [1, 0]   # MULTI : échec transitoire puis succès
+
+    monkeypatch.setattr(engine_intro_multi, "ensure_adb_connected", lambda device_id: True)
+    monkeypatch.setattr(engine_intro_multi, "acquire_driver", lambda *args, **kwargs: object())
+    monkeypatch.setattr(engine_intro_multi, "release_driver", lambda driver: None)
+    monkeypatch.setattr(engine_intro_multi, "unlock_screen_if_needed", lambda driver: None)
+    monkeypatch.setattr(engine_intro_multi, "pre_platform_setup", lambda *args: None)
+    monkeypatch.setattr(engine_intro_multi, "post_intro", lambda *args: posted.append("intro") or 0)
+    monkeypatch.setattr(engine_intro_multi, "post_multi",
+                        lambda *args, **kwargs: posted.append("multi") or multi_rc.pop(0))
+
+    profile = {"profile_name": "S23_WA", "device_id": DEVICE}
+    for _ in range(2):
+        # Chaque passage = un nouveau runner : seule la progression sur disque survit
+        progress = steps.load_progress(DEVICE, JOB)
+        engine_intro_multi.run(profile, "Intro", "Multi", 3, platform="WhatsApp",
+                               skip_intro="intro" in progress, progress=progress, job_key=JOB)
+
+    assert posted == ["intro", "multi", "multi"]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Reprise d'un flow après un échec du bouton Share (rc 7) :
+- run_steps ne rejoue que le tap Share (checkpoint relu sur disque) ;
+- engine_multi.run reprend la session sans nettoyer l'écran ni refaire
+  pre_platform_setup, et seulement pour le même profil / la même plateforme.
+"""
+import pytest
+
+from engine import engine_multi, steps
+
+DEVICE = "192.168.10.56:5555"
+
+
+def _gallery_flow(screen, calls):
+    """Flow multi simplifié : chaque étape modifie l'écran simulé."""
+    def step(name, view, rc=0):
+        def run(ctx):
+            calls.append(name)
+            if rc == 0:
+                screen["view"] = view
+            return rc
+        return run
+
+    def share(ctx):
+        calls.append("share")
+        if not screen["share_ok"]:
+            return 7
+        screen["view"] = "share_sheet"
+        return 0
+
+    return [
+        {"name": "gallery", "run": step("gallery", "tabs"), "check": lambda ctx: screen["view"] == "tabs"},
+        {"name": "album", "run": step("album", "album"), "check": lambda ctx: screen["view"] == "album"},
+        {"name": "select", "run": step("select", "selected"), "check": lambda ctx: screen["view"] == "selected"},
+        {"name": "share", "run": share, "check": lambda ctx: screen["view"] == "share_sheet"},
+    ]
+
+
+def test_retry_after_share_failure_only_retaps_share(checkpoints):
+    screen = {"view": None, "share_ok": False}
+    calls = []
+    key = "multi|S23_WA|WhatsApp|Album|3"
+
+    assert steps.run_steps(DEVICE, key, _gallery_flow(screen, calls)) == 7
+    assert calls == ["gallery", "album", "select", "share"]
+    assert steps.resumable(DEVICE, key)
+
+    # Relance (même process ou job remis en file) : la sélection est toujours à l'écran
+    calls.clear()
+    screen["share_ok"] = True
+    assert steps.run_steps(DEVICE, key, _gallery_flow(screen, calls)) == 0
+    assert calls == ["share"]
+
+    steps.clear(DEVICE)
+    assert not list(checkpoints.iterdir())
+
+
+@pytest.fixture
+def engine_calls(monkeypatch):
+    calls = {"resume": [], "platform_setup": 0}
+
+    def acquire(device_id, plat_ver=None, profile=None, resume=False):
+        calls["resume"].append(resume)
+        return object()
+
+    def setup(driver, platform, opts):
+        calls["platform_setup"] += 1
+
+    monkeypatch.setattr(engine_multi, "ensure_adb_connected", lambda device_id: True)
+    monkeypatch.setattr(engine_multi, "acquire_driver", acquire)
+    monkeypatch.setattr(engine_multi, "release_driver", lambda driver: None)
+    monkeypatch.setattr(engine_multi, "unlock_screen_if_needed", lambda driver: None)
+    monkeypatch.setattr(engine_multi, "pre_platform_setup", setup)
+    monkeypatch.setattr(engine_multi, "post_multi", lambda *args, **kwargs: 0)
+    return calls
+
+
+def test_run_resumes_without_cleanup_or_platform_setup(engine_calls):
+    profile = {"profile_name": "S23_FB_CM", "device_id": DEVICE}
+    key = engine_multi.flow_key(profile, "Facebook", "Album", 3)
+    steps._save(DEVICE, key, ["gallery", "album", "select"])
+
+    assert engine_multi.run(profile, "Album", 3, platform="Facebook").rc == 0
+    assert engine_calls == {"resume": [True], "platform_setup": 0}
+
+
+def test_other_profile_does_not_resume(engine_calls):
+    previous = {"profile_name": "S23_IG", "device_id": DEVICE}
+    steps._save(DEVICE, engine_multi.flow_key(previous, "Instagram", "Album", 3),
+                ["gallery", "album", "select"])
+
+    profile = {"profile_name": "S23_FB_CM", "device_id": DEVICE}
+    assert engine_multi.run(profile, "Album", 3, platform="Facebook").rc == 0
+    # Autre compte : écran nettoyé et page Facebook sélectionnée
+    assert engine_calls == {"resume": [False], "platform_setup": 1}
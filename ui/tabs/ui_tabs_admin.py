@@ -145,6 +145,9 @@ def build_profiles_tab():
         sg.Text("offset"),
         sg.Input(key="-P_OFFSET-", size=(4, 1)),
         sg.Checkbox("Actif", key="-P_ENABLED-", default=True),
+        sg.Checkbox("Multi via MediaStore", key="-P_MEDIASTORE-", default=False,
+                    tooltip="1 média : requête MediaStore + intent SEND direct (sans la Galerie) ; "
+                            "plusieurs médias et échecs : flow Galerie"),
 
         sg.Button("Add / Update", key="-P_SAVE-"),
         sg.Button("Supprimer", key="-P_DEL-"),
@@ -464,6 +467,7 @@ def build_albums_tab():
         "engine_full",
         "intro_album",
         "profiles",
+        "drift",
     ]
 
 
@@ -511,6 +515,9 @@ def build_albums_tab():
             sg.Button("Supprimer", key="-ALB_DEL-"),
             sg.Button("Sync counts -> Matrix", key="-ALB_SYNC-"),
             sg.Button("Sync -> profils", key="-ALB_PUSH_ALL-"),
+            sg.Button("Scanner téléphones", key="-ALB_SCAN-",
+                      tooltip="Compte les médias de chaque album sur les téléphones (MediaStore) "
+                              "et met à jour album_size"),
         ],
 
         # Ligne 3 : sélection multi-profils + system
@@ -557,7 +564,9 @@ def build_albums_tab():
 
 def refresh_albums_table(win, albums_dict):
     import math
+    from ui.ui_album_inventory import drift_for, load_inventory
 
+    inventory = load_inventory()
     data = []
     names = sorted(albums_dict.keys())
     for name in names:
@@ -580,6 +589,7 @@ def refresh_albums_table(win, albums_dict):
             cfg.get("engine_full", ""),
             cfg.get("intro_album", ""),
             profiles_str,
+            drift_for(name, size, inventory),
         ])
 
     # Rafraîchir la table + combo name
@@ -13,6 +13,8 @@ def build_locators_tab():
     - Clé : type de locator (share_entry, my_status, send_button)
     - Champ Multiline pour saisir l'XPath
     - Boutons Charger / Enregistrer (gérés dans app.py)
+    - Cache des sélecteurs gagnants (selector_cache.json) : afficher / vider
+      pour la plateforme + le profil choisis
     """
     profiles = load_profiles_dict()
     profile_names = ["default"] + sorted(profiles.keys())
@@ -67,6 +69,21 @@ def build_locators_tab():
             sg.Button("Charger", key="-LOC_LOAD-"),
             sg.Button("Enregistrer", key="-LOC_SAVE-"),
         ],
+        [sg.HorizontalSeparator()],
+        [sg.Text("Cache des sélecteurs gagnants (selector_cache.json)")],
+        [
+            sg.Multiline(
+                "",
+                size=(80, 10),
+                key="-LOC_CACHE_VIEW-",
+                disabled=True,
+                autoscroll=False,
+            )
+        ],
+        [
+            sg.Button("Afficher le cache", key="-LOC_CACHE_SHOW-"),
+            sg.Button("Vider (plateforme / profil)", key="-LOC_CACHE_CLEAR-"),
+        ],
     ]
 
     return layout
@@ -0,0 +1,383 @@
+# ui/ui_adb_client.py
+# -*- coding: utf-8 -*-
+"""
+Client ADB natif (protocole "smart socket" du serveur ADB, sans adb.exe).
+
+Au lieu de lancer adb.exe (≈100 ms de démarrage de processus par appel),
+on parle directement au serveur ADB StoryFX (127.0.0.1:5038) :
+
+    ✔ host:devices / host:track-devices   → liste des devices
+    ✔ host:transport:<id> + shell,v2:     → shell avec code retour
+      (repli shell: v1 si le téléphone ne gère pas shell_v2)
+    ✔ host:transport:<id> + exec-out:     → sortie binaire brute
+    ✔ host:connect / host:disconnect / host-serial:<id>:get-state
+
+Connexions :
+    - chaque service "transport" consomme sa socket (c'est le protocole ADB),
+      on en ouvre une par commande (connexion locale = quelques ms)
+    - une connexion persistante host:track-devices tient à jour la liste
+      des devices en mémoire → devices() ne fait plus AUCUN aller-retour
+
+parse_adb_command() / run_adb_command() permettent à adb_run() de passer
+par ce client pour les commandes courantes, avec repli subprocess sinon.
+"""
+import shlex
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5038
+DEFAULT_TIMEOUT = 10.0
+SHELL_TIMEOUT = 60.0
+
+
+class AdbError(Exception):
+    """Réponse FAIL du serveur ADB (message = raison renvoyée)."""
+
+
+class AdbUnavailable(AdbError):
+    """Serveur ADB injoignable (pas démarré) → l'appelant repasse par adb.exe."""
+
+
+class _NoShellV2(AdbError):
+    """Le téléphone refuse shell,v2 → repli sur shell: (v1)."""
+
+
+# ==========================================================================
+# 🔌 Bas niveau : une socket = un service
+# ==========================================================================
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise AdbError("connexion fermée par le serveur ADB")
+        buf += chunk
+    return buf
+
+
+def _recv_all(sock: socket.socket) -> bytes:
+    parts = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        parts.append(chunk)
+    return b"".join(parts)
+
+
+def _send_request(sock: socket.socket, request: str) -> None:
+    data = request.encode("utf-8")
+    sock.sendall(b"%04x" % len(data) + data)
+    status = _recv_exact(sock, 4)
+    if status == b"OKAY":
+        return
+    if status == b"FAIL":
+        raise AdbError(_read_length_prefixed(sock).decode("utf-8", "replace"))
+    raise AdbError(f"réponse ADB inattendue : {status!r}")
+
+
+def _read_length_prefixed(sock: socket.socket) -> bytes:
+    length = int(_recv_exact(sock, 4), 16)
+    return _recv_exact(sock, length) if length else b""
+
+
+def parse_devices(text: str) -> List[Tuple[str, str]]:
+    """'serial\\tstate' par ligne → [(serial, state)]."""
+    out = []
+    for line in text.splitlines():
+        parts = line.strip().split()
+        if len(parts) >= 2:
+            out.append((parts[0], parts[1]))
+    return out
+
+
+class AdbClient:
+    """Client du serveur ADB (un par port : 5038 StoryFX, 5037 SDK)."""
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+        self._track_lock = threading.Lock()
+        self._track_thread: Optional[threading.Thread] = None
+        self._track_devices: Optional[List[Tuple[str, str]]] = None
+        self._track_ready = threading.Event()
+
+    # ------------------------------------------------------------------ #
+    # Connexion
+    # ------------------------------------------------------------------ #
+    def _open(self, timeout: Optional[float] = None) -> socket.socket:
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=timeout or self.timeout)
+        except OSError as e:
+            raise AdbUnavailable(f"serveur ADB {self.host}:{self.port} injoignable : {e}") from e
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _host_query(self, request: str) -> str:
+        sock = self._open()
+        try:
+            _send_request(sock, request)
+            return _read_length_prefixed(sock).decode("utf-8", "replace")
+        finally:
+            sock.close()
+
+    def _transport(self, serial: Optional[str], timeout: Optional[float] = None) -> socket.socket:
+        sock = self._open(timeout)
+        try:
+            _send_request(sock, f"host:transport:{serial}" if serial else "host:transport-any")
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def available(self) -> bool:
+        try:
+            self._host_query("host:version")
+            return True
+        except AdbError:
+            return False
+
+    # ------------------------------------------------------------------ #
+    # Services host:
+    # ------------------------------------------------------------------ #
+    def devices(self, fresh: bool = False) -> List[Tuple[str, str]]:
+        """
+        [(serial, state)] — servi depuis host:track-devices (0 aller-retour)
+        dès que le suivi tourne ; sinon requête host:devices directe.
+        """
+        if not fresh:
+            self._start_tracker()
+            with self._track_lock:
+                if self._track_devices is not None:
+                    return list(self._track_devices)
+        return parse_devices(self._host_query("host:devices"))
+
+    def get_state(self, serial: str) -> str:
+        try:
+            sock = self._open()
+            try:
+                _send_request(sock, f"host-serial:{serial}:get-state")
+                return _read_length_prefixed(sock).decode("utf-8", "replace").strip()
+            finally:
+                sock.close()
+        except AdbUnavailable:
+            raise
+        except AdbError:
+            return ""
+
+    def connect(self, address: str) -> str:
+        return self._host_query(f"host:connect:{address}").strip()
+
+    def disconnect(self, address: Optional[str] = None) -> str:
+        return self._host_query(f"host:disconnect:{address or ''}").strip()
+
+    # ------------------------------------------------------------------ #
+    # Services device
+    # ------------------------------------------------------------------ #
+    def shell(self, serial: Optional[str], command: str,
+              timeout: Optional[float] = None) -> Tuple[int, str]:
+        """Exécute une commande shell → (code retour, stdout+stderr)."""
+        timeout = timeout or SHELL_TIMEOUT
+        try:
+            return self._shell_v2(serial, command, timeout)
+        except _NoShellV2:
+            return self._shell_v1(serial, command, timeout)
+
+    def exec_out(self, serial: Optional[str], command: str,
+                 timeout: Optional[float] = None) -> bytes:
+        """Sortie binaire brute (screencap -p, cat, ...)."""
+        sock = self._transport(serial, timeout or SHELL_TIMEOUT)
+        try:
+            _send_request(sock, f"exec:{command}")
+            return _recv_all(sock)
+        finally:
+            sock.close()
+
+    def _shell_v1(self, serial: Optional[str], command: str,
+                  timeout: Optional[float]) -> Tuple[int, str]:
+        sock = self._transport(serial, timeout)
+        try:
+            _send_request(sock, f"shell:{command}")
+            out = _recv_all(sock).decode("utf-8", "replace")
+        finally:
+            sock.close()
+        return 0, out
+
+    def _shell_v2(self, serial: Optional[str], command: str,
+                  timeout: Optional[float]) -> Tuple[int, str]:
+        sock = self._transport(serial, timeout)
+        try:
+            try:
+                _send_request(sock, f"shell,v2,raw:{command}")
+            except AdbError as e:
+                raise _NoShellV2(str(e)) from e
+            chunks: List[bytes] = []
+            rc = 0
+            while True:
+                header = sock.recv(5)
+                if not header:
+                    break
+                if len(header) < 5:
+                    header += _recv_exact(sock, 5 - len(header))
+                kind, length = struct.unpack("<BI", header)
+                payload = _recv_exact(sock, length) if length else b""
+                if kind in (1, 2):       # stdout / stderr
+                    chunks.append(payload)
+                elif kind == 3:          # exit
+                    rc = payload[0] if payload else 0
+                    break
+        finally:
+            sock.close()
+        return rc, b"".join(chunks).decode("utf-8", "replace")
+
+    # ------------------------------------------------------------------ #
+    # host:track-devices (connexion persistante)
+    # ------------------------------------------------------------------ #
+    def _start_tracker(self) -> None:
+        with self._track_lock:
+            if self._track_thread is not None and self._track_thread.is_alive():
+                return
+            self._track_ready.clear()
+            self._track_thread = threading.Thread(
+                target=self._track_loop, name=f"adb-track-{self.port}", daemon=True,
+            )
+            self._track_thread.start()
+        # On laisse une chance au premier état d'arriver (quelques ms)
+        self._track_ready.wait(0.2)
+
+    def _track_loop(self) -> None:
+        failures = 0
+        while failures < 5:
+            try:
+                sock = self._open()
+                try:
+                    _send_request(sock, "host:track-devices")
+                    sock.settimeout(None)   # flux : on attend les changements sans limite
+                    failures = 0
+                    while True:
+                        text = _read_length_prefixed(sock).decode("utf-8", "replace")
+                        with self._track_lock:
+                            self._track_devices = parse_devices(text)
+                        self._track_ready.set()
+                finally:
+                    sock.close()
+            except Exception:
+                failures += 1
+                with self._track_lock:
+                    self._track_devices = None
+                time.sleep(min(2.0 * failures, 10.0))
+        # Trop d'échecs : le prochain devices() relancera un suivi
+
+
+# ==========================================================================
+# 🔁 Clients partagés + traduction des lignes de commande "adb ..."
+# ==========================================================================
+_CLIENTS: Dict[int, AdbClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_adb_client(port: int = DEFAULT_PORT) -> AdbClient:
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(port)
+        if client is None:
+            client = _CLIENTS[port] = AdbClient(port=port)
+        return client
+
+
+def parse_adb_command(cmd: str) -> Optional[Tuple[str, Optional[str], List[str]]]:
+    """
+    "adb [-s X] <verbe> args..." → (verbe, serial, args)
+    None si la commande n'est pas gérée nativement (repli adb.exe).
+    """
+    try:
+        parts = shlex.split(cmd.strip())
+    except ValueError:
+        return None
+    if not parts or parts[0].lower() not in ("adb", "adb.exe"):
+        return None
+    parts = parts[1:]
+
+    serial = None
+    if len(parts) >= 2 and parts[0] == "-s":
+        serial, parts = parts[1], parts[2:]
+    if not parts:
+        return None
+
+    verb, args = parts[0], parts[1:]
+    if verb == "devices" and not args:
+        return verb, serial, args
+    if verb in ("shell", "exec-out") and args and not args[0].startswith("-"):
+        return verb, serial, args
+    if verb == "get-state" and serial and not args:
+        return verb, serial, args
+    if verb in ("connect", "disconnect") and len(args) <= 1 and not serial:
+        if verb == "connect" and not args:
+            return None
+        return verb, serial, args
+    return None
+
+
+def _shell_command(cmd: str, serial: Optional[str], args: List[str]) -> str:
+    """
+    Commande à passer au shell du téléphone pour "adb shell ..." :
+    - 1 seul argument ("adb shell \"dumpsys x | grep y\"") → son contenu,
+      comme adb.exe qui reçoit l'argument sans ses guillemets ;
+    - sinon le reste de la ligne TEL QUEL, guillemets compris, pour que
+      `--where "name='x'"` ou les extras de `am start` arrivent intacts.
+    """
+    if len(args) == 1:
+        return args[0]
+    lex = shlex.shlex(cmd.strip(), posix=True)
+    lex.whitespace_split = True
+    lex.commenters = ""
+    for _ in range(4 if serial else 2):   # adb [-s X] verbe
+        if lex.get_token() is None:
+            return shlex.join(args)
+    return lex.instream.read().strip()
+
+
+def run_adb_command(cmd: str, port: int = DEFAULT_PORT) -> Optional[Tuple[int, str]]:
+    """
+    Exécute "adb ..." via le protocole natif.
+    Retourne (code, sortie) au format adb.exe, ou None → repli subprocess.
+    """
+    parsed = parse_adb_command(cmd)
+    if parsed is None:
+        return None
+    verb, serial, args = parsed
+    client = get_adb_client(port)
+
+    try:
+        if verb == "devices":
+            rows = client.devices()
+            body = "".join(f"{s}\t{st}\n" for s, st in rows)
+            return 0, "List of devices attached\n" + body + "\n"
+        if verb == "shell":
+            return client.shell(serial, _shell_command(cmd, serial, args))
+        if verb == "exec-out":
+            return 0, client.exec_out(serial, _shell_command(cmd, serial, args)).decode("utf-8", "replace")
+        if verb == "get-state":
+            state = client.get_state(serial)
+            return (0, state + "\n") if state else (1, f"error: device '{serial}' not found\n")
+        if verb == "connect":
+            msg = client.connect(args[0])
+            # "failed to connect to ..." / "cannot connect" ne sont PAS des succès
+            ok = msg.strip().startswith(("connected to", "already connected to"))
+            return (0 if ok else 1), msg + "\n"
+        if verb == "disconnect":
+            return 0, client.disconnect(args[0] if args else None) + "\n"
+    except AdbUnavailable:
+        return None
+    except AdbError as e:
+        return 1, f"error: {e}\n"
+    except OSError as e:
+        # Commande peut-être déjà partie → surtout pas de 2e exécution via adb.exe
+        return 1, f"error: {e}\n"
+    return None
@@ -0,0 +1,206 @@
+# ui/ui_adb_connections.py
+# -*- coding: utf-8 -*-
+"""
+Gestionnaire de connexions ADB Wi-Fi (serveur StoryFX 5038).
+
+Remplace l'ancien "adb disconnect (TOUS) + adb connect <cible>" :
+    ✔ on ne touche QUE le téléphone du job
+    ✔ `adb -s <id> get-state` d'abord → rien à faire si "device"
+    ✔ sinon disconnect <id> (si offline) + connect <id>, puis on attend
+      l'état "device" (polling court au lieu d'un sleep fixe)
+    ✔ verrou par téléphone, partagé entre threads ET processus
+      (scheduler, workers, runner.py lancés en parallèle)
+    ✔ ensure_fleet_connected() : garde toute la flotte connectée
+
+Utilisé par engine.core.ensure_adb_connected et ui_runner.connect_profile_device.
+"""
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+from ui.ui_adb_client import run_adb_command
+from ui.ui_paths_helpers import ADB_PATH, ADB_ENV
+
+# Délais (secondes)
+GET_STATE_TIMEOUT = 5.0
+CONNECT_TIMEOUT = 8.0
+READY_WAIT = 3.0          # attente max de l'état "device" après connect
+READY_POLL = 0.25
+
+LOCK_DIR = Path(tempfile.gettempdir()) / "storyfx_adb_locks"
+
+
+# ==========================================================================
+# 🔒 Verrou par téléphone (threads + processus)
+# ==========================================================================
+_THREAD_LOCKS: Dict[str, threading.Lock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+def _lock_file_name(device_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", device_id) + ".lock"
+
+
+class DeviceLock:
+    """
+    with DeviceLock("192.168.1.10:5555"):
+        ...  # un seul connect / disconnect à la fois pour ce téléphone
+    """
+
+    def __init__(self, device_id: str, timeout: float = 30.0):
+        self.device_id = device_id
+        self.timeout = timeout
+        with _THREAD_LOCKS_GUARD:
+            self._tlock = _THREAD_LOCKS.setdefault(device_id, threading.Lock())
+        self._fh = None
+
+    def __enter__(self):
+        self._tlock.acquire()
+        try:
+            self._acquire_file()
+        except Exception:
+            # Pas de verrou fichier possible → on garde au moins le verrou thread
+            self._fh = None
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self._release_file()
+        finally:
+            self._tlock.release()
+        return False
+
+    def _acquire_file(self) -> None:
+        LOCK_DIR.mkdir(parents=True, exist_ok=True)
+        fh = open(LOCK_DIR / _lock_file_name(self.device_id), "a+b")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if os.name == "nt":
+                    import msvcrt
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    import fcntl
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._fh = fh
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    fh.close()
+                    raise TimeoutError(f"verrou ADB {self.device_id} occupé")
+                time.sleep(0.1)
+
+    def _release_file(self) -> None:
+        fh, self._fh = self._fh, None
+        if fh is None:
+            return
+        try:
+            if os.name == "nt":
+                import msvcrt
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+        finally:
+            fh.close()
+
+
+# ==========================================================================
+# 🔥 Commandes ADB ciblées
+# ==========================================================================
+def _adb(args, timeout: float) -> tuple[int, str]:
+    # Protocole natif (get-state / connect / disconnect) → quelques ms
+    native = run_adb_command("adb " + " ".join(args), port=int(ADB_ENV["ANDROID_ADB_SERVER_PORT"]))
+    if native is not None:
+        code, out = native
+        return code, (out or "").strip()
+
+    try:
+        proc = subprocess.run(
+            [ADB_PATH, *args],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            env=ADB_ENV,
+            timeout=timeout,
+        )
+        return proc.returncode, (proc.stdout or "").strip()
+    except subprocess.TimeoutExpired:
+        return 1, "timeout"
+    except Exception as e:
+        return 1, str(e)
+
+
+def adb_get_state(device_id: str) -> str:
+    """'device' / 'offline' / 'unauthorized' / '' (inconnu ou absent)."""
+    code, out = _adb(["-s", device_id, "get-state"], GET_STATE_TIMEOUT)
+    if code != 0:
+        return ""
+    return out.splitlines()[-1].strip() if out else ""
+
+
+def _wait_ready(device_id: str, timeout: float = READY_WAIT) -> str:
+    deadline = time.monotonic() + timeout
+    state = adb_get_state(device_id)
+    while state != "device" and time.monotonic() < deadline:
+        time.sleep(READY_POLL)
+        state = adb_get_state(device_id)
+    return state
+
+
+def ensure_device_connected(device_id: str, log: Optional[Callable[[str], None]] = None) -> bool:
+    """
+    Garantit que device_id (ip:port) est en état "device" SANS toucher
+    aux autres téléphones. Retourne True si prêt.
+    """
+    log = log or (lambda msg: None)
+    device_id = (device_id or "").strip()
+    if not device_id:
+        return False
+
+    with DeviceLock(device_id):
+        state = adb_get_state(device_id)
+        if state == "device":
+            log(f"ADB déjà connecté : {device_id}")
+            return True
+
+        if ":" not in device_id:
+            # Serial USB : pas de connect possible
+            log(f"Device USB '{device_id}' état='{state or 'absent'}'.")
+            return False
+
+        # Transport cassé → on ne nettoie QUE ce téléphone
+        if state in ("offline", "unauthorized"):
+            log(f"ADB {device_id} état '{state}' → disconnect ciblé.")
+            _adb(["disconnect", device_id], CONNECT_TIMEOUT)
+
+        code, out = _adb(["connect", device_id], CONNECT_TIMEOUT)
+        log(out or f"adb connect {device_id} (code={code})")
+
+        state = _wait_ready(device_id)
+        if state == "device":
+            log(f"ADB connection OK sur {device_id}")
+            return True
+
+        log(f"[WARN] ADB device {device_id} non prêt (état='{state or 'absent'}').")
+        return False
+
+
+def ensure_fleet_connected(device_ids: Iterable[str],
+                           log: Optional[Callable[[str], None]] = None,
+                           max_workers: int = 8) -> Dict[str, bool]:
+    """Connecte (en parallèle) tous les téléphones Wi-Fi de la flotte."""
+    ids = sorted({(d or "").strip() for d in device_ids if d and ":" in d})
+    if not ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ids))) as ex:
+        results = list(ex.map(lambda d: ensure_device_connected(d, log), ids))
+    return dict(zip(ids, results))
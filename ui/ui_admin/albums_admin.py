@@ -11,6 +11,7 @@ from ui.ui_paths_helpers import (
     INTRO_ALBUM_CHOICES,
     MULTI_ALBUM_CHOICES,
 )
+from ui.ui_album_inventory import enabled_device_ids, reconcile, scan_devices, write_album_sizes
 from ui.tabs.ui_tabs_admin import (
     refresh_albums_table,
     refresh_matrix_table,
@@ -26,6 +27,7 @@ def handle_albums_events(ev, vals, win, albums_dict, matrix_rows, profiles):
         -ALB_SAVE-
         -ALB_DEL-
         -ALB_SYNC-
+        -ALB_SCAN-
 
     Aucun widget n’est créé ici : seulement de la logique.
     """
@@ -429,6 +431,36 @@ def handle_albums_events(ev, vals, win, albums_dict, matrix_rows, profiles):
         sg.popup("Synchronisation Matrix OK.")
         return True
 
+    # ======================================================================
+    # 🔥 7) Inventaire MediaStore des téléphones → album_size
+    # ======================================================================
+    if ev == "-ALB_SCAN-":
+        device_ids = enabled_device_ids(profiles)
+        if not device_ids:
+            sg.popup_error("Aucun profil actif avec device_id.")
+            return True
+
+        inventory = scan_devices(device_ids)
+        changes = reconcile(albums_dict, inventory)
+
+        if changes:
+            write_album_sizes(changes)
+            changed = {name: new for name, _, new in changes}
+            for r in matrix_rows:
+                if r.get("album2") in changed:
+                    r["album_size"] = changed[r["album2"]]
+            save_json(MATRIX, {"rows": matrix_rows})
+            refresh_matrix_table(win, matrix_rows)
+
+        refresh_albums_table(win, albums_dict)
+
+        lines = [f"{len(inventory)} téléphone(s) inventorié(s)."]
+        lines += [f"{name} : {old} → {new}" for name, old, new in changes]
+        if not changes:
+            lines.append("albums.json déjà à jour.")
+        sg.popup("\n".join(lines))
+        return True
+
     # ======================================================================
     # Aucun event Albums
     # ======================================================================
@@ -2,7 +2,42 @@
 # -*- coding: utf-8 -*-
 
 import PySimpleGUI as sg
-from ui.ui_paths_helpers import load_locators_dict, save_locators_dict
+from ui.ui_paths_helpers import (
+    load_locators_dict,
+    save_locators_dict,
+    load_selector_cache_dict,
+    save_selector_cache_dict,
+)
+
+def _cache_entries_for(vals):
+    """
+    Entrées du cache pour la plateforme choisie (+ étapes Galerie communes)
+    et le profil choisi ('default' = tous les profils).
+    """
+    platform = vals.get("-LOC_PLATFORM-") or ""
+    profile  = vals.get("-LOC_PROFILE-") or "default"
+    out = {}
+    for key, entry in load_selector_cache_dict().items():
+        if platform and entry.get("platform") not in (platform, "Gallery"):
+            continue
+        if profile != "default" and entry.get("profile") != profile:
+            continue
+        out[key] = entry
+    return out
+
+
+def _format_cache(entries):
+    if not entries:
+        return "(cache vide pour ce filtre)"
+    lines = []
+    for _, e in sorted(entries.items()):
+        lines.append(
+            f"{e.get('profile')} | {e.get('platform')} | {e.get('step')} | "
+            f"v{e.get('version_code')} | {e.get('duration_s')}s | "
+            f"hits={e.get('hits')} | {e.get('updated_at')}"
+        )
+        lines.append(f"    {e.get('selector')}")
+    return "\n".join(lines)
 
 
 def handle_locators_events(ev, vals, win):
@@ -11,6 +46,8 @@ def handle_locators_events(ev, vals, win):
 
         -LOC_LOAD-
         -LOC_SAVE-
+        -LOC_CACHE_SHOW-   (selector_cache.json)
+        -LOC_CACHE_CLEAR-
 
     ⚠ Ne crée aucun widget.
     ⚠ Ne fait que de la logique sur locators.json.
@@ -65,6 +102,27 @@ def handle_locators_events(ev, vals, win):
         sg.popup("Locator enregistré.")
         return True
 
+    # ======================================================================
+    # 🔥 3) Cache des sélecteurs gagnants (-LOC_CACHE_SHOW- / -LOC_CACHE_CLEAR-)
+    # ======================================================================
+    if ev == "-LOC_CACHE_SHOW-":
+        win["-LOC_CACHE_VIEW-"].update(_format_cache(_cache_entries_for(vals)))
+        return True
+
+    if ev == "-LOC_CACHE_CLEAR-":
+        selected = _cache_entries_for(vals)
+        if not selected:
+            sg.popup("Rien à vider pour ce filtre.")
+            return True
+        if sg.popup_yes_no(f"Supprimer {len(selected)} entrée(s) du cache ?") != "Yes":
+            return True
+        entries = load_selector_cache_dict()
+        for key in selected:
+            entries.pop(key, None)
+        save_selector_cache_dict(entries)
+        win["-LOC_CACHE_VIEW-"].update(_format_cache(_cache_entries_for(vals)))
+        return True
+
     # ======================================================================
     # Pas un event Locators
     # ======================================================================
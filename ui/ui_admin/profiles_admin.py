@@ -65,6 +65,7 @@ def handle_profiles_events(ev, vals, win, profiles, matrix_rows):
         win["-P_PVER-"].update(cfg.get("platform_version", ""))
         win["-P_OFFSET-"].update(str(cfg.get("offset_minutes", 0)))
         win["-P_ENABLED-"].update(bool(cfg.get("enabled", True)))
+        win["-P_MEDIASTORE-"].update(cfg.get("media_source") == "mediastore")
 
         # ✅ appium_overrides affiché en JSON dans l'UI
         app_ov = cfg.get("appium_overrides", {})
@@ -146,6 +147,12 @@ def handle_profiles_events(ev, vals, win, profiles, matrix_rows):
         # ✅ enabled
         cfg["enabled"] = bool(vals.get("-P_ENABLED-", True))
 
+        # ✅ 1 média sans Galerie (MediaStore + intent SEND)
+        if vals.get("-P_MEDIASTORE-"):
+            cfg["media_source"] = "mediastore"
+        else:
+            cfg.pop("media_source", None)
+
         # Champs standard
         device_id = (vals.get("-P_DEVICE-") or "").strip()
         adb_serial = (vals.get("-P_ADB_SERIAL-") or "").strip()
@@ -315,6 +322,7 @@ def handle_profiles_events(ev, vals, win, profiles, matrix_rows):
         win["-P_PVER-"].update("")
         win["-P_OFFSET-"].update("0")
         win["-P_ENABLED-"].update(True)
+        win["-P_MEDIASTORE-"].update(False)
         win["-P_APPIUM_OVERRIDES-"].update("")
         win["-P_GALLERY_PKG-"].update("")
         win["-P_GALLERY_ACT-"].update("")
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Inventaire des albums des téléphones (MediaStore)
+-------------------------------------------------
+Remplace la saisie manuelle de `album_size` dans albums.json :
+
+    ✔ 1 seule `content query` par téléphone (tous les buckets d'un coup,
+      agrégés en local) → < 1 s même avec des milliers de médias
+    ✔ tous les téléphones scannés en parallèle
+    ✔ cache par téléphone dans config/album_inventory.json :
+        {device_id: {"scanned_at": "...", "albums": {name: {count, images,
+                     videos, last_modified}}}}
+    ✔ reconcile() : album_size = plus petit nombre trouvé sur les
+      téléphones qui ont l'album (la sélection doit tenir partout)
+    ✔ drift_for() : écart albums.json ↔ téléphones, affiché dans l'onglet Albums
+
+Job autonome (planifiable) :
+    python -m ui.ui_album_inventory
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from ui.ui_mediastore import (
+    FILES_URI,
+    MEDIA_TYPE_IMAGE,
+    MEDIA_TYPE_VIDEO,
+    content_query,
+)
+from ui.ui_paths_helpers import (
+    ALBUM_INVENTORY,
+    ALBUMS,
+    load_albums_dict,
+    load_json,
+    load_profiles_dict,
+    save_json_atomic,
+)
+
+_COLUMNS = ("bucket_display_name", "media_type", "date_modified")
+
+
+def scan_device(device_id: str) -> Dict[str, dict]:
+    """{album: {count, images, videos, last_modified}} pour un téléphone."""
+    rows = content_query(
+        device_id, FILES_URI, _COLUMNS,
+        where=f"media_type IN ({MEDIA_TYPE_IMAGE},{MEDIA_TYPE_VIDEO})",
+    )
+    albums: Dict[str, dict] = {}
+    for row in rows:
+        name = row.get("bucket_display_name")
+        if not name:
+            continue
+        a = albums.setdefault(name, {"count": 0, "images": 0, "videos": 0, "last_modified": 0})
+        a["count"] += 1
+        if row.get("media_type") == str(MEDIA_TYPE_VIDEO):
+            a["videos"] += 1
+        else:
+            a["images"] += 1
+        try:
+            a["last_modified"] = max(a["last_modified"], int(row.get("date_modified") or 0))
+        except ValueError:
+            pass
+    return albums
+
+
+def scan_devices(device_ids: Iterable[str], max_workers: int = 8) -> Dict[str, dict]:
+    """
+    Scanne les téléphones en parallèle et met à jour le cache.
+    Un téléphone injoignable (aucune ligne) garde son inventaire précédent.
+    """
+    ids = sorted({d for d in device_ids if d})
+    inventory = load_inventory()
+    if not ids:
+        return inventory
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ids))) as ex:
+        results = dict(zip(ids, ex.map(scan_device, ids)))
+
+    now = datetime.now().isoformat(timespec="seconds")
+    for device_id, albums in results.items():
+        if albums:
+            inventory[device_id] = {"scanned_at": now, "albums": albums}
+    try:
+        save_json_atomic(ALBUM_INVENTORY, inventory)
+    except Exception:
+        pass
+    return inventory
+
+
+def load_inventory() -> Dict[str, dict]:
+    return load_json(ALBUM_INVENTORY, {}) or {}
+
+
+def album_counts(inventory: Dict[str, dict], album: str) -> Dict[str, int]:
+    """{device_id: nb de médias} pour les téléphones qui ont l'album."""
+    out = {}
+    for device_id, entry in inventory.items():
+        a = (entry.get("albums") or {}).get(album)
+        if a:
+            out[device_id] = int(a.get("count", 0))
+    return out
+
+
+def reconcile(albums_dict: Dict[str, dict], inventory: Dict[str, dict]) -> List[Tuple[str, int, int]]:
+    """
+    Met à jour album_size (en place) d'après l'inventaire.
+    Retourne [(album, ancien, nouveau)] pour les albums modifiés.
+    """
+    changes = []
+    for name, cfg in albums_dict.items():
+        counts = album_counts(inventory, name)
+        if not counts:
+            continue
+        new_size = min(counts.values())
+        old_size = int(cfg.get("album_size", 0) or 0)
+        if new_size != old_size:
+            cfg["album_size"] = new_size
+            changes.append((name, old_size, new_size))
+    return changes
+
+
+def write_album_sizes(changes: List[Tuple[str, int, int]]) -> None:
+    """Patch de album_size dans albums.json (les autres champs des lignes sont conservés)."""
+    if not changes:
+        return
+    new_sizes = {name: new for name, _, new in changes}
+    data = load_json(ALBUMS, {"albums": []})
+    for row in data.get("albums", []):
+        if row.get("name") in new_sizes:
+            row["album_size"] = new_sizes[row["name"]]
+    save_json_atomic(ALBUMS, data)
+
+
+def enabled_device_ids(profiles: Dict[str, dict]) -> List[str]:
+    if isinstance(profiles, dict) and "profiles" in profiles:
+        profiles = profiles["profiles"]
+    return [
+        cfg.get("device_id") for cfg in (profiles or {}).values()
+        if cfg.get("enabled", True) and cfg.get("device_id")
+    ]
+
+
+def drift_for(album: str, album_size: int, inventory: Dict[str, dict]) -> str:
+    """Texte court pour la colonne 'drift' de l'onglet Albums."""
+    if not inventory:
+        return ""
+    counts = album_counts(inventory, album)
+    missing = len(inventory) - len(counts)
+    if not counts:
+        return "absent"
+    parts = []
+    lo, hi = min(counts.values()), max(counts.values())
+    if lo != hi:
+        parts.append(f"{lo}–{hi}")
+    elif lo != int(album_size or 0):
+        parts.append(f"tél. {lo}")
+    if missing:
+        parts.append(f"absent ×{missing}")
+    return " / ".join(parts) or "OK"
+
+
+def main() -> None:
+    inventory = scan_devices(enabled_device_ids(load_profiles_dict()))
+    albums = load_albums_dict()
+    changes = reconcile(albums, inventory)
+    write_album_sizes(changes)
+    print(f"{len(inventory)} téléphone(s) inventorié(s).")
+    for name, old, new in changes:
+        print(f"  {name} : {old} → {new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -37,6 +37,7 @@ from typing import Dict, Any, List, Tuple
 import re
 from subprocess import Popen, PIPE
 
+from ui.ui_adb_client import run_adb_command
 from ui.ui_paths_helpers import (
     adb_run,
     load_profiles_dict,
@@ -391,6 +392,11 @@ def adb_run_sdk(cmd: str):
     Exécute une commande ADB via le binaire Android Studio (serveur 5037).
     Utilisé pour tout ce qui touche l'USB (devices, ip route, tcpip).
     """
+    # Protocole natif sur le serveur 5037 (devices / shell ...), sinon adb.exe SDK
+    native = run_adb_command(cmd, port=5037)
+    if native is not None:
+        return native
+
     SDK_ADB = r"C:\Users\lilgu\AppData\Local\Android\Sdk\platform-tools\adb.exe"
     env = os.environ.copy()
     # on s'assure de parler au serveur par défaut (5037)
@@ -20,6 +20,8 @@ from pathlib import Path
 import os
 import re
 
+from ui.ui_adb_client import get_adb_client, run_adb_command, AdbError, AdbUnavailable
+
 
 # ==========================================================================
 # 🔥 1. CHEMINS PRINCIPAUX
@@ -40,6 +42,27 @@ UI_STATE = ROOT / "ui_state.json"
 # Locators (XPaths)
 LOCATORS = ROOT / "locators.json"
 
+# Cache des sélecteurs gagnants (écrit par engine.selector_cache)
+SELECTOR_CACHE = ROOT / "selector_cache.json"
+
+# Position des albums dans la grille Albums, par téléphone (engine.album_positions)
+ALBUM_POSITIONS = CONFIG / "album_positions.json"
+
+# Inventaire MediaStore des albums, par téléphone (ui.ui_album_inventory)
+ALBUM_INVENTORY = CONFIG / "album_inventory.json"
+
+# Cibles de partage directes (surcharge optionnelle de engine.share_intents)
+SHARE_TARGETS = CONFIG / "share_targets.json"
+
+# Page Facebook active, par téléphone (engine.fb_page_state)
+FB_PAGE_STATE = CONFIG / "fb_page_state.json"
+
+# Points de reprise des flows en étapes, 1 fichier par téléphone (engine.steps)
+STEP_CHECKPOINTS = CONFIG / "step_checkpoints"
+
+# Traces Chrome / Perfetto, 1 fichier par run (engine.tracing, STORYFX_TRACE=1)
+TRACES_DIR = ROOT / "traces"
+
 
 # ==========================================================================
 # 🔥 2. ADB CONFIGURATION
@@ -62,10 +85,16 @@ def strip_ansi(s: str) -> str:
 def adb_run(cmd: str, port: int | None = None):
     """
     Exécute une commande ADB :
-        - Remplace "adb" par ADB_PATH
+        - devices / shell / exec-out / get-state / connect / disconnect :
+          protocole natif du serveur ADB (ui_adb_client, sans adb.exe)
+        - sinon (ou serveur pas démarré) : Remplace "adb" par ADB_PATH
         - Force env sur le port (par défaut 5038)
         - Retourne (code, sortie)
     """
+    native = run_adb_command(cmd, port=int(port or ADB_ENV["ANDROID_ADB_SERVER_PORT"]))
+    if native is not None:
+        return native
+
     try:
         cmd = cmd.strip()
 
@@ -94,6 +123,36 @@ def adb_run(cmd: str, port: int | None = None):
     except Exception as e:
         return 1, str(e)
 
+def adb_shell(device_id: str, command: str, port: int | None = None) -> tuple[int, str]:
+    """
+    adb -s <device_id> shell <command> → (code, sortie).
+    Protocole natif d'abord, adb.exe (sans shell=True) en repli.
+    """
+    port = int(port or ADB_ENV["ANDROID_ADB_SERVER_PORT"])
+    try:
+        return get_adb_client(port).shell(device_id, command)
+    except AdbUnavailable:
+        pass
+    except AdbError as e:
+        return 1, f"error: {e}"
+    except OSError as e:
+        return 1, f"error: {e}"
+
+    env = os.environ.copy()
+    env["ANDROID_ADB_SERVER_PORT"] = str(port)
+    try:
+        proc = subprocess.run(
+            [ADB_PATH, "-s", device_id, "shell", command],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            env=env,
+        )
+        return proc.returncode, proc.stdout
+    except Exception as e:
+        return 1, str(e)
+
+
 # ==========================================================================
 # 🔥 3. JSON LOAD & SAVE HELPER
 # ==========================================================================
@@ -113,6 +172,13 @@ def save_json(path: Path, data):
         json.dump(data, f, ensure_ascii=False, indent=2)
 
 
+def save_json_atomic(path: Path, data):
+    """save_json via fichier temporaire + os.replace (fichiers partagés entre workers)."""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    save_json(tmp, data)
+    os.replace(tmp, path)
+
+
 # ==========================================================================
 # 🔥 4. ALBUMS (intro / multi)
 # ==========================================================================
@@ -191,6 +257,15 @@ def save_locators_dict(data: dict):
     save_json(LOCATORS, data)
 
 
+def load_selector_cache_dict():
+    return load_json(SELECTOR_CACHE, {"entries": {}}).get("entries", {})
+
+
+def save_selector_cache_dict(entries: dict):
+    """Écriture atomique : plusieurs workers lisent / écrivent ce fichier."""
+    save_json_atomic(SELECTOR_CACHE, {"entries": entries})
+
+
 # ==========================================================================
 # 🔥 7. PROFILS / SYSTEMS / MATRIX
 # ==========================================================================
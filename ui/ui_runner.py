@@ -41,6 +41,7 @@ from ui.ui_paths_helpers import (
 
 # 🔥 Fonction officielle (appelée dans TOUT StoryFX)
 from ui.ui_devices import ensure_appium_running
+from ui.ui_adb_connections import ensure_device_connected
 
 from scheduler import get_logical_minute
 
@@ -50,9 +51,8 @@ from scheduler import get_logical_minute
 # ==========================================================================
 def connect_profile_device(win, profile_cfg):
     """
-    Reproduit exactement la logique de app.py :
-        adb disconnect
-        adb connect <device_id>
+    Connecte le téléphone du profil SANS déconnecter les autres :
+        adb -s <device_id> get-state → adb connect <device_id> si besoin
     """
 
     device_id = (profile_cfg.get("device_id") or "").strip()
@@ -63,13 +63,7 @@ def connect_profile_device(win, profile_cfg):
 
     append_log(win, f"[Devices] Préparation du device {device_id}…")
 
-    # 1) vider les connexions ADB
-    adb_run("adb disconnect")
-
-    # 2) reconnecter
-    code, out = adb_run(f"adb connect {device_id}")
-    msg = out.strip() or f"adb connect {device_id} (code={code})"
-    append_log(win, msg)
+    ensure_device_connected(device_id, log=lambda msg: append_log(win, f"[Devices] {msg}"))
 
 
 # ==========================================================================
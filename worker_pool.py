@@ -0,0 +1,567 @@
+# -*- coding: utf-8 -*-
+"""
+StoryFX — pool de workers "chauds"
+----------------------------------
+Au lieu de relancer `python runner.py` (import appium / selenium / requests /
+psutil + lecture profiles.json) à chaque job, on garde N processus workers
+qui ont déjà tout importé.
+
+    python worker_pool.py serve [--workers N] [--max-jobs K]
+
+- Serveur local (multiprocessing.connection, 127.0.0.1:STORYFX_POOL_PORT)
+- Un job = descripteur {"argv": [...args runner.py...], "time": "HH:MM:SS",
+  "device": clé téléphone}
+- Les logs du job sont renvoyés ligne par ligne au client, puis un résultat
+  structuré : {"rc", "duration_s", "worker_pid", "jobs_done", "error", "result"}
+  ("result" = ligne JSON du job écrite par runner.py : étapes, durées, sélecteurs)
+- Un worker est recyclé après K jobs (STORYFX_POOL_MAX_JOBS) ou s'il plante
+- Affinité : on préfère le worker qui a servi le même téléphone en dernier
+- Job bloqué (appel Appium / ADB sans fin) : au-delà de STORYFX_POOL_JOB_TIMEOUT
+  (défaut 1800 s) le worker est tué et remplacé, le job rend un rc transitoire
+- Authentification : clé aléatoire (os.urandom) tirée à chaque lancement du
+  pool, écrite dans un fichier lisible par l'utilisateur seul (pool_key_file)
+  et relue par les clients ; STORYFX_POOL_KEY la fixe explicitement.
+  Le Listener dé-picke ce qu'il reçoit : jamais de clé connue d'avance.
+
+runner.py reste le client : s'il trouve le pool il lui confie le job,
+sinon il exécute l'engine lui-même (lanceur GUI inchangé).
+"""
+import argparse
+import atexit
+import binascii
+import io
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import retry_policy
+
+PROJECT_NAME = "StoryFX"
+BASE_DIR = Path(__file__).resolve().parent
+
+DEFAULT_POOL_PORT = 5039
+DEFAULT_MAX_JOBS = 20
+DEFAULT_JOB_TIMEOUT = 1800
+
+
+# ====================================================================== #
+# 🔧 Réglages (variables d'environnement)
+# ====================================================================== #
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def pool_address():
+    return ("127.0.0.1", _env_int("STORYFX_POOL_PORT", DEFAULT_POOL_PORT))
+
+
+def pool_key_file() -> Path:
+    """Fichier de la clé du pool, dans le profil de l'utilisateur (pas dans l'install)."""
+    if os.environ.get("STORYFX_POOL_KEY_FILE"):
+        return Path(os.environ["STORYFX_POOL_KEY_FILE"])
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(Path.home(), ".config")
+    return Path(base) / PROJECT_NAME / "pool.key"
+
+
+def pool_authkey() -> Optional[bytes]:
+    """Clé du pool en cours (STORYFX_POOL_KEY, sinon fichier écrit par serve), None si aucune."""
+    env_key = os.environ.get("STORYFX_POOL_KEY", "").strip()
+    if env_key:
+        return env_key.encode("utf-8")
+    try:
+        return binascii.unhexlify(pool_key_file().read_text(encoding="ascii").strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _publish_authkey() -> bytes:
+    """
+    Clé du pool qui démarre : STORYFX_POOL_KEY si fournie, sinon 32 octets
+    aléatoires écrits (0600) dans pool_key_file() pour les clients.
+    """
+    env_key = os.environ.get("STORYFX_POOL_KEY", "").strip()
+    if env_key:
+        return env_key.encode("utf-8")
+    key = os.urandom(32)
+    path = pool_key_file()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        path.unlink()   # recréé ci-dessous : les droits 0600 ne s'appliquent qu'à la création
+    except FileNotFoundError:
+        pass
+    fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="ascii") as f:
+        f.write(binascii.hexlify(key).decode("ascii"))
+    return key
+
+
+def _retract_authkey(key: bytes) -> None:
+    """Pool arrêté : supprime le fichier de clé s'il est toujours le nôtre."""
+    if os.environ.get("STORYFX_POOL_KEY", "").strip():
+        return
+    try:
+        path = pool_key_file()
+        if binascii.unhexlify(path.read_text(encoding="ascii").strip()) == key:
+            path.unlink()
+    except (OSError, ValueError):
+        pass
+
+
+def pool_workers() -> int:
+    """Nombre de workers (STORYFX_POOL_WORKERS, 0 = pool désactivé)."""
+    from scheduler_executor import get_max_parallel
+    return max(0, _env_int("STORYFX_POOL_WORKERS", get_max_parallel()))
+
+
+def pool_max_jobs() -> int:
+    return max(1, _env_int("STORYFX_POOL_MAX_JOBS", DEFAULT_MAX_JOBS))
+
+
+def pool_job_timeout() -> int:
+    """Durée max d'un job dans un worker (STORYFX_POOL_JOB_TIMEOUT, s)."""
+    return max(60, _env_int("STORYFX_POOL_JOB_TIMEOUT", DEFAULT_JOB_TIMEOUT))
+
+
+def _timeout_rc(argv: List[str]) -> int:
+    """rc d'un job abandonné pour dépassement : transitoire (remis en file sous --requeue)."""
+    return retry_policy.RC_REQUEUE if "--requeue" in argv else retry_policy.RC_ADB
+
+
+# ====================================================================== #
+# 🔥 1) CÔTÉ WORKER (processus enfant)
+# ====================================================================== #
+class _PipeWriter(io.TextIOBase):
+    """Remplace stdout/stderr du worker : chaque ligne part dans le pipe."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._buf = ""
+        self._lock = threading.Lock()
+
+    def write(self, s: str) -> int:
+        with self._lock:
+            self._buf += s
+            while "\n" in self._buf:
+                line, self._buf = self._buf.split("\n", 1)
+                self._send(line + "\n")
+        return len(s)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._buf:
+                self._send(self._buf)
+                self._buf = ""
+
+    def _send(self, text: str) -> None:
+        try:
+            self._conn.send(("log", text))
+        except Exception:
+            pass
+
+
+def _run_descriptor(conn, desc: Dict[str, Any]) -> Dict[str, Any]:
+    """Exécute un job dans le worker (runner.run_cli) en capturant les logs."""
+    import runner
+
+    if desc.get("time"):
+        os.environ["STORYFX_TIME"] = desc["time"]
+    else:
+        os.environ.pop("STORYFX_TIME", None)
+
+    writer = _PipeWriter(conn)
+    old_out, old_err = sys.stdout, sys.stderr
+    sys.stdout = sys.stderr = writer
+
+    t0 = time.monotonic()
+    error = None
+    runner.LAST_RESULT = None
+    try:
+        rc = runner.run_cli(desc["argv"])
+    except SystemExit as e:
+        rc = e.code if isinstance(e.code, int) else 1
+    except Exception as e:
+        rc = 1
+        error = repr(e)
+        print(f"[{PROJECT_NAME}] [Pool] ⚠ Exception job : {e!r}")
+    finally:
+        writer.flush()
+        sys.stdout, sys.stderr = old_out, old_err
+
+    return {
+        "rc": rc,
+        "duration_s": round(time.monotonic() - t0, 3),
+        "worker_pid": os.getpid(),
+        "error": error,
+        "result": runner.LAST_RESULT,
+    }
+
+
+def _worker_main(conn, max_jobs: int) -> None:
+    """Boucle d'un worker : pré-import, puis jobs un par un jusqu'à max_jobs."""
+    import runner
+    try:
+        runner.load_engines()   # appium / selenium / engine déjà chauds
+    except Exception as e:
+        print(f"[{PROJECT_NAME}] [Pool] ⚠ Pré-import engines : {e!r}", file=sys.stderr, flush=True)
+    conn.send(("ready", os.getpid()))
+
+    done = 0
+    while done < max_jobs:
+        try:
+            desc = conn.recv()
+        except (EOFError, OSError):
+            break
+        if desc is None:
+            break
+
+        result = _run_descriptor(conn, desc)
+        done += 1
+        result["jobs_done"] = done
+        result["recycle"] = done >= max_jobs
+        conn.send(("result", result))
+
+    conn.close()
+
+
+# ====================================================================== #
+# 🔥 2) CÔTÉ SERVEUR (gestion des workers)
+# ====================================================================== #
+class _Worker:
+    def __init__(self, max_jobs: int):
+        parent_conn, child_conn = mp.Pipe()
+        self.conn = parent_conn
+        self.proc = mp.Process(
+            target=_worker_main, args=(child_conn, max_jobs),
+            name="storyfx-worker", daemon=True,
+        )
+        self.proc.start()
+        child_conn.close()
+        self.busy = False
+        self.last_device: Optional[str] = None
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.proc.join(timeout=5)
+        if self.proc.is_alive():
+            self.proc.kill()
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class WorkerPool:
+    """N workers pré-importés ; un job à la fois par worker."""
+
+    def __init__(self, n_workers: int, max_jobs: int):
+        self.max_jobs = max_jobs
+        self._cond = threading.Condition()
+        self._workers: List[_Worker] = [_Worker(max_jobs) for _ in range(max(1, n_workers))]
+        print(f"[{PROJECT_NAME}] [Pool] {len(self._workers)} worker(s) démarré(s) "
+              f"(recyclage après {max_jobs} jobs).", flush=True)
+
+    def size(self) -> int:
+        return len(self._workers)
+
+    def busy_count(self) -> int:
+        with self._cond:
+            return sum(1 for w in self._workers if w.busy)
+
+    def _acquire(self, device: Optional[str]) -> _Worker:
+        """Worker libre, en priorité celui qui a servi ce téléphone en dernier."""
+        with self._cond:
+            while True:
+                idle = [w for w in self._workers if not w.busy]
+                if idle:
+                    pick = next((w for w in idle if device and w.last_device == device), None)
+                    pick = pick or next((w for w in idle if w.last_device is None), None)
+                    pick = pick or idle[0]
+                    pick.busy = True
+                    return pick
+                self._cond.wait()
+
+    def _release(self, worker: _Worker, replace: bool) -> None:
+        with self._cond:
+            if replace and worker in self._workers:
+                fresh = _Worker(self.max_jobs)
+                fresh.last_device = worker.last_device
+                self._workers[self._workers.index(worker)] = fresh
+            else:
+                worker.busy = False
+            self._cond.notify_all()
+        if replace:
+            worker.stop()   # hors verrou (join jusqu'à 5 s)
+
+    def run(self, desc: Dict[str, Any], on_log: Callable[[str], Any]) -> Dict[str, Any]:
+        device = desc.get("device")
+        worker = self._acquire(device)
+        result: Optional[Dict[str, Any]] = None
+        crashed = False
+        timeout = pool_job_timeout()
+        deadline = time.monotonic() + timeout
+        try:
+            worker.conn.send({"argv": desc["argv"], "time": desc.get("time")})
+            while True:
+                if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                    # Job bloqué (appel Appium / ADB sans réponse) : le slot du
+                    # téléphone et le permis global ne doivent pas rester pris
+                    crashed = True
+                    print(f"[{PROJECT_NAME}] [Pool] ⚠ Job sans résultat après {timeout} s "
+                          f"(worker pid={worker.proc.pid}) → worker tué et remplacé", flush=True)
+                    worker.proc.kill()
+                    result = {"rc": _timeout_rc(desc["argv"]), "duration_s": float(timeout),
+                              "worker_pid": worker.proc.pid, "jobs_done": None,
+                              "error": f"job timeout ({timeout} s)"}
+                    break
+                kind, payload = worker.conn.recv()
+                if kind == "log":
+                    on_log(payload)
+                elif kind == "result":
+                    result = payload
+                    break
+                # "ready" : message de démarrage du worker → ignoré
+        except (EOFError, OSError) as e:
+            crashed = True
+            print(f"[{PROJECT_NAME}] [Pool] ⚠ Worker pid={worker.proc.pid} planté : {e!r} → remplacé",
+                  flush=True)
+            result = {"rc": 1, "duration_s": None, "worker_pid": worker.proc.pid,
+                      "jobs_done": None, "error": f"worker crash: {e!r}"}
+        finally:
+            worker.last_device = device
+            recycle = crashed or result is None or bool(result.get("recycle")) or not worker.proc.is_alive()
+            self._release(worker, replace=recycle)
+
+        return result
+
+    def close(self) -> None:
+        with self._cond:
+            for w in self._workers:
+                w.stop()
+            self._workers = []
+
+
+def serve(n_workers: int, max_jobs: int) -> None:
+    """Boucle serveur : un thread par client connecté."""
+    authkey = _publish_authkey()
+    listener = Listener(pool_address(), authkey=authkey)
+    atexit.register(_retract_authkey, authkey)
+    pool = WorkerPool(n_workers, max_jobs)
+    atexit.register(pool.close)
+    print(f"[{PROJECT_NAME}] [Pool] En écoute sur {pool_address()[0]}:{pool_address()[1]}", flush=True)
+
+    stop = threading.Event()
+
+    def handle(conn) -> None:
+        try:
+            msg = conn.recv()
+            op = msg.get("op")
+            if op == "ping":
+                conn.send({"ok": True, "workers": pool.size(), "busy": pool.busy_count()})
+            elif op == "shutdown":
+                conn.send({"ok": True})
+                stop.set()
+                # Débloque accept()
+                try:
+                    Client(pool_address(), authkey=authkey).close()
+                except Exception:
+                    pass
+            elif op == "run":
+                def on_log(line: str) -> None:
+                    try:
+                        conn.send(("log", line))
+                    except Exception:
+                        pass   # client parti : le job continue quand même
+
+                result = pool.run(msg, on_log)
+                try:
+                    conn.send(("result", result))
+                except Exception:
+                    pass
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    try:
+        while not stop.is_set():
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                print(f"[{PROJECT_NAME}] [Pool] ⚠ accept : {e!r}", flush=True)
+                continue
+            if stop.is_set():
+                conn.close()
+                break
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+    finally:
+        listener.close()
+        pool.close()
+        _retract_authkey(authkey)
+        print(f"[{PROJECT_NAME}] [Pool] Arrêté.", flush=True)
+
+
+# ====================================================================== #
+# 🔥 3) CÔTÉ CLIENT (runner.py / scheduler)
+# ====================================================================== #
+def _connect():
+    authkey = pool_authkey()
+    if authkey is None:
+        return None   # aucun pool lancé (pas de clé publiée)
+    try:
+        return Client(pool_address(), authkey=authkey)
+    except (OSError, EOFError):
+        return None
+    except Exception:
+        return None
+
+
+def ping() -> Optional[Dict[str, Any]]:
+    conn = _connect()
+    if conn is None:
+        return None
+    try:
+        conn.send({"op": "ping"})
+        return conn.recv()
+    except Exception:
+        return None
+    finally:
+        conn.close()
+
+
+def run_remote(argv: List[str], time_str: Optional[str] = None, device: Optional[str] = None,
+               on_log: Optional[Callable[[str], Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Confie un job au pool.
+    Retourne le résultat structuré, ou None si le pool est injoignable
+    (→ l'appelant exécute le job lui-même).
+    """
+    conn = _connect()
+    if conn is None:
+        return None
+
+    on_log = on_log or (lambda line: print(line, end="", flush=True))
+    # Le serveur coupe le job à pool_job_timeout() ; marge pour le remplacement du worker
+    deadline = time.monotonic() + pool_job_timeout() + 60
+    try:
+        conn.send({"op": "run", "argv": list(argv), "time": time_str, "device": device})
+        while True:
+            if not conn.poll(max(0.0, deadline - time.monotonic())):
+                return {"rc": _timeout_rc(list(argv)), "duration_s": None, "worker_pid": None,
+                        "jobs_done": None, "error": "pool timeout: aucun résultat du serveur"}
+            kind, payload = conn.recv()
+            if kind == "log":
+                on_log(payload)
+            elif kind == "result":
+                return payload
+    except (EOFError, OSError) as e:
+        # Le job a peut-être déjà posté : on ne le relance PAS en local
+        return {"rc": 1, "duration_s": None, "worker_pid": None,
+                "jobs_done": None, "error": f"pool disconnected: {e!r}"}
+    finally:
+        conn.close()
+
+
+_POOL_PROC: Optional[subprocess.Popen] = None
+
+
+def ensure_pool_running(timeout: float = 15.0) -> bool:
+    """
+    Démarre le pool (processus enfant) s'il ne répond pas déjà.
+    Retourne True si le pool est joignable.
+    """
+    global _POOL_PROC
+
+    if ping() is not None:
+        return True
+
+    n = pool_workers()
+    if n <= 0:
+        return False
+
+    if _POOL_PROC is None or _POOL_PROC.poll() is not None:
+        print(f"[{PROJECT_NAME}] [Pool] Démarrage de {n} worker(s)…", flush=True)
+        _POOL_PROC = subprocess.Popen(
+            [sys.executable or "python", str(BASE_DIR / "worker_pool.py"), "serve",
+             "--workers", str(n), "--max-jobs", str(pool_max_jobs())],
+            cwd=str(BASE_DIR),
+        )
+        atexit.register(stop_pool)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if ping() is not None:
+            return True
+        if _POOL_PROC.poll() is not None:
+            break
+        time.sleep(0.2)
+
+    print(f"[{PROJECT_NAME}] [Pool] ⚠ Pool injoignable → runner.py en local.", flush=True)
+    return False
+
+
+def stop_pool() -> None:
+    """Arrête le pool démarré par ce processus."""
+    global _POOL_PROC
+    if _POOL_PROC is None or _POOL_PROC.poll() is not None:
+        return
+    conn = _connect()
+    if conn is not None:
+        try:
+            conn.send({"op": "shutdown"})
+            conn.recv()
+        except Exception:
+            pass
+        finally:
+            conn.close()
+    try:
+        _POOL_PROC.wait(timeout=10)
+    except Exception:
+        _POOL_PROC.kill()
+    _POOL_PROC = None
+
+
+# ---------- Entrée CLI ----------
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Pool de workers StoryFX")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sp = sub.add_parser("serve", help="Démarre le pool")
+    sp.add_argument("--workers", type=int, default=None)
+    sp.add_argument("--max-jobs", type=int, default=None)
+
+    sub.add_parser("ping", help="État du pool")
+    sub.add_parser("stop", help="Arrête le pool")
+
+    a = ap.parse_args()
+    if a.cmd == "serve":
+        n = a.workers if a.workers is not None else pool_workers()
+        serve(max(1, n), a.max_jobs or pool_max_jobs())
+    elif a.cmd == "ping":
+        print(ping() or "Pool injoignable")
+    elif a.cmd == "stop":
+        conn = _connect()
+        if conn is None:
+            print("Pool injoignable")
+            return
+        conn.send({"op": "shutdown"})
+        print(conn.recv())
+        conn.close()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print(f"\n[{PROJECT_NAME}] [Pool] Arrêté manuellement.")